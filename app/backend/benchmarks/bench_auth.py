@@ -0,0 +1,78 @@
+"""Leituras concorrentes durante uma rajada de logins.
+
+Roda contra um mongod real (MONGO_URL) num banco descartável:
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_auth.py
+
+Mede a latência de leituras autenticadas (get_current_user + listar_clientes)
+sozinhas e com LOGINS logins simultâneos. Com bcrypt fora do event loop as
+leituras não devem esperar pelos hashes.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "advcontrol_bench_auth")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+import server  # noqa: E402
+
+LOGINS = 20
+LEITURAS = 200
+SENHA = "senha-de-benchmark"
+
+
+async def ler(credenciais: HTTPAuthorizationCredentials, n: int) -> float:
+    t0 = time.perf_counter()
+    user_id = await server.get_current_user(credenciais)
+    # Um limit diferente por leitura: consultas idênticas e simultâneas sairiam de uma só no em_voo
+    # e a medida seria de uma consulta, não de LEITURAS
+    await server.listar_clientes(user_id=user_id, cursor=None, limit=100 + n, ordenar_por="_id", ordem="asc")
+    return (time.perf_counter() - t0) * 1000
+
+
+async def logar(email: str) -> float:
+    t0 = time.perf_counter()
+    await server.login(server.UserLogin(email=email, password=SENHA))
+    return (time.perf_counter() - t0) * 1000
+
+
+def resumo(tempos) -> str:
+    tempos = sorted(tempos)
+    p95 = tempos[int(len(tempos) * 0.95) - 1]
+    return f"p50={statistics.median(tempos):.2f} ms p95={p95:.2f} ms max={tempos[-1]:.2f} ms"
+
+
+async def main():
+    await server.client.drop_database(os.environ["DB_NAME"])
+    await server.criar_indices()
+
+    emails = [f"bench{i}@example.com" for i in range(LOGINS)]
+    usuarios = await asyncio.gather(*(
+        server.register(server.UserRegister(email=email, password=SENHA, nome="Bench")) for email in emails
+    ))
+    credenciais = HTTPAuthorizationCredentials(scheme="Bearer", credentials=usuarios[0].token)
+
+    sozinho = await asyncio.gather(*(ler(credenciais, n) for n in range(LEITURAS)))
+    print(f"leituras sozinhas:         {resumo(sozinho)}")
+
+    t0 = time.perf_counter()
+    resultados = await asyncio.gather(
+        asyncio.gather(*(logar(email) for email in emails)),
+        asyncio.gather(*(ler(credenciais, n) for n in range(LEITURAS))),
+    )
+    total = time.perf_counter() - t0
+    logins, leituras = resultados
+    print(f"leituras durante logins:   {resumo(leituras)}")
+    print(f"logins ({LOGINS} simultâneos, {server.BCRYPT_ROUNDS} rounds): {resumo(logins)} total={total:.2f} s")
+
+    await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""Latência de /busca com 100k clientes e casos por usuário.
+
+Roda contra um mongod real (MONGO_URL) num banco descartável:
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_busca.py
+
+Semeia clientes e casos com termos_busca já calculados e mede buscar() para
+nomes, prefixos de CPF/CNPJ e números CNJ. O alvo é p95 abaixo de 50 ms.
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "advcontrol_bench_busca")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+USER_ID = "bench-user"
+TAMANHO = 100_000
+EXECUCOES = 50
+LOTE = 5_000
+NOMES = ["João", "Maria", "José", "Ana", "Antônio", "Francisca", "Luís", "Conceição", "Sebastião", "Lúcia"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Araújo", "Gonçalves", "Ribeiro"]
+CONSULTAS = ["silva", "jose santos", "conceicao", "123", "4567", "0001", "divorcio araujo"]
+
+
+def digitos(n: int) -> str:
+    return "".join(random.choice("0123456789") for _ in range(n))
+
+
+def gerar_cliente() -> dict:
+    cpf = digitos(11)
+    cliente = {
+        "user_id": USER_ID,
+        "tipo": "PF",
+        "nome": f"{random.choice(NOMES)} {random.choice(SOBRENOMES)} {random.choice(SOBRENOMES)}",
+        "cpf_cnpj": f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}",
+        "tags": random.sample(["família", "trabalhista", "vip", "inadimplente"], 2),
+        "criado_em": datetime.utcnow(),
+    }
+    cliente["termos_busca"] = server.termos_busca("clientes", cliente)
+    return cliente
+
+
+def gerar_caso() -> dict:
+    caso = {
+        "user_id": USER_ID,
+        "titulo": f"{random.choice(['Divórcio', 'Inventário', 'Reclamação trabalhista'])} {random.choice(SOBRENOMES)}",
+        "area": "cível",
+        "numero_processo": f"{digitos(7)}-{digitos(2)}.{random.randint(2000, 2024)}.8.26.{digitos(4)}",
+        "partes": f"{random.choice(NOMES)} x {random.choice(NOMES)}",
+        "cliente_id": "",
+        "criado_em": datetime.utcnow(),
+    }
+    caso["termos_busca"] = server.termos_busca("casos", caso)
+    return caso
+
+
+async def semear(colecao, gerador):
+    for inicio in range(0, TAMANHO, LOTE):
+        await colecao.insert_many([gerador() for _ in range(min(LOTE, TAMANHO - inicio))], ordered=False)
+
+
+async def main():
+    random.seed(42)
+    await server.client.drop_database(os.environ["DB_NAME"])
+    await server.criar_indices()
+    await semear(server.db.clientes, gerar_cliente)
+    await semear(server.db.casos, gerar_caso)
+
+    for consulta in CONSULTAS:
+        await server.buscar(q=consulta, tipo=None, limit=20, user_id=USER_ID)  # aquece cache do mongod
+        tempos = []
+        for _ in range(EXECUCOES):
+            t0 = time.perf_counter()
+            await server.buscar(q=consulta, tipo=None, limit=20, user_id=USER_ID)
+            tempos.append((time.perf_counter() - t0) * 1000)
+        tempos.sort()
+        p95 = tempos[int(len(tempos) * 0.95) - 1]
+        print(f"{consulta!r:>20}: p50={statistics.median(tempos):.2f} ms p95={p95:.2f} ms")
+
+    await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
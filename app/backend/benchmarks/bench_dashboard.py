@@ -0,0 +1,97 @@
+"""Latência de /dashboard conforme prazos e financeiro crescem.
+
+Roda contra um mongod real (MONGO_URL) num banco descartável:
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_dashboard.py
+
+Para cada tamanho semeia prazos e lançamentos financeiros espalhados por
+vários anos para um único usuário e mede calcular_dashboard(). Com os
+índices de INDICES a latência deve ficar estável de 1k a 100k registros.
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "advcontrol_bench_dashboard")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+USER_ID = "bench-user"
+TAMANHOS = [1_000, 10_000, 100_000]
+EXECUCOES = 50
+LOTE = 5_000
+
+
+def gerar_prazo(hoje: date) -> dict:
+    data = hoje + timedelta(days=random.randint(-1500, 400))
+    return {
+        "user_id": USER_ID,
+        "tipo": random.choice(["prazo", "audiência", "reunião"]),
+        "titulo": f"Prazo {random.randint(1, 10**6)}",
+        "data": server.inicio_dia_utc(data),
+        "hora": "10:00",
+        "lembretes": [7, 3, 1],
+        "criado_em": datetime.utcnow(),
+    }
+
+
+def gerar_financeiro(hoje: date) -> dict:
+    vencimento = hoje + timedelta(days=random.randint(-1500, 120))
+    pago = vencimento < hoje and random.random() < 0.95
+    return {
+        "user_id": USER_ID,
+        "tipo": random.choice(["receber", "pagar"]),
+        "descricao": "Honorários",
+        "valor": round(random.uniform(100, 10_000), 2),
+        "categoria": random.choice(["honorários", "custas", "despesas"]),
+        "status": "pago" if pago else "pendente",
+        "data_vencimento": server.inicio_dia_utc(vencimento),
+        "criado_em": datetime.utcnow(),
+    }
+
+
+async def semear(colecao, gerador, de: int, ate: int, hoje: date):
+    for inicio in range(de, ate, LOTE):
+        n = min(LOTE, ate - inicio)
+        await colecao.insert_many([gerador(hoje) for _ in range(n)], ordered=False)
+
+
+async def medir(hoje: date) -> dict:
+    await server.calcular_dashboard(USER_ID, hoje)  # aquece cache do mongod
+    tempos = []
+    for _ in range(EXECUCOES):
+        t0 = time.perf_counter()
+        await server.calcular_dashboard(USER_ID, hoje)
+        tempos.append((time.perf_counter() - t0) * 1000)
+    tempos.sort()
+    return {
+        "p50_ms": round(statistics.median(tempos), 2),
+        "p95_ms": round(tempos[int(len(tempos) * 0.95) - 1], 2),
+    }
+
+
+async def main():
+    random.seed(42)
+    hoje = server.hoje_local()
+    await server.client.drop_database(os.environ["DB_NAME"])
+    await server.criar_indices()
+
+    atual = 0
+    for tamanho in TAMANHOS:
+        await semear(server.db.prazos, gerar_prazo, atual, tamanho, hoje)
+        await semear(server.db.financeiro, gerar_financeiro, atual, tamanho, hoje)
+        atual = tamanho
+        resultado = await medir(hoje)
+        print(f"{tamanho:>7} prazos/financeiro: p50={resultado['p50_ms']} ms p95={resultado['p95_ms']} ms")
+
+    await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
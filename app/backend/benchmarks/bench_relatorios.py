@@ -0,0 +1,69 @@
+"""Tempo dos relatórios financeiros sobre 100k lançamentos.
+
+Não precisa de mongod; os lançamentos são gerados em memória:
+
+    python benchmarks/bench_relatorios.py
+
+Mede a montagem do frame (o que acontece num miss do relatorios_cache) e
+cada relatório sobre o frame já montado (o caso comum).
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "advcontrol_bench_relatorios")
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+TAMANHO = 100_000
+EXECUCOES = 20
+
+
+def gerar_lancamento(hoje: date) -> dict:
+    vencimento = hoje + timedelta(days=random.randint(-900, 120))
+    pago = vencimento < hoje and random.random() < 0.9
+    return {
+        "tipo": random.choice(["receber", "pagar"]),
+        "valor": round(random.uniform(100, 10_000), 2),
+        "categoria": random.choice(["honorários", "custas", "despesas"]),
+        "status": "pago" if pago else "pendente",
+        "data_vencimento": server.inicio_dia_utc(vencimento),
+        "data_pagamento": server.inicio_dia_utc(vencimento + timedelta(days=random.randint(0, 20))) if pago else None,
+        "cliente_id": f"cliente-{random.randint(1, 5_000)}",
+        "caso_id": f"caso-{random.randint(1, 20_000)}",
+    }
+
+
+def medir(nome: str, funcao):
+    tempos = []
+    for _ in range(EXECUCOES):
+        t0 = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    tempos.sort()
+    print(f"{nome:>22}: p50={statistics.median(tempos):.2f} ms max={tempos[-1]:.2f} ms")
+
+
+def main():
+    random.seed(42)
+    hoje = server.hoje_local()
+    registros = [gerar_lancamento(hoje) for _ in range(TAMANHO)]
+    frame = server.montar_lancamentos(registros)
+    referencia = server.hoje_relatorio()
+
+    medir("montar frame", lambda: server.montar_lancamentos(registros))
+    medir("fluxo de caixa", lambda: server.fluxo_caixa(frame, None, None))
+    medir("aging", lambda: server.aging_recebiveis(frame, referencia))
+    medir("categorias", lambda: server.totais_categoria(frame))
+    medir("recebíveis por cliente", lambda: server.recebiveis_por(frame, "cliente_id", referencia, 100))
+    medir("recebíveis por caso", lambda: server.recebiveis_por(frame, "caso_id", referencia, 100))
+
+
+if __name__ == "__main__":
+    main()
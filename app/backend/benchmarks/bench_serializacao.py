@@ -0,0 +1,118 @@
+"""Custo de serializar uma página de 1000 itens: caminho antigo x pagina_saida.
+
+Não precisa de mongod; os documentos são gerados em memória:
+
+    python benchmarks/bench_serializacao.py
+
+O caminho antigo constrói cada modelo à mão, deixa o FastAPI revalidar contra
+o response_model e serializa com json da stdlib (como listar_financeiro e
+listar_casos faziam). O novo é o pagina_saida: documento projetado direto
+para o orjson.
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "advcontrol_bench_serializacao")
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+import server  # noqa: E402
+
+ITENS = 1000
+EXECUCOES = 50
+
+
+def gerar_financeiro() -> dict:
+    return {
+        "_id": ObjectId(),
+        "tipo": random.choice(["receber", "pagar"]),
+        "descricao": "Honorários",
+        "valor": round(random.uniform(100, 10_000), 2),
+        "categoria": random.choice(["honorários", "custas", "despesas"]),
+        "status": "pendente",
+        "data_vencimento": "2024-05-10",
+        "data_pagamento": None,
+        "caso_id": str(ObjectId()),
+        "cliente_id": str(ObjectId()),
+        "criado_em": datetime.utcnow(),
+    }
+
+
+def gerar_caso() -> dict:
+    return {
+        "_id": ObjectId(),
+        "titulo": "Reclamação trabalhista",
+        "area": "trabalhista",
+        "numero_processo": "0001234-56.2023.5.02.0001",
+        "tribunal": "TRT-2",
+        "vara": "1ª Vara do Trabalho",
+        "comarca": "São Paulo",
+        "partes": "João da Silva x Empresa Ltda",
+        "status": "em andamento",
+        "prioridade": "alta",
+        "proxima_acao": "Audiência de instrução",
+        "cliente_id": str(ObjectId()),
+        "timeline": [{"data": datetime.utcnow().isoformat(), "descricao": f"Movimentação {i}"} for i in range(10)],
+        "total_movimentacoes": 42,
+        "anexos": [],
+        "criado_em": datetime.utcnow(),
+    }
+
+
+def campo_resposta(caminho: str):
+    for rota in server.app.routes:
+        if getattr(rota, "path", None) == caminho and "GET" in rota.methods:
+            return rota.response_field
+    raise LookupError(caminho)
+
+
+async def antigo(docs, modelo, campo) -> bytes:
+    pagina = server.Pagina[modelo](
+        items=[modelo(id=str(d["_id"]), **{k: v for k, v in d.items() if k != "_id"}) for d in docs],
+        next_cursor=None,
+    )
+    conteudo = await serialize_response(field=campo, response_content=pagina, is_coroutine=True)
+    return JSONResponse(conteudo).body
+
+
+async def novo(docs, modelo, campo) -> bytes:
+    return server.pagina_saida(docs, None, modelo).body
+
+
+async def medir(caminho, docs, modelo, campo) -> dict:
+    await caminho(docs, modelo, campo)
+    tempos = []
+    for _ in range(EXECUCOES):
+        t0 = time.perf_counter()
+        await caminho(docs, modelo, campo)
+        tempos.append((time.perf_counter() - t0) * 1000)
+    tempos.sort()
+    return {"p50": statistics.median(tempos), "p95": tempos[int(len(tempos) * 0.95) - 1]}
+
+
+async def main():
+    random.seed(42)
+    casos = [
+        ("listar_financeiro", "/api/financeiro", server.Financeiro, [gerar_financeiro() for _ in range(ITENS)]),
+        ("listar_casos", "/api/casos", server.Caso, [gerar_caso() for _ in range(ITENS)]),
+    ]
+    for nome, caminho, modelo, docs in casos:
+        campo = campo_resposta(caminho)
+        a = await medir(antigo, docs, modelo, campo)
+        n = await medir(novo, docs, modelo, campo)
+        print(f"{nome} ({ITENS} itens): antigo p50={a['p50']:.2f} ms p95={a['p95']:.2f} ms | "
+              f"novo p50={n['p50']:.2f} ms p95={n['p95']:.2f} ms | {a['p50'] / n['p50']:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,405 @@
+"""Teste de carga reproduzível da API com dados semeados.
+
+Sobe o app do server.py no próprio processo (httpx + ASGITransport), semeia
+volumes realistas por usuário e roda cenários concorrentes, medindo p50/p95/p99,
+vazão e pico de RSS por endpoint. O resultado vai para um JSON que pode ser
+comparado com uma execução anterior.
+
+Contra um mongod real, num banco descartável:
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/carga.py
+
+Sem mongod, com o mongomock-motor no lugar do Motor (útil para comparar o custo
+da camada Python; sem $unionWith o /dashboard falha e sem GridFS os documentos
+não são semeados):
+
+    python benchmarks/carga.py --memoria
+
+Outras opções: --usuarios, --escala (multiplica VOLUMES), --concorrencia,
+--cenarios login,dashboard,navegacao,importacao, --seed, --saida e
+--comparar resultado-anterior.json.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DB_NAME", "advcontrol_bench_carga")
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("LEMBRETES_ATIVO", "0")
+os.environ.setdefault("LIMITE_TAXA", "0")  # mede a capacidade da API, não o limitador
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+import server  # noqa: E402
+
+SENHA = "senha-de-carga"
+LOTE = 5_000
+# Volumes por usuário com --escala 1
+VOLUMES = {
+    "clientes": 500,
+    "casos": 300,
+    "movimentacoes_por_caso": 40,
+    "prazos": 1_000,
+    "tarefas": 500,
+    "financeiro": 5_000,
+    "documentos": 20,
+}
+TAMANHO_DOCUMENTO = 50_000  # bytes antes do base64
+NOMES = ["João", "Maria", "José", "Ana", "Antônio", "Francisca", "Luís", "Conceição", "Sebastião", "Lúcia"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Araújo", "Gonçalves", "Ribeiro"]
+RESULTADOS = Path(__file__).resolve().parent / "resultados"
+
+
+# ---------- dados ----------
+
+def digitos(n: int) -> str:
+    return "".join(random.choice("0123456789") for _ in range(n))
+
+
+def nome_pessoa() -> str:
+    return f"{random.choice(NOMES)} {random.choice(SOBRENOMES)} {random.choice(SOBRENOMES)}"
+
+
+def gerar_cliente() -> dict:
+    cpf = digitos(11)
+    return {
+        "tipo": "PF",
+        "nome": nome_pessoa(),
+        "cpf_cnpj": f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}",
+        "telefone": f"(11) 9{digitos(4)}-{digitos(4)}",
+        "email": f"cliente{digitos(6)}@example.com",
+        "tags": random.sample(["família", "trabalhista", "vip", "inadimplente"], 2),
+    }
+
+
+def gerar_caso(cliente_id: str) -> dict:
+    return {
+        "titulo": f"{random.choice(['Divórcio', 'Inventário', 'Reclamação trabalhista', 'Cobrança'])} {random.choice(SOBRENOMES)}",
+        "area": random.choice(["família", "cível", "trabalhista"]),
+        "numero_processo": f"{digitos(7)}-{digitos(2)}.{random.randint(2015, 2024)}.8.26.{digitos(4)}",
+        "tribunal": "TJSP",
+        "partes": f"{nome_pessoa()} x {nome_pessoa()}",
+        "status": random.choice(["novo", "em andamento", "aguardando", "concluído"]),
+        "prioridade": random.choice(["baixa", "media", "alta"]),
+        "cliente_id": cliente_id,
+    }
+
+
+def gerar_prazo(hoje: date) -> dict:
+    return {
+        "tipo": random.choice(["prazo", "audiência", "reunião"]),
+        "titulo": f"Prazo {random.randint(1, 10**6)}",
+        "data": (hoje + timedelta(days=random.randint(-365, 120))).isoformat(),
+        "hora": f"{random.randint(8, 18):02d}:00",
+        "lembretes": [7, 3, 1],
+    }
+
+
+def gerar_tarefa(hoje: date) -> dict:
+    return {
+        "titulo": f"Tarefa {random.randint(1, 10**6)}",
+        "data": (hoje + timedelta(days=random.randint(-60, 60))).isoformat(),
+        "prioridade": random.choice(["baixa", "media", "alta"]),
+        "status": random.choice(["a_fazer", "fazendo", "concluido"]),
+    }
+
+
+def gerar_financeiro(hoje: date, cliente_id: str = None) -> dict:
+    vencimento = hoje + timedelta(days=random.randint(-720, 120))
+    pago = vencimento < hoje and random.random() < 0.9
+    return {
+        "tipo": random.choice(["receber", "pagar"]),
+        "descricao": "Honorários",
+        "valor": round(random.uniform(100, 10_000), 2),
+        "categoria": random.choice(["honorários", "custas", "despesas"]),
+        "status": "pago" if pago else "pendente",
+        "data_vencimento": vencimento.isoformat(),
+        "data_pagamento": vencimento.isoformat() if pago else None,
+        "cliente_id": cliente_id,
+    }
+
+
+def volume(chave: str, escala: float) -> int:
+    return max(1, int(VOLUMES[chave] * escala))
+
+
+async def inserir(colecao: str, user_id: str, registros: list) -> list:
+    # Mesmos campos que as rotas de criação gravam, com versões reservadas em bloco
+    agora = datetime.utcnow()
+    ids = []
+    async with server.carimbo(user_id, len(registros)) as marca:
+        primeira = marca["versao"] - len(registros) + 1
+        for n, registro in enumerate(registros):
+            registro.update(server.campos_iniciais(colecao))
+            registro.update(server.campos_derivados(colecao, registro))
+            registro.update({"user_id": user_id, "criado_em": agora, "versao": primeira + n, "atualizado_em": marca["atualizado_em"]})
+        for inicio in range(0, len(registros), LOTE):
+            resultado = await server.db[colecao].insert_many(registros[inicio:inicio + LOTE], ordered=False)
+            ids.extend(str(i) for i in resultado.inserted_ids)
+    return ids
+
+
+async def semear_usuario(http: httpx.AsyncClient, user_id: str, token: str, escala: float, com_documentos: bool):
+    hoje = datetime.utcnow().date()
+    clientes = await inserir("clientes", user_id, [gerar_cliente() for _ in range(volume("clientes", escala))])
+    casos = await inserir("casos", user_id, [gerar_caso(random.choice(clientes)) for _ in range(volume("casos", escala))])
+
+    # Timelines longas: a lista completa na sub-coleção e só as últimas embutidas no caso
+    por_caso = volume("movimentacoes_por_caso", escala)
+    movimentacoes = []
+    for caso_id in casos:
+        entradas = [
+            {"descricao": f"Movimentação {i}", "data": (datetime.utcnow() - timedelta(days=por_caso - i)).isoformat()}
+            for i in range(por_caso)
+        ]
+        movimentacoes.extend({**e, "user_id": user_id, "caso_id": caso_id} for e in entradas)
+        await server.db.casos.update_one(
+            {"_id": ObjectId(caso_id)},
+            {"$set": {"timeline": entradas[-server.HISTORICO_EMBUTIDO:], "total_movimentacoes": por_caso}},
+        )
+    for inicio in range(0, len(movimentacoes), LOTE):
+        await server.db.movimentacoes.insert_many(movimentacoes[inicio:inicio + LOTE], ordered=False)
+
+    await inserir("prazos", user_id, [gerar_prazo(hoje) for _ in range(volume("prazos", escala))])
+    await inserir("tarefas", user_id, [gerar_tarefa(hoje) for _ in range(volume("tarefas", escala))])
+    await inserir("financeiro", user_id, [gerar_financeiro(hoje, random.choice(clientes)) for _ in range(volume("financeiro", escala))])
+
+    if com_documentos:
+        cabecalhos = {"Authorization": f"Bearer {token}"}
+        for i in range(volume("documentos", escala)):
+            conteudo = base64.b64encode(random.randbytes(TAMANHO_DOCUMENTO)).decode()
+            corpo = {"nome": f"peticao-{i}.pdf", "tipo": "petição", "caso_id": random.choice(casos), "conteudo_base64": conteudo}
+            resposta = await http.post("/api/documentos", json=corpo, headers=cabecalhos)
+            resposta.raise_for_status()
+
+
+# ---------- medição ----------
+
+def rss_mb() -> float:
+    # RSS atual (Linux); fora dele, o pico do processo
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Medidor:
+    def __init__(self):
+        self.tempos = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.rss_pico = rss_mb()
+
+    async def requisitar(self, http: httpx.AsyncClient, rotulo: str, metodo: str, url: str, **kwargs) -> httpx.Response:
+        t0 = time.perf_counter()
+        try:
+            resposta = await http.request(metodo, url, **kwargs)
+        except Exception:
+            self.erros[rotulo] += 1
+            self.tempos[rotulo].append((time.perf_counter() - t0) * 1000)
+            return None
+        self.tempos[rotulo].append((time.perf_counter() - t0) * 1000)
+        if resposta.status_code >= 400:
+            self.erros[rotulo] += 1
+        return resposta
+
+    async def amostrar_rss(self, intervalo: float = 0.05):
+        while True:
+            self.rss_pico = max(self.rss_pico, rss_mb())
+            await asyncio.sleep(intervalo)
+
+    def resumo(self, duracao: float) -> dict:
+        endpoints = {}
+        for rotulo, tempos in sorted(self.tempos.items()):
+            tempos = sorted(tempos)
+            quantis = statistics.quantiles(tempos, n=100, method="inclusive") if len(tempos) > 1 else tempos * 99
+            endpoints[rotulo] = {
+                "requisicoes": len(tempos),
+                "erros": self.erros[rotulo],
+                "p50_ms": round(quantis[49], 2),
+                "p95_ms": round(quantis[94], 2),
+                "p99_ms": round(quantis[98], 2),
+                "max_ms": round(tempos[-1], 2),
+                "rps": round(len(tempos) / duracao, 1) if duracao else 0.0,
+            }
+        return {"duracao_s": round(duracao, 2), "rss_pico_mb": round(self.rss_pico, 1), "endpoints": endpoints}
+
+
+async def executar(tarefas, concorrencia: int):
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def limitada(fabrica):
+        async with semaforo:
+            await fabrica()
+
+    await asyncio.gather(*(limitada(f) for f in tarefas))
+
+
+# ---------- cenários ----------
+
+async def cenario_login(http, medidor, usuarios, concorrencia):
+    # Rajada da manhã: todo mundo loga e abre o dashboard ao mesmo tempo
+    async def entrar(email):
+        resposta = await medidor.requisitar(http, "POST /auth/login", "POST", "/api/auth/login", json={"email": email, "password": SENHA})
+        if resposta is not None and resposta.status_code == 200:
+            cabecalhos = {"Authorization": f"Bearer {resposta.json()['token']}"}
+            await medidor.requisitar(http, "GET /dashboard", "GET", "/api/dashboard", headers=cabecalhos)
+
+    await executar([lambda u=u: entrar(u["email"]) for u in usuarios for _ in range(5)], concorrencia)
+
+
+async def cenario_dashboard(http, medidor, usuarios, concorrencia):
+    # Refresh em massa; um lançamento a cada 20 leituras invalida o cache do usuário
+    hoje = datetime.utcnow().date()
+    tarefas = []
+    for n in range(len(usuarios) * 100):
+        usuario = usuarios[n % len(usuarios)]
+        if n % 20 == 19:
+            tarefas.append(lambda u=usuario: medidor.requisitar(
+                http, "POST /financeiro", "POST", "/api/financeiro", json=gerar_financeiro(hoje), headers=u["cabecalhos"]))
+        else:
+            tarefas.append(lambda u=usuario: medidor.requisitar(http, "GET /dashboard", "GET", "/api/dashboard", headers=u["cabecalhos"]))
+    await executar(tarefas, concorrencia)
+
+
+async def cenario_navegacao(http, medidor, usuarios, concorrencia):
+    # Navegação pelas listas: primeiras páginas, algumas páginas seguintes, detalhe e busca
+    async def navegar(usuario):
+        cabecalhos = usuario["cabecalhos"]
+        for recurso in ("clientes", "casos", "prazos", "tarefas", "financeiro"):
+            cursor = None
+            for _ in range(3):
+                params = {"limit": 100, **({"cursor": cursor} if cursor else {})}
+                resposta = await medidor.requisitar(http, f"GET /{recurso}", "GET", f"/api/{recurso}", params=params, headers=cabecalhos)
+                if resposta is None or resposta.status_code != 200:
+                    break
+                pagina = resposta.json()
+                if recurso == "casos" and pagina["items"]:
+                    caso_id = random.choice(pagina["items"])["id"]
+                    await medidor.requisitar(http, "GET /casos/{id}/movimentacoes", "GET", f"/api/casos/{caso_id}/movimentacoes", headers=cabecalhos)
+                cursor = pagina["next_cursor"]
+                if not cursor:
+                    break
+        termo = random.choice(SOBRENOMES + ["123", "0001"])
+        await medidor.requisitar(http, "GET /busca", "GET", "/api/busca", params={"q": termo}, headers=cabecalhos)
+        await medidor.requisitar(http, "GET /financeiro/relatorios/fluxo-caixa", "GET", "/api/financeiro/relatorios/fluxo-caixa", headers=cabecalhos)
+
+    await executar([lambda u=u: navegar(u) for u in usuarios for _ in range(10)], concorrencia)
+
+
+async def cenario_importacao(http, medidor, usuarios, concorrencia):
+    # Importação em lote de planilhas de clientes e lançamentos
+    hoje = datetime.utcnow().date()
+    tarefas = []
+    for usuario in usuarios:
+        for _ in range(3):
+            tarefas.append(lambda u=usuario: medidor.requisitar(
+                http, "POST /clientes/bulk", "POST", "/api/clientes/bulk", json=[gerar_cliente() for _ in range(500)], headers=u["cabecalhos"]))
+            tarefas.append(lambda u=usuario: medidor.requisitar(
+                http, "POST /financeiro/bulk", "POST", "/api/financeiro/bulk", json=[gerar_financeiro(hoje) for _ in range(500)], headers=u["cabecalhos"]))
+    await executar(tarefas, concorrencia)
+
+
+CENARIOS = {
+    "login": cenario_login,
+    "dashboard": cenario_dashboard,
+    "navegacao": cenario_navegacao,
+    "importacao": cenario_importacao,
+}
+
+
+# ---------- execução ----------
+
+def comparar(atual: dict, anterior: dict):
+    print("\nVariação de p95 em relação à execução anterior:")
+    for nome, cenario in atual["cenarios"].items():
+        antes = anterior.get("cenarios", {}).get(nome, {}).get("endpoints", {})
+        for rotulo, metricas in cenario["endpoints"].items():
+            if rotulo in antes and antes[rotulo]["p95_ms"]:
+                variacao = (metricas["p95_ms"] / antes[rotulo]["p95_ms"] - 1) * 100
+                print(f"  {nome:>10} {rotulo:<40} {antes[rotulo]['p95_ms']:>9.2f} -> {metricas['p95_ms']:>9.2f} ms ({variacao:+.1f}%)")
+
+
+async def main(args):
+    random.seed(args.seed)
+    if args.memoria:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.db = server.db_leitura = server.client[os.environ["DB_NAME"]]
+    else:
+        await server.client.drop_database(os.environ["DB_NAME"])
+    await server.criar_indices()
+
+    transporte = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://carga", timeout=None) as http:
+        usuarios = []
+        t0 = time.perf_counter()
+        for i in range(args.usuarios):
+            email = f"carga{i}@example.com"
+            resposta = await http.post("/api/auth/register", json={"email": email, "password": SENHA, "nome": nome_pessoa()})
+            resposta.raise_for_status()
+            dados = resposta.json()
+            usuarios.append({"email": email, "cabecalhos": {"Authorization": f"Bearer {dados['token']}"}})
+            await semear_usuario(http, dados["id"], dados["token"], args.escala, com_documentos=not args.memoria)
+        print(f"semeados {args.usuarios} usuários (escala {args.escala}) em {time.perf_counter() - t0:.1f} s")
+
+        resultado = {
+            "inicio": datetime.utcnow().isoformat(),
+            "config": {
+                "usuarios": args.usuarios,
+                "escala": args.escala,
+                "concorrencia": args.concorrencia,
+                "seed": args.seed,
+                "backend": "mongomock" if args.memoria else "mongod",
+                "volumes": {chave: volume(chave, args.escala) for chave in VOLUMES},
+            },
+            "cenarios": {},
+        }
+        for nome in args.cenarios.split(","):
+            medidor = Medidor()
+            amostragem = asyncio.create_task(medidor.amostrar_rss())
+            t0 = time.perf_counter()
+            await CENARIOS[nome](http, medidor, usuarios, args.concorrencia)
+            duracao = time.perf_counter() - t0
+            amostragem.cancel()
+            resultado["cenarios"][nome] = medidor.resumo(duracao)
+
+            print(f"\n{nome}: {duracao:.2f} s, pico de RSS {medidor.rss_pico:.1f} MB")
+            for rotulo, m in resultado["cenarios"][nome]["endpoints"].items():
+                print(f"  {rotulo:<40} n={m['requisicoes']:<6} erros={m['erros']:<4} "
+                      f"p50={m['p50_ms']:>8.2f} p95={m['p95_ms']:>8.2f} p99={m['p99_ms']:>8.2f} ms {m['rps']:>8.1f} req/s")
+
+    if not args.memoria:
+        await server.client.drop_database(os.environ["DB_NAME"])
+
+    saida = Path(args.saida) if args.saida else RESULTADOS / f"carga-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+    print(f"\nresultado salvo em {saida}")
+    if args.comparar:
+        comparar(resultado, json.loads(Path(args.comparar).read_text()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga da API com dados semeados")
+    parser.add_argument("--memoria", action="store_true", help="usa mongomock-motor em vez de um mongod")
+    parser.add_argument("--usuarios", type=int, default=5)
+    parser.add_argument("--escala", type=float, default=1.0)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida")
+    parser.add_argument("--comparar")
+    asyncio.run(main(parser.parse_args()))
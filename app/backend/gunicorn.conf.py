@@ -0,0 +1,31 @@
+"""Perfil de produção com vários workers uvicorn atrás de um balanceador.
+
+    gunicorn server:app -c gunicorn.conf.py
+    python server.py agendador   # lembretes e manutenção, uma única instância
+
+Cada worker tem o próprio pool do MongoDB (MONGO_POOL_MIN..MONGO_POOL_MAX), aquecido
+no lifespan antes de /ready responder 200. Os jobs de fundo ficam desligados nos
+workers para não rodarem em dobro; caches e o barramento de eventos são por processo.
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault("LEMBRETES_ATIVO", "0")
+os.environ.setdefault("MANUTENCAO_ATIVO", "0")
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Sem preload: cada worker importa o app e cria o próprio cliente depois do fork
+preload_app = False
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("WORKER_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("KEEPALIVE", "5"))
+
+# Reciclar workers aos poucos evita que todos reiniciem (e esfriem o pool) ao mesmo tempo
+max_requests = int(os.environ.get("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = "-"
+errorlog = "-"
@@ -1,34 +1,369 @@
-"from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, Form, Header, Query, Request, Response, UploadFile, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime, timedelta
-from typing import List, Optional
-from pydantic import BaseModel, Field, EmailStr
-from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from collections import OrderedDict, defaultdict, deque
+from typing import Annotated, Any, Awaitable, Callable, Dict, Generic, List, Literal, Optional, Tuple, Type, TypeVar
+from pydantic import BaseModel, BeforeValidator, Field, EmailStr, ValidationError
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+import asyncio
+import base64
+import binascii
+import bisect
+import csv
+import hashlib
+import io
+import json
+import math
 import os
+import re
+import threading
+import time
+import unicodedata
 import logging
 from pathlib import Path
+from urllib.parse import quote
+from zoneinfo import ZoneInfo
 import bcrypt
 import jwt
+import numpy as np
+import pandas as pd
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# ==================== MÉTRICAS ====================
+# Histogramas e contadores em memória, expostos em formato Prometheus em /metrics. Medir custa um
+# bisect e um incremento sob lock; parado, só a amostragem do atraso do loop acorda de tempos em tempos.
+
+LIMITES_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_BYTES = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+MONGO_LENTO_MS = float(os.environ.get('MONGO_LENTO_MS', '100'))
+LOOP_LAG_INTERVALO = float(os.environ.get('LOOP_LAG_INTERVALO', '1.0'))
+
+def escapar_rotulo(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def rotulos_prometheus(nomes: Tuple[str, ...], valores: Tuple[str, ...]) -> str:
+    if not nomes:
+        return ""
+    return "{" + ",".join(f'{n}="{escapar_rotulo(v)}"' for n, v in zip(nomes, valores)) + "}"
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self.valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *rotulos: str, valor: float = 1) -> None:
+        self.valores[rotulos] = self.valores.get(rotulos, 0) + valor
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        for rotulos, valor in sorted(self.valores.items()):
+            linhas.append(f"{self.nome}{rotulos_prometheus(self.rotulos, rotulos)} {valor}")
+        return linhas
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = (), limites: Tuple[float, ...] = LIMITES_SEGUNDOS):
+        self.nome, self.ajuda, self.rotulos, self.limites = nome, ajuda, rotulos, limites
+        # rótulos -> [contagem por faixa (+Inf no fim), soma]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, *rotulos: str) -> None:
+        serie = self.series.get(rotulos)
+        if serie is None:
+            serie = self.series[rotulos] = [[0] * (len(self.limites) + 1), 0.0]
+        serie[0][bisect.bisect_left(self.limites, valor)] += 1
+        serie[1] += valor
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        nomes = self.rotulos + ("le",)
+        for rotulos, (faixas, soma) in sorted(self.series.items()):
+            acumulado = 0
+            for limite, n in zip(self.limites + (float("inf"),), faixas):
+                acumulado += n
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                linhas.append(f"{self.nome}_bucket{rotulos_prometheus(nomes, rotulos + (le,))} {acumulado}")
+            linhas.append(f"{self.nome}_sum{rotulos_prometheus(self.rotulos, rotulos)} {soma}")
+            linhas.append(f"{self.nome}_count{rotulos_prometheus(self.rotulos, rotulos)} {acumulado}")
+        return linhas
+
+class Metricas:
+    def __init__(self):
+        # O listener do pymongo roda nas threads do Motor; todo registro passa por este lock
+        self.lock = threading.Lock()
+        self.http_requisicoes = Contador("http_requests_total", "Requisições por rota, método e status", ("rota", "metodo", "status"))
+        self.http_duracao = Histograma("http_request_duration_seconds", "Latência por rota", ("rota", "metodo"))
+        self.http_tamanho = Histograma("http_response_size_bytes", "Tamanho da resposta por rota", ("rota", "metodo"), LIMITES_BYTES)
+        self.mongo_duracao = Histograma("mongo_command_duration_seconds", "Duração dos comandos no MongoDB", ("colecao", "operacao"))
+        self.mongo_documentos = Contador("mongo_documents_returned_total", "Documentos devolvidos pelo MongoDB", ("colecao", "operacao"))
+        self.mongo_falhas = Contador("mongo_command_failures_total", "Comandos do MongoDB com erro", ("colecao", "operacao"))
+        self.loop_atraso = Histograma("event_loop_lag_seconds", "Atraso do event loop")
+        self.manutencao_execucoes = Contador("maintenance_runs_total", "Execuções da manutenção por tarefa e resultado", ("tarefa", "resultado"))
+        self.manutencao_duracao = Histograma("maintenance_run_duration_seconds", "Duração de cada execução da manutenção", ("tarefa",))
+        self.manutencao_registros = Contador("maintenance_records_total", "Registros alterados pela manutenção", ("tarefa",))
+        self.coalescidas = Contador("coalesced_requests_total", "Leituras atendidas por uma consulta já em voo", ("tipo",))
+        self.limitadas = Contador("rate_limited_requests_total", "Requisições recusadas pelo limite de taxa", ("rota",))
+        self.consultas_lentas: deque = deque(maxlen=50)
+
+    def registrar_http(self, rota: str, metodo: str, status: int, duracao: float, tamanho: int) -> None:
+        with self.lock:
+            self.http_requisicoes.inc(rota, metodo, str(status))
+            self.http_duracao.observar(duracao, rota, metodo)
+            self.http_tamanho.observar(tamanho, rota, metodo)
+
+    def exportar(self) -> str:
+        with self.lock:
+            linhas = []
+            for metrica in (self.http_requisicoes, self.http_duracao, self.http_tamanho,
+                            self.mongo_duracao, self.mongo_documentos, self.mongo_falhas, self.loop_atraso,
+                            self.manutencao_execucoes, self.manutencao_duracao, self.manutencao_registros,
+                            self.coalescidas, self.limitadas):
+                linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+metricas = Metricas()
+
+def formato_filtro(valor: Any) -> Any:
+    # Só a forma do filtro (campos e operadores); os valores viram o nome do tipo
+    if isinstance(valor, dict):
+        return {k: formato_filtro(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [formato_filtro(v) for v in valor[:3]]
+    return type(valor).__name__
+
+def filtro_do_comando(nome: str, comando: dict) -> Any:
+    if nome in ("find", "count", "distinct"):
+        return comando.get("filter", comando.get("query"))
+    if nome == "aggregate":
+        estagios = comando.get("pipeline") or [{}]
+        return estagios[0].get("$match")
+    if nome == "findAndModify":
+        return comando.get("query")
+    if nome in ("update", "delete"):
+        operacoes = comando.get(nome + "s") or [{}]
+        return operacoes[0].get("q")
+    return None
+
+def documentos_da_resposta(resposta: dict) -> int:
+    cursor = resposta.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    return int(resposta.get("n", 0)) if isinstance(resposta.get("n"), (int, float)) else 0
+
+class MonitorMongo(monitoring.CommandListener):
+    def __init__(self):
+        self.em_andamento: Dict[Tuple[int, int], Tuple[str, Any]] = {}
+
+    def started(self, event):
+        alvo = event.command.get(event.command_name)
+        colecao = event.command.get("collection") if event.command_name == "getMore" else alvo
+        if not isinstance(colecao, str):
+            colecao = "-"
+        self.em_andamento[(event.request_id, event.operation_id)] = (colecao, filtro_do_comando(event.command_name, event.command))
+
+    def succeeded(self, event):
+        colecao, filtro = self.em_andamento.pop((event.request_id, event.operation_id), ("-", None))
+        duracao = event.duration_micros / 1e6
+        with metricas.lock:
+            metricas.mongo_duracao.observar(duracao, colecao, event.command_name)
+            documentos = documentos_da_resposta(event.reply)
+            if documentos:
+                metricas.mongo_documentos.inc(colecao, event.command_name, valor=documentos)
+            if duracao * 1000 >= MONGO_LENTO_MS:
+                metricas.consultas_lentas.append({
+                    "colecao": colecao,
+                    "operacao": event.command_name,
+                    "duracao_ms": round(duracao * 1000, 2),
+                    "filtro": formato_filtro(filtro),
+                    "quando": datetime.utcnow().isoformat(),
+                })
+
+    def failed(self, event):
+        colecao, _ = self.em_andamento.pop((event.request_id, event.operation_id), ("-", None))
+        with metricas.lock:
+            metricas.mongo_falhas.inc(colecao, event.command_name)
+            metricas.mongo_duracao.observar(event.duration_micros / 1e6, colecao, event.command_name)
+
+class MetricasMiddleware:
+    # ASGI puro para não bufferizar respostas em streaming (SSE, exportações, downloads)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        inicio = time.perf_counter()
+        resposta = {"status": 500, "tamanho": 0}
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                resposta["status"] = mensagem["status"]
+            elif mensagem["type"] == "http.response.body":
+                resposta["tamanho"] += len(mensagem.get("body", b""))
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # Rótulo pelo template da rota (ex.: /api/casos/{caso_id}) para não explodir a cardinalidade
+            rota = getattr(scope.get("route"), "path", "desconhecida")
+            metricas.registrar_http(rota, scope["method"], resposta["status"], time.perf_counter() - inicio, resposta["tamanho"])
+
+async def medir_atraso_loop():
+    loop = asyncio.get_running_loop()
+    while True:
+        inicio = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVALO)
+        atraso = max(0.0, loop.time() - inicio - LOOP_LAG_INTERVALO)
+        with metricas.lock:
+            metricas.loop_atraso.observar(atraso)
+
+monitor_mongo = MonitorMongo()
+
 # MongoDB connection
+# Pool, timeouts e compressão vêm do ambiente. O Motor só abre conexões no primeiro uso, então
+# criar o cliente no import é seguro com workers em fork; o lifespan aquece o pool e o fecha.
+# snappy exige o python-snappy instalado; sem ele o pymongo só avisa e segue com os demais.
+MONGO_POOL_MIN = int(os.environ.get('MONGO_POOL_MIN', '10'))
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=int(os.environ.get('MONGO_POOL_MAX', '100')),
+    minPoolSize=MONGO_POOL_MIN,
+    maxIdleTimeMS=int(os.environ.get('MONGO_POOL_OCIOSO_MS', '300000')),
+    waitQueueTimeoutMS=int(os.environ.get('MONGO_POOL_ESPERA_MS', '5000')),
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_SELECAO_MS', '5000')),
+    connectTimeoutMS=int(os.environ.get('MONGO_CONEXAO_MS', '5000')),
+    socketTimeoutMS=int(os.environ.get('MONGO_SOCKET_MS', '30000')),
+    compressors=os.environ.get('MONGO_COMPRESSAO', 'zstd,zlib'),
+    appname=os.environ.get('MONGO_APPNAME', 'advcontrol-api'),
+    event_listeners=[monitor_mongo],
+)
 db = client[os.environ['DB_NAME']]
 
+# Só busca, notificações e exportações leem por db_leitura. Com secondaryPreferred a carga sai do
+# primário, mas essas leituras podem ficar atrás das escritas pelo atraso da replicação (limitado
+# por MONGO_LEITURA_ATRASO_MAX, em segundos, mínimo 90). Rotas com ETag e as que alimentam caches
+# (listagens, dashboard, relatórios) ficam em db: a versão é lida no primário, e um secundário
+# atrasado faria o ETag andar na frente dos dados ou guardaria no cache um retrato velho.
+MONGO_LEITURA = os.environ.get('MONGO_LEITURA', 'primary')
+db_leitura = client.get_database(
+    os.environ['DB_NAME'],
+    read_preference=make_read_preference(
+        read_pref_mode_from_name(MONGO_LEITURA), None, int(os.environ.get('MONGO_LEITURA_ATRASO_MAX', '-1'))
+    ),
+)
+
 # JWT Configuration
 SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
-ALGORITHM = \"HS256\"
+ALGORITHM = "HS256"
 security = HTTPBearer()
 
+# bcrypt roda fora do event loop num pool limitado; o custo é configurável por ambiente
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+auth_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('AUTH_THREADS', '4')), thread_name_prefix="bcrypt")
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '10000'))
+TOKEN_CACHE_TTL = float(os.environ.get('TOKEN_CACHE_TTL', '900'))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await aquecer_pool()
+    await criar_indices()
+    if os.environ.get('MONGO_INDEX_CHECK', '').lower() in ('1', 'true'):
+        await verificar_indices()
+    tarefas_fundo = [asyncio.create_task(medir_atraso_loop())]
+    if LEMBRETES_ATIVO:
+        tarefas_fundo.append(asyncio.create_task(agendador_lembretes()))
+    if MANUTENCAO_ATIVO:
+        tarefas_fundo.append(asyncio.create_task(agendador_manutencao()))
+    estado_servico["pronto"] = True
+    yield
+    estado_servico["pronto"] = False  # o balanceador para de mandar tráfego enquanto drenamos
+    for tarefa in tarefas_fundo:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas_fundo, return_exceptions=True)
+    await shutdown_db_client()
+
 # Create the main app
-app = FastAPI()
-api_router = APIRouter(prefix=\"/api\")
+# orjson serializa as respostas; as listagens paginadas nem passam pelo jsonable_encoder (ver pagina_saida)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+api_router = APIRouter(prefix="/api")
+
+# ==================== DATAS ====================
+# Datas de calendário (prazo, tarefa, vencimento, pagamento) ficam no banco como datetime da
+# meia-noite local em UTC, o que permite faixas indexadas e agregação por dia com fuso; na API
+# continuam "AAAA-MM-DD". "Hoje" é sempre o dia no fuso do escritório.
+
+FUSO_HORARIO = ZoneInfo(os.environ.get('FUSO_HORARIO', 'America/Sao_Paulo'))
+
+# Coleção -> campos de data de calendário
+CAMPOS_DATA = {
+    "prazos": ("data",),
+    "tarefas": ("data",),
+    "financeiro": ("data_vencimento", "data_pagamento"),
+    "notificacoes": ("data",),
+}
+CAMPOS_DATA_ISO = {campo for campos in CAMPOS_DATA.values() for campo in campos}
+
+def hoje_local() -> date:
+    return datetime.now(FUSO_HORARIO).date()
+
+def inicio_dia_utc(dia: date) -> datetime:
+    # Meia-noite local do dia como datetime UTC sem fuso, como o Mongo devolve
+    return datetime.combine(dia, datetime.min.time(), FUSO_HORARIO).astimezone(timezone.utc).replace(tzinfo=None)
+
+def data_local(valor: Any) -> Optional[date]:
+    if isinstance(valor, datetime):
+        instante = valor if valor.tzinfo else valor.replace(tzinfo=timezone.utc)
+        return instante.astimezone(FUSO_HORARIO).date()
+    if isinstance(valor, date):
+        return valor
+    if isinstance(valor, str) and valor:
+        try:
+            return date.fromisoformat(valor[:10])
+        except ValueError:
+            return None
+    return None
+
+def data_bson(valor: Any) -> Any:
+    # Valores que não são data (None, "", texto livre) ficam como estão
+    dia = data_local(valor)
+    return inicio_dia_utc(dia) if dia else valor
+
+def data_iso(valor: Any) -> Any:
+    return data_local(valor).isoformat() if isinstance(valor, datetime) else valor
+
+def datas_bson(colecao: str, dados: dict) -> dict:
+    return {campo: data_bson(dados[campo]) for campo in CAMPOS_DATA.get(colecao, ()) if campo in dados}
+
+DataISO = Annotated[str, BeforeValidator(data_iso)]
+
+async def migrar_datas() -> int:
+    migrados = 0
+    for colecao, campos in CAMPOS_DATA.items():
+        operacoes = []
+        async for registro in db[colecao].find({"$or": [{campo: {"$type": "string"}} for campo in campos]}, {campo: 1 for campo in campos}):
+            operacoes.append(UpdateOne({"_id": registro["_id"]}, {"$set": datas_bson(colecao, registro)}))
+            if len(operacoes) == 1000:
+                migrados += (await db[colecao].bulk_write(operacoes, ordered=False)).modified_count
+                operacoes = []
+        if operacoes:
+            migrados += (await db[colecao].bulk_write(operacoes, ordered=False)).modified_count
+    return migrados
 
 # ==================== MODELS ====================
 
@@ -40,12 +375,12 @@ class PyObjectId(ObjectId):
     @classmethod
     def validate(cls, v):
         if not ObjectId.is_valid(v):
-            raise ValueError(\"Invalid ObjectId\")
+            raise ValueError("Invalid ObjectId")
         return ObjectId(v)
     
     @classmethod
     def __get_pydantic_json_schema__(cls, schema, handler):
-        schema.update(type=\"string\")
+        schema.update(type="string")
         return schema
 
 # User Models
@@ -66,53 +401,65 @@ class UserResponse(BaseModel):
 
 # Cliente Models
 class ClienteCreate(BaseModel):
-    tipo: str  # \"PF\" ou \"PJ\"
+    tipo: str  # "PF" ou "PJ"
     nome: str
     cpf_cnpj: str
-    telefone: Optional[str] = \"\"
-    email: Optional[str] = \"\"
-    endereco: Optional[str] = \"\"
-    observacoes: Optional[str] = \"\"
+    telefone: Optional[str] = ""
+    email: Optional[str] = ""
+    endereco: Optional[str] = ""
+    observacoes: Optional[str] = ""
     tags: Optional[List[str]] = []
 
 class Cliente(ClienteCreate):
     id: str
-    historico_atendimentos: List[dict] = []
+    historico_atendimentos: List[dict] = []  # só os últimos atendimentos; a lista completa fica em db.atendimentos
+    total_atendimentos: int = 0
     criado_em: datetime
 
 class AtendimentoCreate(BaseModel):
     descricao: str
 
+class Atendimento(AtendimentoCreate):
+    id: str
+    cliente_id: str
+    data: str
+
 # Caso Models
 class CasoCreate(BaseModel):
     titulo: str
-    area: str  # \"família\", \"cível\", \"trabalhista\", etc.
-    numero_processo: Optional[str] = \"\"
-    tribunal: Optional[str] = \"\"
-    vara: Optional[str] = \"\"
-    comarca: Optional[str] = \"\"
-    partes: Optional[str] = \"\"
-    status: str = \"novo\"  # \"novo\", \"em andamento\", \"aguardando\", \"concluído\"
-    prioridade: str = \"media\"  # \"baixa\", \"media\", \"alta\"
-    proxima_acao: Optional[str] = \"\"
+    area: str  # "família", "cível", "trabalhista", etc.
+    numero_processo: Optional[str] = ""
+    tribunal: Optional[str] = ""
+    vara: Optional[str] = ""
+    comarca: Optional[str] = ""
+    partes: Optional[str] = ""
+    status: str = "novo"  # "novo", "em andamento", "aguardando", "concluído"
+    prioridade: str = "media"  # "baixa", "media", "alta"
+    proxima_acao: Optional[str] = ""
     cliente_id: str
 
 class Caso(CasoCreate):
     id: str
-    timeline: List[dict] = []
+    timeline: List[dict] = []  # só as últimas movimentações; a lista completa fica em db.movimentacoes
+    total_movimentacoes: int = 0
     anexos: List[str] = []
     criado_em: datetime
 
 class MovimentacaoCreate(BaseModel):
     descricao: str
 
+class Movimentacao(MovimentacaoCreate):
+    id: str
+    caso_id: str
+    data: str
+
 # Prazo Models
 class PrazoCreate(BaseModel):
-    tipo: str  # \"prazo\", \"audiência\", \"reunião\"
+    tipo: str  # "prazo", "audiência", "reunião"
     titulo: str
-    data: str  # ISO format
+    data: DataISO  # "AAAA-MM-DD"
     hora: str
-    descricao: Optional[str] = \"\"
+    descricao: Optional[str] = ""
     caso_id: Optional[str] = None
     cliente_id: Optional[str] = None
     lembretes: List[int] = [7, 3, 1]  # dias antes
@@ -121,13 +468,17 @@ class Prazo(PrazoCreate):
     id: str
     criado_em: datetime
 
+class ContagemDia(BaseModel):
+    data: str  # "AAAA-MM-DD"
+    total: int
+
 # Tarefa Models
 class TarefaCreate(BaseModel):
     titulo: str
-    descricao: Optional[str] = \"\"
-    data: Optional[str] = None
-    prioridade: str = \"media\"
-    status: str = \"a_fazer\"  # \"a_fazer\", \"fazendo\", \"concluido\"
+    descricao: Optional[str] = ""
+    data: Optional[DataISO] = None
+    prioridade: str = "media"
+    status: str = "a_fazer"  # "a_fazer", "fazendo", "concluido"
     caso_id: Optional[str] = None
     cliente_id: Optional[str] = None
 
@@ -136,26 +487,33 @@ class Tarefa(TarefaCreate):
     criado_em: datetime
 
 # Documento Models
-class DocumentoCreate(BaseModel):
+class DocumentoBase(BaseModel):
     nome: str
     tipo: str
-    conteudo_base64: str
     caso_id: Optional[str] = None
     cliente_id: Optional[str] = None
 
-class Documento(DocumentoCreate):
+class DocumentoCreate(DocumentoBase):
+    conteudo_base64: str
+
+class DocumentoVinculo(DocumentoBase):
+    sha256: str
+
+class Documento(DocumentoBase):
     id: str
+    tamanho: int = 0
+    sha256: Optional[str] = None
     criado_em: datetime
 
 # Financeiro Models
 class FinanceiroCreate(BaseModel):
-    tipo: str  # \"receber\" ou \"pagar\"
+    tipo: str  # "receber" ou "pagar"
     descricao: str
     valor: float
-    categoria: str  # \"honorários\", \"custas\", \"despesas\"
-    status: str = \"pendente\"  # \"pendente\", \"pago\", \"atrasado\"
-    data_vencimento: str
-    data_pagamento: Optional[str] = None
+    categoria: str  # "honorários", "custas", "despesas"
+    status: str = "pendente"  # "pendente", "pago", "atrasado"
+    data_vencimento: DataISO
+    data_pagamento: Optional[DataISO] = None
     caso_id: Optional[str] = None
     cliente_id: Optional[str] = None
 
@@ -163,6 +521,78 @@ class Financeiro(FinanceiroCreate):
     id: str
     criado_em: datetime
 
+# Caso Completo Model
+class CasoCompleto(BaseModel):
+    caso: Caso
+    cliente: Optional[Cliente] = None
+    prazos: List[Prazo] = []
+    tarefas: List[Tarefa] = []
+    documentos: List[Documento] = []
+    financeiro: List[Financeiro] = []
+    truncado: List[str] = []  # listas que passaram de COMPLETO_LIMITE; o restante vem das listagens com caso_id
+
+# Relatorio Models
+class FluxoCaixaMes(BaseModel):
+    mes: str  # "AAAA-MM"
+    receber: float
+    pagar: float
+    saldo: float
+
+class FaixaAging(BaseModel):
+    faixa: str  # "0-30", "31-60", "61-90", "90+" dias de atraso
+    quantidade: int
+    valor: float
+
+class TotalCategoria(BaseModel):
+    categoria: str
+    receber: float
+    pagar: float
+
+class RecebivelAgrupado(BaseModel):
+    id: str
+    quantidade: int
+    total: float
+    vencido: float
+
+class ResumoFinanceiro(BaseModel):
+    receber: float  # a receber pendente
+    pagar: float  # a pagar pendente
+    atrasado: float
+
+# Pagination Models
+T = TypeVar("T")
+
+class Pagina(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+# Notificacao Models
+class Notificacao(BaseModel):
+    id: str
+    prazo_id: str
+    titulo: str
+    data: DataISO
+    dias: int
+    lida: bool = False
+    disparado_em: datetime
+
+# Sync Models
+class Exclusao(BaseModel):
+    colecao: str
+    id: str
+    versao: int
+
+class SyncResposta(BaseModel):
+    clientes: List[Cliente] = []
+    casos: List[Caso] = []
+    prazos: List[Prazo] = []
+    tarefas: List[Tarefa] = []
+    financeiro: List[Financeiro] = []
+    documentos: List[Documento] = []
+    exclusoes: List[Exclusao] = []
+    token: str
+    mais: bool
+
 # Dashboard Models
 class DashboardStats(BaseModel):
     prazos_hoje: int
@@ -176,41 +606,528 @@ class DashboardStats(BaseModel):
 # ==================== AUTH FUNCTIONS ====================
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(auth_executor, hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(auth_executor, verify_password, password, hashed)
+
 def create_token(user_id: str) -> str:
     payload = {
-        \"user_id\": user_id,
-        \"exp\": datetime.utcnow() + timedelta(days=30)
+        "user_id": user_id,
+        "exp": datetime.utcnow() + timedelta(days=30)
     }
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    token = credentials.credentials
+    # Tokens já verificados ficam em cache pelo digest, nunca além do próprio exp
+    chave = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    user_id = await token_cache.get(chave)
+    if user_id is not None:
+        return user_id
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload[\"user_id\"]
-    except:
-        raise HTTPException(status_code=401, detail=\"Token inválido\")
+        user_id = payload["user_id"]
+    except (jwt.PyJWTError, KeyError):
+        raise HTTPException(status_code=401, detail="Token inválido")
+    ttl = TOKEN_CACHE_TTL
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        await token_cache.set(chave, user_id, ttl=ttl)
+    return user_id
+
+# ==================== PAGINATION ====================
+
+Ordem = Literal["asc", "desc"]
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+def encode_cursor(sort_key: str, ordem: str, doc: dict) -> str:
+    # Cursor opaco: chave de ordenação + valor + _id do último item da página
+    raw = json_util.dumps({"s": sort_key, "o": ordem, "v": doc.get(sort_key), "id": doc["_id"]})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip("=")
+
+def decode_cursor(cursor: str, sort_key: str, ordem: str) -> Tuple[object, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if data["s"] != sort_key or data["o"] != ordem or not isinstance(data["id"], ObjectId):
+            raise ValueError("cursor de outra ordenação")
+        return data["v"], data["id"]
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+async def paginar(collection, query: dict, sort_key: str, ordem: str, cursor: Optional[str], limit: int, projection: Optional[dict] = None) -> Tuple[List[dict], Optional[str]]:
+    # Páginas idênticas pedidas ao mesmo tempo pelo mesmo usuário, na mesma versão, saem de uma única consulta
+    versao = versao_lida.get()
+    if versao is None:
+        # Sem a versão do ETag não dá para saber se a consulta em voo começou antes de uma escrita
+        return await buscar_pagina(collection, query, sort_key, ordem, cursor, limit, projection)
+    chave = (versao, collection.name, repr(query), sort_key, ordem, cursor, limit, repr(projection))
+    return await em_voo.executar(
+        query["user_id"], chave, collection.name,
+        lambda: buscar_pagina(collection, query, sort_key, ordem, cursor, limit, projection)
+    )
+
+async def buscar_pagina(collection, query: dict, sort_key: str, ordem: str, cursor: Optional[str], limit: int, projection: Optional[dict] = None) -> Tuple[List[dict], Optional[str]]:
+    direcao = 1 if ordem == "asc" else -1
+    op = "$gt" if direcao == 1 else "$lt"
+    query = dict(query)
+    if cursor:
+        valor, ultimo_id = decode_cursor(cursor, sort_key, ordem)
+        if sort_key == "_id":
+            query["_id"] = {op: ultimo_id}
+        else:
+            query["$or"] = [
+                {sort_key: {op: valor}},
+                {sort_key: valor, "_id": {op: ultimo_id}},
+            ]
+    sort = [("_id", direcao)] if sort_key == "_id" else [(sort_key, direcao), ("_id", direcao)]
+    # Busca um item a mais para saber se existe próxima página
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(sort_key, ordem, docs[-1])
+
+# Saída rápida das listagens: o find já traz só os campos do modelo (user_id e campos internos
+# ficam no banco) e os documentos, validados na escrita, vão direto para o orjson sem construir
+# o modelo nem revalidar contra o response_model.
+
+@lru_cache(maxsize=None)
+def projecao_saida(modelo: Type[BaseModel]) -> Dict[str, int]:
+    return {campo: 1 for campo in modelo.model_fields if campo != "id"}
+
+@lru_cache(maxsize=None)
+def padroes_saida(modelo: Type[BaseModel]) -> Dict[str, Any]:
+    # Documentos antigos podem não ter campos opcionais adicionados depois
+    return {nome: campo.get_default(call_default_factory=True) for nome, campo in modelo.model_fields.items() if not campo.is_required()}
+
+def documento_saida(doc: dict, padroes: Dict[str, Any]) -> dict:
+    saida = {**padroes, **doc}
+    saida["id"] = str(saida.pop("_id"))
+    for campo in CAMPOS_DATA_ISO:
+        if isinstance(saida.get(campo), datetime):
+            saida[campo] = data_iso(saida[campo])
+    return saida
+
+def resposta_saida(conteudo: Any, response: Optional[Response] = None) -> ORJSONResponse:
+    resposta = ORJSONResponse(conteudo)
+    if response is not None:
+        # Resposta devolvida diretamente não herda os cabeçalhos definidos nas dependências (ETag)
+        resposta.headers.update({k: v for k, v in response.headers.items() if k != "content-length"})
+    return resposta
+
+def pagina_saida(docs: List[dict], next_cursor: Optional[str], modelo: Type[BaseModel], response: Optional[Response] = None) -> ORJSONResponse:
+    padroes = padroes_saida(modelo)
+    return resposta_saida({"items": [documento_saida(d, padroes) for d in docs], "next_cursor": next_cursor}, response)
+
+# ==================== INDEXES ====================
+
+SYNC_RETENCAO_DIAS = int(os.environ.get('SYNC_RETENCAO_DIAS', '90'))
+
+def _idx(*campos: str, **kwargs) -> IndexModel:
+    return IndexModel([(campo, ASCENDING) for campo in campos], **kwargs)
+
+# Índices declarados por coleção; cobrem os filtros e ordenações usados pelas rotas
+INDICES = {
+    "users": [
+        _idx("email", unique=True),
+    ],
+    "clientes": [
+        _idx("user_id", "_id"),
+        _idx("user_id", "versao"),
+        _idx("user_id", "criado_em", "_id"),
+        _idx("user_id", "nome", "_id"),
+        _idx("user_id", "termos_busca"),
+    ],
+    "casos": [
+        _idx("user_id", "_id"),
+        _idx("user_id", "versao"),
+        _idx("user_id", "criado_em", "_id"),
+        _idx("user_id", "status"),
+        _idx("user_id", "cliente_id"),
+        _idx("user_id", "termos_busca"),
+        # atualizar_contadores agrupa todos os usuários por status sem filtrar user_id
+        _idx("status", "user_id"),
+    ],
+    "atendimentos": [
+        _idx("user_id", "cliente_id", "_id"),
+        _idx("user_id", "cliente_id", "data", "_id"),
+    ],
+    "movimentacoes": [
+        _idx("user_id", "caso_id", "_id"),
+        _idx("user_id", "caso_id", "data", "_id"),
+    ],
+    "prazos": [
+        _idx("user_id", "_id"),
+        _idx("user_id", "versao"),
+        _idx("proximo_lembrete"),
+        _idx("user_id", "criado_em", "_id"),
+        _idx("user_id", "data", "_id"),
+        _idx("user_id", "caso_id", "_id"),
+        _idx("user_id", "caso_id", "data", "_id"),
+        _idx("user_id", "cliente_id", "_id"),
+    ],
+    "tarefas": [
+        _idx("user_id", "_id"),
+        _idx("user_id", "versao"),
+        _idx("user_id", "criado_em", "_id"),
+        _idx("user_id", "status"),
+        _idx("status", "user_id"),
+        _idx("user_id", "caso_id", "_id"),
+        _idx("user_id", "caso_id", "criado_em", "_id"),
+        _idx("user_id", "cliente_id", "_id"),
+    ],
+    "documentos": [
+        _idx("user_id", "_id"),
+        _idx("user_id", "versao"),
+        _idx("user_id", "criado_em", "_id"),
+        _idx("user_id", "caso_id", "_id"),
+        _idx("user_id", "caso_id", "criado_em", "_id"),
+        _idx("user_id", "cliente_id", "_id"),
+    ],
+    "notificacoes": [
+        _idx("prazo_id", "dias", unique=True),
+        _idx("user_id", "_id"),
+        _idx("user_id", "disparado_em", "_id"),
+        _idx("user_id", "data"),
+    ],
+    "exclusoes": [
+        _idx("user_id", "versao"),
+        _idx("excluido_em", expireAfterSeconds=SYNC_RETENCAO_DIAS * 86400),
+    ],
+    "blobs": [
+        _idx("user_id", "sha256", unique=True),
+    ],
+    "financeiro": [
+        _idx("user_id", "_id"),
+        _idx("user_id", "versao"),
+        _idx("user_id", "criado_em", "_id"),
+        _idx("user_id", "data_vencimento", "_id"),
+        _idx("user_id", "tipo", "data_vencimento"),
+        _idx("status", "data_vencimento"),
+        _idx("user_id", "caso_id", "_id"),
+        _idx("user_id", "caso_id", "data_vencimento", "_id"),
+        _idx("user_id", "cliente_id", "_id"),
+    ],
+}
+
+# Formatos de consulta usados pelas rotas: (coleção, filtro, ordenação)
+_UID = "000000000000000000000000"
+FORMATOS_CONSULTA = [
+    *[(nome, {"user_id": _UID, "versao": {"$gt": 0}}, [("versao", 1)]) for nome in ("clientes", "casos", "prazos", "tarefas", "documentos", "financeiro", "exclusoes")],
+    ("users", {"email": "check@example.com"}, None),
+    ("clientes", {"user_id": _UID}, [("_id", 1)]),
+    ("clientes", {"user_id": _UID}, [("criado_em", 1), ("_id", 1)]),
+    ("clientes", {"user_id": _UID}, [("nome", 1), ("_id", 1)]),
+    ("casos", {"user_id": _UID}, [("_id", 1)]),
+    ("casos", {"user_id": _UID}, [("criado_em", 1), ("_id", 1)]),
+    ("casos", {"user_id": _UID, "status": {"$in": ["novo", "em andamento"]}}, None),
+    ("casos", {"status": {"$in": ["novo", "em andamento"]}}, None),
+    *[(nome, {"user_id": _UID, "termos_busca": {"$regex": "^silva"}}, None) for nome in ("clientes", "casos")],
+    *[(nome, {"user_id": _UID, "termos_busca": {"$all": ["silva"]}}, None) for nome in ("clientes", "casos")],
+    ("atendimentos", {"user_id": _UID, "cliente_id": _UID}, [("data", -1), ("_id", -1)]),
+    ("movimentacoes", {"user_id": _UID, "caso_id": _UID}, [("data", -1), ("_id", -1)]),
+    ("prazos", {"user_id": _UID}, [("_id", 1)]),
+    ("prazos", {"proximo_lembrete": {"$lte": datetime(2024, 1, 1)}}, [("proximo_lembrete", 1)]),
+    ("notificacoes", {"user_id": _UID, "data": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 1, 9)}}, None),
+    ("notificacoes", {"user_id": _UID}, [("disparado_em", -1), ("_id", -1)]),
+    ("prazos", {"user_id": _UID}, [("criado_em", 1), ("_id", 1)]),
+    ("prazos", {"user_id": _UID}, [("data", 1), ("_id", 1)]),
+    ("prazos", {"user_id": _UID, "data": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}, [("data", 1), ("_id", 1)]),
+    ("prazos", {"user_id": _UID, "data": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 1, 9)}}, None),
+    ("tarefas", {"user_id": _UID}, [("_id", 1)]),
+    ("tarefas", {"user_id": _UID}, [("criado_em", 1), ("_id", 1)]),
+    ("tarefas", {"user_id": _UID, "status": {"$ne": "concluido"}}, None),
+    ("tarefas", {"status": {"$ne": "concluido"}}, None),
+    ("documentos", {"user_id": _UID}, [("_id", 1)]),
+    *[(nome, {"user_id": _UID, campo: _UID}, [("_id", 1)]) for nome in ("prazos", "tarefas", "documentos", "financeiro") for campo in ("caso_id", "cliente_id")],
+    # Listas relacionadas de /casos/{id}/completo (RELACIONADOS_CASO)
+    ("prazos", {"user_id": _UID, "caso_id": _UID}, [("data", 1), ("_id", 1)]),
+    *[(nome, {"user_id": _UID, "caso_id": _UID}, [("criado_em", -1), ("_id", -1)]) for nome in ("tarefas", "documentos")],
+    ("financeiro", {"user_id": _UID, "caso_id": _UID}, [("data_vencimento", 1), ("_id", 1)]),
+    ("blobs", {"user_id": _UID, "sha256": "0" * 64}, None),
+    ("financeiro", {"user_id": _UID}, [("_id", 1)]),
+    ("financeiro", {"user_id": _UID}, [("criado_em", 1), ("_id", 1)]),
+    ("financeiro", {"user_id": _UID}, [("data_vencimento", 1), ("_id", 1)]),
+    ("financeiro", {"user_id": _UID, "data_vencimento": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}, [("data_vencimento", 1), ("_id", 1)]),
+    ("financeiro", {"user_id": _UID, "tipo": "receber", "status": {"$in": ["pendente", "atrasado"]}, "data_vencimento": {"$lt": datetime(2024, 2, 1)}}, None),
+    ("financeiro", {"status": "pendente", "data_vencimento": {"$lt": datetime(2024, 1, 1)}}, None),
+]
+
+async def criar_indices():
+    for nome, indices in INDICES.items():
+        try:
+            await db[nome].create_indexes(indices)
+        except PyMongoError:
+            logger.exception("Falha ao criar índices da coleção %s", nome)
+
+def _estagios(plano: dict):
+    # Percorre a árvore do plano (inputStage/inputStages) devolvendo os nomes dos estágios
+    if not isinstance(plano, dict):
+        return
+    if "stage" in plano:
+        yield plano["stage"]
+    for chave in ("inputStage", "queryPlan"):
+        if chave in plano:
+            yield from _estagios(plano[chave])
+    for filho in plano.get("inputStages", []):
+        yield from _estagios(filho)
+
+async def verificar_indices() -> List[dict]:
+    relatorio = []
+    for nome, filtro, ordenacao in FORMATOS_CONSULTA:
+        cursor = db[nome].find(filtro)
+        if ordenacao:
+            cursor = cursor.sort(ordenacao)
+        plano = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        estagios = list(_estagios(plano))
+        item = {
+            "colecao": nome, "filtro": filtro, "ordenacao": ordenacao, "estagios": estagios,
+            "collscan": "COLLSCAN" in estagios,
+            # Ordenação que nenhum índice entrega: o servidor ordena em memória
+            "sort_em_memoria": "SORT" in estagios,
+        }
+        if item["collscan"] or item["sort_em_memoria"]:
+            logger.warning("Consulta sem índice adequado em %s: filtro=%s ordenacao=%s estagios=%s", nome, filtro, ordenacao, estagios)
+        relatorio.append(item)
+    return relatorio
+
+# ==================== CACHE ====================
+
+class CacheBackend:
+    # Interface mínima para trocar o armazenamento do cache (ex.: Redis) sem mexer nas rotas
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, geracao: Optional[int] = None, tamanho: int = 0) -> None:
+        # Com geracao, só grava se a chave não foi apagada desde que ela foi lida (ver geracao());
+        # tamanho (bytes) conta para o limite de memória quando o backend tem um
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def geracao(self, key: str) -> int:
+        # Muda a cada delete: capturada antes de calcular um valor, diz se ele ficou velho no caminho
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return 0
+
+class MemoryCache(CacheBackend):
+    # LRU em memória do processo com expiração por TTL, limitado em entradas e, opcionalmente, em bytes
+    def __init__(self, maxsize: int, ttl: float, maxbytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self._dados: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._geracoes: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self._dados.get(key)
+        if item is None:
+            return None
+        expira_em, value, _ = item
+        if expira_em < time.monotonic():
+            self._remover(key)
+            return None
+        self._dados.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, geracao: Optional[int] = None, tamanho: int = 0) -> None:
+        if geracao is not None and geracao != self.geracao(key):
+            return
+        self._remover(key)
+        if self.maxbytes is not None and tamanho > self.maxbytes:
+            return  # maior que o cache inteiro: nem entra
+        self._dados[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, tamanho)
+        self.bytes += tamanho
+        while len(self._dados) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+            self._remover(next(iter(self._dados)))
+
+    def _remover(self, key: str) -> None:
+        item = self._dados.pop(key, None)
+        if item is not None:
+            self.bytes -= item[2]
+
+    async def delete(self, key: str) -> None:
+        self._remover(key)
+        self._geracoes[key] = self._geracoes.get(key, 0) + 1
+
+    def geracao(self, key: str) -> int:
+        return self._geracoes.get(key, 0)
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+class DashboardCache:
+    # Snapshot de DashboardStats por usuário. O dia de referência fica junto do valor,
+    # então a virada da meia-noite vira um miss e os campos relativos a "hoje" são recalculados.
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def obter(self, user_id: str, hoje) -> Optional[DashboardStats]:
+        item = await self.backend.get(f"dashboard:{user_id}")
+        if item is None or item["dia"] != str(hoje):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return DashboardStats(**item["stats"])
+
+    async def guardar(self, user_id: str, hoje, stats: DashboardStats, geracao: Optional[int] = None) -> None:
+        # Um cálculo que começou antes de uma escrita não pode voltar ao cache depois do invalidar
+        await self.backend.set(f"dashboard:{user_id}", {"dia": str(hoje), "stats": stats.dict()}, geracao=geracao)
+
+    def geracao(self, user_id: str) -> int:
+        return self.backend.geracao(f"dashboard:{user_id}")
+
+    async def invalidar(self, user_id: str) -> None:
+        await self.backend.delete(f"dashboard:{user_id}")
+
+    def estatisticas(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entradas": len(self.backend),
+        }
+
+dashboard_cache = DashboardCache(MemoryCache(
+    maxsize=int(os.environ.get('DASHBOARD_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('DASHBOARD_CACHE_TTL', '300')),
+))
+
+token_cache = MemoryCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# Lançamentos financeiros já em colunas (DataFrame) por usuário, para os relatórios
+# Um frame de 100k lançamentos ocupa uns 16 MB: o limite que vale é o de bytes
+relatorios_cache = MemoryCache(
+    maxsize=int(os.environ.get('RELATORIOS_CACHE_SIZE', '64')),
+    ttl=float(os.environ.get('RELATORIOS_CACHE_TTL', '600')),
+    maxbytes=int(os.environ.get('RELATORIOS_CACHE_MB', '128')) * 1024 * 1024,
+)
+
+# ==================== CONTROLE DE CARGA ====================
+# Leituras idênticas e simultâneas do mesmo usuário (dashboard, agenda e financeiro abrindo juntos,
+# pull-to-refresh repetido) compartilham uma única consulta em voo. E cada usuário tem um balde de
+# tokens por rota: quem passa do limite recebe 429 com Retry-After em vez de ocupar o event loop.
+
+LIMITE_TAXA = float(os.environ.get('LIMITE_TAXA', '5'))  # requisições/s por usuário e rota; 0 desliga
+LIMITE_RAJADA = float(os.environ.get('LIMITE_RAJADA', '20'))
+LIMITE_BALDES = int(os.environ.get('LIMITE_BALDES', '100000'))
+
+def ler_limites_rotas(valor: str) -> Dict[str, Tuple[float, float]]:
+    # "rota=taxa:rajada,..." com a rota no formato do template, ex.: "/api/dashboard=2:10,/api/casos/exportar=0.1:2"
+    limites = {}
+    for item in filter(None, (parte.strip() for parte in valor.split(","))):
+        rota, _, taxa_rajada = item.partition("=")
+        taxa, _, rajada = taxa_rajada.partition(":")
+        limites[rota.strip()] = (float(taxa), float(rajada or taxa))
+    return limites
+
+LIMITE_ROTAS = ler_limites_rotas(os.environ.get('LIMITE_TAXA_ROTAS', ''))
+
+class EmVoo:
+    # Single-flight por usuário: quem chega com a mesma chave espera o resultado de quem já está
+    # consultando. O resultado é compartilhado entre todos e não deve ser alterado por quem recebe.
+    def __init__(self):
+        self._voos: Dict[str, Dict[Any, asyncio.Future]] = {}
+
+    async def executar(self, user_id: str, chave: Any, tipo: str, funcao: Callable[[], Awaitable[Any]]) -> Any:
+        voos = self._voos.setdefault(user_id, {})
+        futuro = voos.get(chave)
+        if futuro is not None:
+            with metricas.lock:
+                metricas.coalescidas.inc(tipo)
+        else:
+            futuro = voos[chave] = asyncio.ensure_future(funcao())
+            futuro.add_done_callback(lambda f: self._encerrar(user_id, chave, f))
+        # shield: se um dos clientes desconectar, a consulta continua para os demais
+        return await asyncio.shield(futuro)
+
+    def _encerrar(self, user_id: str, chave: Any, futuro: asyncio.Future) -> None:
+        voos = self._voos.get(user_id)
+        if voos is not None and voos.get(chave) is futuro:
+            del voos[chave]
+            if not voos:
+                del self._voos[user_id]
+        if not futuro.cancelled():
+            futuro.exception()  # marca como lida mesmo que todos os clientes tenham desistido
+
+    def invalidar(self, user_id: str) -> None:
+        # Depois de uma escrita, ninguém mais entra numa consulta que começou antes dela
+        self._voos.pop(user_id, None)
+
+class LimitadorTaxa:
+    # Balde de tokens por (usuário, rota); os mais antigos saem quando passa de maxsize
+    def __init__(self, taxa: float, rajada: float, por_rota: Dict[str, Tuple[float, float]], maxsize: int):
+        self.taxa, self.rajada, self.por_rota, self.maxsize = taxa, rajada, por_rota, maxsize
+        self._baldes: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+
+    def consumir(self, user_id: str, rota: str) -> float:
+        # Devolve 0 se a requisição passa, senão quantos segundos faltam para o próximo token
+        taxa, rajada = self.por_rota.get(rota, (self.taxa, self.rajada))
+        if taxa <= 0:
+            return 0.0
+        agora = time.monotonic()
+        chave = (user_id, rota)
+        tokens, ultimo = self._baldes.get(chave, (rajada, agora))
+        tokens = min(rajada, tokens + (agora - ultimo) * taxa)
+        espera = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            espera = (1 - tokens) / taxa
+        self._baldes[chave] = (tokens, agora)
+        self._baldes.move_to_end(chave)
+        while len(self._baldes) > self.maxsize:
+            self._baldes.popitem(last=False)
+        return espera
+
+em_voo = EmVoo()
+limitador = LimitadorTaxa(LIMITE_TAXA, LIMITE_RAJADA, LIMITE_ROTAS, LIMITE_BALDES)
+
+async def usuario_limitado(request: Request, user_id: str = Depends(get_current_user)) -> str:
+    rota = getattr(request.scope.get("route"), "path", request.url.path)
+    espera = limitador.consumir(user_id, rota)
+    if espera > 0:
+        with metricas.lock:
+            metricas.limitadas.inc(rota)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas requisições, tente novamente em instantes",
+            headers={"Retry-After": str(math.ceil(espera))},
+        )
+    return user_id
 
 # ==================== AUTH ROUTES ====================
 
-@api_router.post(\"/auth/register\", response_model=UserResponse)
+@api_router.post("/auth/register", response_model=UserResponse)
 async def register(user: UserRegister):
     # Check if user exists
-    existing = await db.users.find_one({\"email\": user.email})
+    existing = await db.users.find_one({"email": user.email})
     if existing:
-        raise HTTPException(status_code=400, detail=\"Email já cadastrado\")
+        raise HTTPException(status_code=400, detail="Email já cadastrado")
     
     # Create user
     user_dict = {
-        \"email\": user.email,
-        \"senha_hash\": hash_password(user.password),
-        \"nome\": user.nome,
-        \"criado_em\": datetime.utcnow()
+        "email": user.email,
+        "senha_hash": await hash_password_async(user.password),
+        "nome": user.nome,
+        "criado_em": datetime.utcnow()
     }
     result = await db.users.insert_one(user_dict)
     user_id = str(result.inserted_id)
@@ -224,353 +1141,1996 @@ async def register(user: UserRegister):
         token=token
     )
 
-@api_router.post(\"/auth/login\", response_model=UserResponse)
+@api_router.post("/auth/login", response_model=UserResponse)
 async def login(credentials: UserLogin):
-    user = await db.users.find_one({\"email\": credentials.email})
-    if not user or not verify_password(credentials.password, user[\"senha_hash\"]):
-        raise HTTPException(status_code=401, detail=\"Email ou senha inválidos\")
+    user = await db.users.find_one({"email": credentials.email})
+    if not user or not await verify_password_async(credentials.password, user["senha_hash"]):
+        raise HTTPException(status_code=401, detail="Email ou senha inválidos")
     
-    token = create_token(str(user[\"_id\"]))
+    token = create_token(str(user["_id"]))
     
     return UserResponse(
-        id=str(user[\"_id\"]),
-        email=user[\"email\"],
-        nome=user[\"nome\"],
+        id=str(user["_id"]),
+        email=user["email"],
+        nome=user["nome"],
         token=token
     )
 
+# ==================== EVENTS ====================
+# Barramento pub/sub por usuário que alimenta /events (SSE). MemoryEventBus entrega só neste
+# processo; com vários workers, uma subclasse pode publicar num broker (ou ler change streams
+# do MongoDB) e chamar entregar() ao receber.
+
+EVENTS_FILA = int(os.environ.get('EVENTS_FILA', '100'))
+EVENTS_MAX_CONEXOES = int(os.environ.get('EVENTS_MAX_CONEXOES', '5'))
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', '15'))
+
+class EventBus:
+    def __init__(self, tamanho_fila: int, max_conexoes: int):
+        self.tamanho_fila = tamanho_fila
+        self.max_conexoes = max_conexoes
+        self._assinantes: Dict[str, List[asyncio.Queue]] = {}
+
+    def assinar(self, user_id: str) -> asyncio.Queue:
+        filas = self._assinantes.setdefault(user_id, [])
+        if len(filas) >= self.max_conexoes:
+            raise HTTPException(status_code=429, detail="Muitas conexões de eventos abertas")
+        fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        filas.append(fila)
+        return fila
+
+    def cancelar(self, user_id: str, fila: asyncio.Queue):
+        filas = self._assinantes.get(user_id, [])
+        if fila in filas:
+            filas.remove(fila)
+        if not filas:
+            self._assinantes.pop(user_id, None)
+
+    def entregar(self, user_id: str, evento: dict):
+        for fila in self._assinantes.get(user_id, []):
+            try:
+                fila.put_nowait(evento)
+            except asyncio.QueueFull:
+                # Cliente lento: descarta o que está pendente e pede para ele ressincronizar
+                while not fila.empty():
+                    fila.get_nowait()
+                fila.put_nowait({"acao": "resync"})
+
+    async def publicar(self, user_id: str, evento: dict):
+        raise NotImplementedError
+
+class MemoryEventBus(EventBus):
+    async def publicar(self, user_id: str, evento: dict):
+        self.entregar(user_id, evento)
+
+event_bus: EventBus = MemoryEventBus(EVENTS_FILA, EVENTS_MAX_CONEXOES)
+
+async def notificar_alteracao(user_id: str, colecao: str, acao: str, registro_id: Optional[str] = None, **extra):
+    em_voo.invalidar(user_id)
+    await dashboard_cache.invalidar(user_id)
+    if colecao == "financeiro":
+        await relatorios_cache.delete(f"financeiro:{user_id}")
+    if colecao in COLECOES_CONTADORES:
+        # Nova geração: o contador fica velho e uma contagem iniciada antes desta escrita não o regrava
+        await db.contadores.update_one({"_id": user_id}, {"$inc": {"geracao": 1}}, upsert=True)
+    evento = {"colecao": colecao, "acao": acao}
+    if registro_id:
+        evento["id"] = registro_id
+    evento.update(extra)
+    await event_bus.publicar(user_id, evento)
+
+def formatar_sse(evento: dict) -> str:
+    return f"event: {evento.get('colecao', 'sistema')}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+@api_router.get("/events")
+async def eventos(user_id: str = Depends(get_current_user)):
+    fila = event_bus.assinar(user_id)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"  # intervalo de reconexão do EventSource
+            while True:
+                try:
+                    evento = await asyncio.wait_for(fila.get(), timeout=EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield formatar_sse(evento)
+        finally:
+            event_bus.cancelar(user_id, fila)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ==================== SYNC ====================
+# Cada escrita recebe uma versão do contador do usuário (db.versoes); exclusões viram
+# tombstones em db.exclusoes. /sync devolve tudo com versão maior que a do token, e as
+# listas usam a versão atual como ETag para responder 304 quando nada mudou.
+
+SYNC_COLECOES = {
+    "clientes": Cliente,
+    "casos": Caso,
+    "prazos": Prazo,
+    "tarefas": Tarefa,
+    "financeiro": Financeiro,
+    "documentos": Documento,
+}
+
+# A versão é reservada antes da escrita e só conta depois dela. Cada reserva (com quantas
+# versões levou) fica em versoes.pendentes até ser confirmada; "estavel" só avança quando não há
+# nenhuma em aberto (tudo até ali já foi gravado) e é o teto do /sync. O ETag usa a versão menos
+# as reservadas em aberto. Reservas de um processo que caiu expiram em VERSAO_PENDENTE_TTL
+# segundos para não travar o /sync do usuário.
+VERSAO_PENDENTE_TTL = float(os.environ.get('VERSAO_PENDENTE_TTL', '300'))
+
+@asynccontextmanager
+async def carimbo(user_id: str, n: int = 1):
+    # Reserva n versões; entrega a última (as anteriores são versao - n + 1 ... versao)
+    pendente = ObjectId()
+    agora = datetime.utcnow()
+    contador = await db.versoes.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"versao": n}, "$push": {"pendentes": {"id": pendente, "em": agora, "n": n}}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    try:
+        yield {"versao": contador["versao"], "atualizado_em": agora}
+    finally:
+        await confirmar_versoes(user_id, pendente)
+
+async def confirmar_versoes(user_id: str, pendente: ObjectId):
+    contador = await db.versoes.find_one_and_update(
+        {"_id": user_id},
+        {"$pull": {"pendentes": {"id": pendente}}},
+        return_document=ReturnDocument.AFTER
+    )
+    expiradas = datetime.utcnow() - timedelta(seconds=VERSAO_PENDENTE_TTL)
+    if contador is not None and any(p["em"] < expiradas for p in contador.get("pendentes", [])):
+        contador = await db.versoes.find_one_and_update(
+            {"_id": user_id},
+            {"$pull": {"pendentes": {"em": {"$lt": expiradas}}}},
+            return_document=ReturnDocument.AFTER
+        )
+    if contador is not None and not contador.get("pendentes"):
+        # Nenhuma reserva em aberto: toda versão até a atual já foi gravada
+        await db.versoes.update_one({"_id": user_id}, {"$max": {"estavel": contador["versao"]}})
+
+async def registrar_alteracao(user_id: str):
+    # Mudança sem registro versionado (ex.: notificações disparadas) que ainda assim muda o que as
+    # rotas com ETag devolvem, como os alertas do dashboard. Já está gravada, então não passa por
+    # pendentes; o /sync não acha registro nessa versão e segue normalmente
+    await db.versoes.update_one({"_id": user_id}, {"$inc": {"versao": 1}}, upsert=True)
+
+def versao_estavel(contador: Optional[dict]) -> int:
+    if not contador:
+        return 0
+    if "estavel" in contador:
+        return contador["estavel"]
+    # Contador anterior às reservas pendentes: a versão só é segura se nada estiver em aberto
+    return 0 if contador.get("pendentes") else contador.get("versao", 0)
+
+async def versao_atual(user_id: str) -> int:
+    contador = await db.versoes.find_one({"_id": user_id})
+    if not contador:
+        return 0
+    return contador.get("versao", 0) - sum(p.get("n", 1) for p in contador.get("pendentes", []))
+
+async def registrar_exclusoes(user_id: str, colecao: str, ids: List[str]):
+    if not ids:
+        return
+    async with carimbo(user_id, len(ids)) as marca:
+        primeira = marca["versao"] - len(ids) + 1
+        await db.exclusoes.insert_many([
+            {"user_id": user_id, "colecao": colecao, "registro_id": registro_id, "versao": primeira + i, "excluido_em": marca["atualizado_em"]}
+            for i, registro_id in enumerate(ids)
+        ])
+
+# Versão lida pelo ETag desta requisição. Entra na chave do em_voo: quem chega depois de uma escrita
+# confirmada (inclusive as que não chamam notificar_alteracao) não pega carona numa consulta anterior a ela
+versao_lida: ContextVar[Optional[int]] = ContextVar("versao_lida", default=None)
+
+async def usuario_condicional(request: Request, response: Response, user_id: str = Depends(usuario_limitado)) -> str:
+    # ETag fraco das escritas confirmadas do usuário + rota + parâmetros; lido antes dos dados, então
+    # nunca fica à frente deles: uma escrita ainda em andamento só troca o ETag quando termina
+    versao = await versao_atual(user_id)
+    versao_lida.set(versao)
+    chave = f"{user_id}|{versao}|{hoje_local()}|{request.url.path}|{request.url.query}"
+    etag = f'W/"{versao}-{hashlib.sha1(chave.encode("utf-8")).hexdigest()[:16]}"'
+    if etag in request.headers.get("if-none-match", ""):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return user_id
+
+def encode_token_sync(versao: int) -> str:
+    raw = json.dumps({"v": versao, "t": int(time.time())})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip("=")
+
+def decode_token_sync(token: str) -> int:
+    try:
+        data = json.loads(base64.urlsafe_b64decode((token + "=" * (-len(token) % 4)).encode('ascii')))
+        versao, emitido_em = int(data["v"]), int(data["t"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Token de sincronização inválido")
+    if time.time() - emitido_em > SYNC_RETENCAO_DIAS * 86400:
+        # Tombstones mais antigos já expiraram; o cliente precisa baixar tudo de novo
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Token expirado, sincronize novamente sem token")
+    return versao
+
+@api_router.get("/sync", response_model=SyncResposta)
+async def sincronizar(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=LIMITE_MAXIMO),
+    user_id: str = Depends(get_current_user),
+):
+    desde = decode_token_sync(since) if since else 0
+    # Só até a versão estável: acima dela pode haver uma escrita reservada e ainda não gravada
+    estavel = versao_estavel(await db.versoes.find_one({"_id": user_id}))
+    filtro = {"user_id": user_id, "versao": {"$gt": desde, "$lte": estavel}}
+    # Sem token é uma carga completa: tombstones não interessam
+    colecoes = [*SYNC_COLECOES, "exclusoes"] if since else list(SYNC_COLECOES)
+    projecao = {"conteudo_base64": 0}
+    resultados = await asyncio.gather(*(
+        db[nome].find(filtro, projecao).sort("versao", 1).limit(limit + 1).to_list(limit + 1) for nome in colecoes
+    ))
+    
+    # Junta tudo em ordem de versão e corta no limite; o token é a última versão entregue,
+    # ou a estável quando tudo até ela coube na página
+    alteracoes = sorted(
+        ((doc["versao"], nome, doc) for nome, docs in zip(colecoes, resultados) for doc in docs),
+        key=lambda item: item[0]
+    )
+    mais = len(alteracoes) > limit
+    alteracoes = alteracoes[:limit]
+    
+    resposta = {nome: [] for nome in [*SYNC_COLECOES, "exclusoes"]}
+    for _, nome, doc in alteracoes:
+        if nome == "exclusoes":
+            resposta[nome].append(Exclusao(colecao=doc["colecao"], id=doc["registro_id"], versao=doc["versao"]))
+        else:
+            resposta[nome].append(SYNC_COLECOES[nome](id=str(doc["_id"]), **{k: v for k, v in doc.items() if k != "_id"}))
+    
+    ultima = alteracoes[-1][0] if mais else max(desde, estavel)
+    return SyncResposta(**resposta, token=encode_token_sync(ultima), mais=mais)
+
+async def migrar_versoes() -> int:
+    # Registros anteriores ao sync não têm versão; recebem uma para entrar na primeira sincronização
+    migrados = 0
+    for nome in SYNC_COLECOES:
+        async for doc in db[nome].find({"versao": {"$exists": False}}, {"user_id": 1}):
+            async with carimbo(doc["user_id"]) as marca:
+                await db[nome].update_one({"_id": doc["_id"]}, {"$set": marca})
+            migrados += 1
+    return migrados
+
+# ==================== BUSCA ====================
+# clientes e casos guardam em termos_busca os tokens normalizados (sem acento, minúsculos) dos
+# campos pesquisáveis, e os documentos (CPF/CNPJ, número CNJ) também só com dígitos. A busca é
+# um prefixo ancorado por token sobre o índice (user_id, termos_busca); a relevância é calculada
+# só sobre os candidatos.
+
+BUSCA_CANDIDATOS = int(os.environ.get('BUSCA_CANDIDATOS', '200'))
+
+# Campos pesquisáveis por coleção, com o peso de cada um na relevância
+CAMPOS_BUSCA = {
+    "clientes": {"nome": 3, "cpf_cnpj": 3, "tags": 2},
+    "casos": {"titulo": 3, "numero_processo": 3, "partes": 1},
+}
+CAMPOS_DOCUMENTO = {"cpf_cnpj", "numero_processo"}
+
+def normalizar(texto: str) -> str:
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+def tokenizar(texto: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", normalizar(texto))
+
+def tokens_campo(campo: str, valor) -> List[str]:
+    textos = valor if isinstance(valor, list) else [valor or ""]
+    tokens = [t for texto in textos for t in tokenizar(texto)]
+    if campo in CAMPOS_DOCUMENTO:
+        digitos = "".join(c for c in valor or "" if c.isdigit())
+        if digitos:
+            tokens.append(digitos)
+    return tokens
+
+def termos_busca(colecao: str, dados: dict) -> List[str]:
+    return sorted({t for campo in CAMPOS_BUSCA[colecao] for t in tokens_campo(campo, dados.get(campo))})
+
+def relevancia(colecao: str, registro: dict, consulta: List[str]) -> int:
+    pontos = 0
+    for termo in consulta:
+        melhor = 0
+        for campo, peso in CAMPOS_BUSCA[colecao].items():
+            for token in tokens_campo(campo, registro.get(campo)):
+                if token == termo:
+                    melhor = max(melhor, peso * 2)
+                elif token.startswith(termo):
+                    melhor = max(melhor, peso)
+        pontos += melhor
+    return pontos
+
+class ResultadoBusca(BaseModel):
+    tipo: Literal["cliente", "caso"]
+    id: str
+    titulo: str
+    detalhe: str = ""
+    relevancia: int
+
+async def buscar_em(colecao: str, user_id: str, consulta: List[str]) -> List[ResultadoBusca]:
+    projecao = {campo: 1 for campo in CAMPOS_BUSCA[colecao]}
+    # Primeiro quem tem todos os termos exatos, depois completa com prefixos: com só a consulta por
+    # prefixo, os candidatos saem na ordem do índice e um "silva" exato podia ficar atrás de 200 "silveira"
+    exatos = {"user_id": user_id, "termos_busca": {"$all": consulta}}
+    registros = await db_leitura[colecao].find(exatos, projecao).limit(BUSCA_CANDIDATOS).to_list(BUSCA_CANDIDATOS)
+    restantes = BUSCA_CANDIDATOS - len(registros)
+    if restantes > 0:
+        prefixos = {
+            "user_id": user_id,
+            "_id": {"$nin": [r["_id"] for r in registros]},
+            "$and": [{"termos_busca": {"$regex": f"^{re.escape(t)}"}} for t in consulta],
+        }
+        registros += await db_leitura[colecao].find(prefixos, projecao).limit(restantes).to_list(restantes)
+    if colecao == "clientes":
+        return [
+            ResultadoBusca(tipo="cliente", id=str(r["_id"]), titulo=r.get("nome", ""), detalhe=r.get("cpf_cnpj") or "",
+                           relevancia=relevancia(colecao, r, consulta))
+            for r in registros
+        ]
+    return [
+        ResultadoBusca(tipo="caso", id=str(r["_id"]), titulo=r.get("titulo", ""), detalhe=r.get("numero_processo") or "",
+                       relevancia=relevancia(colecao, r, consulta))
+        for r in registros
+    ]
+
+async def migrar_busca() -> int:
+    migrados = 0
+    for colecao, campos in CAMPOS_BUSCA.items():
+        async for registro in db[colecao].find({"termos_busca": {"$exists": False}}, {campo: 1 for campo in campos}):
+            await db[colecao].update_one({"_id": registro["_id"]}, {"$set": {"termos_busca": termos_busca(colecao, registro)}})
+            migrados += 1
+    return migrados
+
+@api_router.get("/busca", response_model=List[ResultadoBusca])
+async def buscar(
+    q: str = Query(..., min_length=2),
+    tipo: Optional[Literal["cliente", "caso"]] = None,
+    limit: int = Query(20, ge=1, le=BUSCA_CANDIDATOS),
+    user_id: str = Depends(usuario_limitado),
+):
+    consulta = tokenizar(q)
+    if not consulta:
+        return []
+    colecoes = [c for c, t in (("clientes", "cliente"), ("casos", "caso")) if tipo in (None, t)]
+    resultados = [r for lista in await asyncio.gather(*(buscar_em(c, user_id, consulta) for c in colecoes)) for r in lista]
+    resultados.sort(key=lambda r: (-r.relevancia, normalizar(r.titulo)))
+    return resultados[:limit]
+
+# ==================== LEMBRETES ====================
+# Cada prazo guarda o próximo lembrete (proximo_lembrete, indexado); o agendador busca só os
+# vencidos em lotes, grava em db.notificacoes e agenda o seguinte. Como o estado fica no banco,
+# um restart não precisa varrer os prazos. O dia do prazo (0) sempre gera lembrete.
+
+LEMBRETES_ATIVO = os.environ.get('LEMBRETES_ATIVO', '1').lower() in ('1', 'true')
+LEMBRETES_INTERVALO = float(os.environ.get('LEMBRETES_INTERVALO', '30'))
+LEMBRETES_LOTE = int(os.environ.get('LEMBRETES_LOTE', '500'))
+
+def instantes_lembrete(prazo: dict) -> List[Tuple[datetime, int]]:
+    # Lembretes disparam à meia-noite local de cada dia
+    data = data_local(prazo.get("data"))
+    if data is None:
+        return []
+    dias = {d for d in prazo.get("lembretes") or [] if d >= 0} | {0}
+    return sorted((inicio_dia_utc(data - timedelta(days=d)), d) for d in dias)
+
+def proximo_lembrete(prazo: dict, agora: datetime, depois_de: Optional[datetime] = None) -> Tuple[Optional[datetime], Optional[int]]:
+    # Entre os lembretes já vencidos só vale o mais recente; senão, o primeiro futuro
+    instantes = [i for i in instantes_lembrete(prazo) if depois_de is None or i[0] > depois_de]
+    if not instantes or instantes[-1][0] + timedelta(days=1) <= agora:
+        return None, None  # prazo já passou
+    vencidos = [i for i in instantes if i[0] <= agora]
+    return vencidos[-1] if vencidos else instantes[0]
+
+def campos_lembrete(prazo: dict, agora: Optional[datetime] = None) -> dict:
+    instante, dias = proximo_lembrete(prazo, agora or datetime.utcnow())
+    return {"proximo_lembrete": instante, "proximo_lembrete_dias": dias, "ultimo_lembrete": None}
+
+def campos_derivados(colecao: str, dados: dict) -> dict:
+    # Campos mantidos pelo servidor a cada criação/edição
+    derivados = datas_bson(colecao, dados)
+    if colecao == "prazos":
+        derivados.update(campos_lembrete(dados))
+    if colecao in CAMPOS_BUSCA:
+        derivados["termos_busca"] = termos_busca(colecao, dados)
+    return derivados
+
+async def apagar_notificacoes(prazo_ids: List[str]):
+    if prazo_ids:
+        await db.notificacoes.delete_many({"prazo_id": {"$in": prazo_ids}})
+
+async def disparar_lembretes(agora: datetime) -> int:
+    prazos = await db.prazos.find(
+        {"proximo_lembrete": {"$lte": agora}},
+        {"user_id": 1, "titulo": 1, "data": 1, "lembretes": 1, "proximo_lembrete": 1, "ultimo_lembrete": 1}
+    ).sort("proximo_lembrete", 1).limit(LEMBRETES_LOTE).to_list(LEMBRETES_LOTE)
+    if not prazos:
+        return 0
+    
+    notificacoes = []
+    operacoes = []
+    for prazo in prazos:
+        instante, dias = proximo_lembrete(prazo, agora, prazo.get("ultimo_lembrete"))
+        if instante is not None and instante <= agora:
+            notificacoes.append({
+                "user_id": prazo["user_id"],
+                "prazo_id": str(prazo["_id"]),
+                "titulo": prazo.get("titulo", ""),
+                "data": data_bson(prazo.get("data")),
+                "dias": dias,
+                "lida": False,
+                "disparado_em": agora,
+            })
+            seguinte, dias_seguinte = proximo_lembrete(prazo, agora, instante)
+        else:
+            instante, (seguinte, dias_seguinte) = prazo.get("ultimo_lembrete"), (instante, dias)
+        # Condição no proximo_lembrete lido: se o prazo foi editado no meio tempo, a edição vence
+        operacoes.append(UpdateOne(
+            {"_id": prazo["_id"], "proximo_lembrete": prazo["proximo_lembrete"]},
+            {"$set": {"proximo_lembrete": seguinte, "proximo_lembrete_dias": dias_seguinte, "ultimo_lembrete": instante}}
+        ))
+    
+    if notificacoes:
+        try:
+            await db.notificacoes.insert_many(notificacoes, ordered=False)
+        except BulkWriteError as e:
+            # (prazo_id, dias) é único: lembrete já gravado antes de um restart
+            if any(erro.get("code") != 11000 for erro in e.details.get("writeErrors", [])):
+                raise
+    await db.prazos.bulk_write(operacoes, ordered=False)
+    
+    for user_id in {n["user_id"] for n in notificacoes}:
+        total = sum(1 for n in notificacoes if n["user_id"] == user_id)
+        await registrar_alteracao(user_id)
+        await notificar_alteracao(user_id, "notificacoes", "criado", total=total)
+    return len(prazos)
+
+async def agendador_lembretes():
+    while True:
+        try:
+            while await disparar_lembretes(datetime.utcnow()) == LEMBRETES_LOTE:
+                pass
+        except PyMongoError:
+            logger.exception("Falha ao disparar lembretes")
+        await asyncio.sleep(LEMBRETES_INTERVALO)
+
+async def migrar_lembretes() -> int:
+    agora = datetime.utcnow()
+    migrados = 0
+    async for prazo in db.prazos.find({"proximo_lembrete": {"$exists": False}}, {"data": 1, "lembretes": 1}):
+        await db.prazos.update_one({"_id": prazo["_id"]}, {"$set": campos_lembrete(prazo, agora)})
+        migrados += 1
+    return migrados
+
+@api_router.get("/notificacoes", response_model=Pagina[Notificacao])
+async def listar_notificacoes(
+    user_id: str = Depends(get_current_user),
+    apenas_nao_lidas: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    response: Response = None,
+):
+    query = {"user_id": user_id}
+    if apenas_nao_lidas:
+        query["lida"] = False
+    notificacoes, next_cursor = await paginar(db_leitura.notificacoes, query, "disparado_em", "desc", cursor, limit, projection=projecao_saida(Notificacao))
+    return pagina_saida(notificacoes, next_cursor, Notificacao, response)
+
+@api_router.post("/notificacoes/{notificacao_id}/lida")
+async def marcar_notificacao_lida(notificacao_id: str, user_id: str = Depends(get_current_user)):
+    result = await db.notificacoes.update_one({"_id": ObjectId(notificacao_id), "user_id": user_id}, {"$set": {"lida": True}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Notificação não encontrada")
+    return {"message": "Notificação marcada como lida"}
+
+# ==================== MANUTENÇÃO ====================
+# Job periódico: marca como atrasado o financeiro pendente já vencido (índice status +
+# data_vencimento) e recalcula os contadores por usuário em db.contadores, que o dashboard
+# lê em vez de contar casos e tarefas a cada cálculo. Escritas em casos/tarefas incrementam a
+# geração do contador do usuário (ver notificar_alteracao); uma contagem só é gravada se a geração
+# não mudou desde que começou, e vale enquanto "contado" for igual a "geracao".
+
+MANUTENCAO_ATIVO = os.environ.get('MANUTENCAO_ATIVO', '1').lower() in ('1', 'true')
+MANUTENCAO_INTERVALO = float(os.environ.get('MANUTENCAO_INTERVALO', '300'))
+MANUTENCAO_LOTE = int(os.environ.get('MANUTENCAO_LOTE', '1000'))
+
+# campo -> (coleção, filtro)
+CONTADORES = {
+    "processos_ativos": ("casos", {"status": {"$in": ["novo", "em andamento"]}}),
+    "tarefas_pendentes": ("tarefas", {"status": {"$ne": "concluido"}}),
+}
+COLECOES_CONTADORES = {colecao for colecao, _ in CONTADORES.values()}
+
+async def marcar_atrasados(hoje) -> int:
+    filtro = {"status": "pendente", "data_vencimento": {"$lt": inicio_dia_utc(hoje)}}
+    alterados = 0
+    while True:
+        lancamentos = await db.financeiro.find(filtro, {"user_id": 1}).limit(MANUTENCAO_LOTE).to_list(MANUTENCAO_LOTE)
+        if not lancamentos:
+            return alterados
+        por_usuario = defaultdict(list)
+        for lancamento in lancamentos:
+            por_usuario[lancamento["user_id"]].append(lancamento["_id"])
+        
+        # Uma versão por registro (como nas rotas em lote) para o /sync não pular nenhum no corte da página
+        async with AsyncExitStack() as reservas:
+            operacoes = []
+            for user_id, ids in por_usuario.items():
+                marca = await reservas.enter_async_context(carimbo(user_id, len(ids)))
+                primeira = marca["versao"] - len(ids) + 1
+                operacoes.extend(
+                    UpdateOne({"_id": _id, **filtro}, {"$set": {"status": "atrasado", "versao": primeira + i, "atualizado_em": marca["atualizado_em"]}})
+                    for i, _id in enumerate(ids)
+                )
+            resultado = await db.financeiro.bulk_write(operacoes, ordered=False)
+        alterados += resultado.modified_count
+        
+        for user_id, ids in por_usuario.items():
+            await notificar_alteracao(user_id, "financeiro", "atualizado", total=len(ids))
+        if len(lancamentos) < MANUTENCAO_LOTE:
+            return alterados
+
+def contagem(user_id: str, geracao: int, contadores: dict, agora: datetime) -> UpdateOne:
+    # Sem "geracao" = nenhuma escrita desde a criação (ou contador anterior ao campo). Se uma escrita
+    # incrementou a geração no meio da contagem o filtro não casa e o upsert esbarra no _id
+    return UpdateOne(
+        {"_id": user_id, "geracao": geracao if geracao else {"$in": [0, None]}},
+        {"$set": {**contadores, "geracao": geracao, "contado": geracao, "atualizado_em": agora}},
+        upsert=True
+    )
+
+async def gravar_contagens(operacoes: List[UpdateOne]):
+    try:
+        await db.contadores.bulk_write(operacoes, ordered=False)
+    except BulkWriteError as e:
+        # _id duplicado = contagem que ficou velha no caminho: não grava, a próxima leitura reconta
+        if any(erro["code"] != 11000 for erro in e.details.get("writeErrors", [])):
+            raise
+
+def contagem_valida(contadores: Optional[dict]) -> bool:
+    return contadores is not None and contadores.get("contado", 0) == contadores.get("geracao", 0)
+
+async def contar_usuario(user_id: str, geracao: int = 0) -> dict:
+    totais = await asyncio.gather(*[
+        db[colecao].count_documents({"user_id": user_id, **filtro}) for colecao, filtro in CONTADORES.values()
+    ])
+    contadores = dict(zip(CONTADORES, totais))
+    await gravar_contagens([contagem(user_id, geracao, contadores, datetime.utcnow())])
+    return contadores
+
+async def obter_contadores(user_id: str) -> dict:
+    contadores = await db.contadores.find_one({"_id": user_id})
+    if contagem_valida(contadores):
+        return contadores
+    return await contar_usuario(user_id, contadores.get("geracao", 0) if contadores else 0)
+
+async def atualizar_contadores() -> int:
+    inicio = datetime.utcnow()
+    # Gerações lidas antes de agregar: quem escreveu depois fica de fora e é recontado na leitura
+    geracoes = {d["_id"]: d.get("geracao", 0) async for d in db.contadores.find({}, {"geracao": 1})}
+    por_usuario = defaultdict(lambda: dict.fromkeys(CONTADORES, 0))
+    for campo, (colecao, filtro) in CONTADORES.items():
+        async for grupo in db[colecao].aggregate([{"$match": filtro}, {"$group": {"_id": "$user_id", "total": {"$sum": 1}}}]):
+            por_usuario[grupo["_id"]][campo] = grupo["total"]
+    
+    # Quem não apareceu em nenhum grupo não tem mais casos ativos nem tarefas pendentes
+    operacoes = [
+        contagem(user_id, geracoes.get(user_id, 0), por_usuario.get(user_id, dict.fromkeys(CONTADORES, 0)), inicio)
+        for user_id in por_usuario.keys() | geracoes.keys()
+    ]
+    for i in range(0, len(operacoes), MANUTENCAO_LOTE):
+        await gravar_contagens(operacoes[i:i + MANUTENCAO_LOTE])
+    return len(por_usuario)
+
+async def executar_manutencao(tarefa: str, funcao) -> Optional[int]:
+    inicio = time.perf_counter()
+    total, resultado = None, "ok"
+    try:
+        total = await funcao()
+    except PyMongoError:
+        logger.exception("Falha na manutenção (%s)", tarefa)
+        resultado = "erro"
+    with metricas.lock:
+        metricas.manutencao_execucoes.inc(tarefa, resultado)
+        metricas.manutencao_duracao.observar(time.perf_counter() - inicio, tarefa)
+        if total:
+            metricas.manutencao_registros.inc(tarefa, valor=total)
+    return total
+
+async def rodar_manutencao() -> dict:
+    return {
+        "atrasados": await executar_manutencao("atrasados", lambda: marcar_atrasados(hoje_local())),
+        "contadores": await executar_manutencao("contadores", atualizar_contadores),
+    }
+
+async def agendador_manutencao():
+    while True:
+        await rodar_manutencao()
+        await asyncio.sleep(MANUTENCAO_INTERVALO)
+
+# ==================== BULK ROUTES ====================
+# Registradas antes das rotas /{recurso}/{id} para que "bulk" e "exportar" não sejam lidos como id
+
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', '1000'))
+
+class ResultadoItem(BaseModel):
+    indice: int
+    id: Optional[str] = None
+    erro: Optional[str] = None
+
+class ResultadoLote(BaseModel):
+    sucesso: int
+    falhas: int
+    resultados: List[ResultadoItem]
+
+class IdsLote(BaseModel):
+    ids: List[str]
+
+def campos_iniciais(colecao: str) -> dict:
+    if colecao == "clientes":
+        return {"historico_atendimentos": [], "total_atendimentos": 0}
+    if colecao == "casos":
+        return {"timeline": [], "total_movimentacoes": 0, "anexos": []}
+    return {}
+
+async def ler_itens(request: Request):
+    # Aceita uma lista JSON ou NDJSON (um registro por linha, lido conforme chega)
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        indice = 0
+        resto = b""
+        async for bloco in request.stream():
+            linhas = (resto + bloco).split(b"\n")
+            resto = linhas.pop()
+            for linha in linhas:
+                if linha.strip():
+                    yield indice, linha
+                    indice += 1
+        if resto.strip():
+            yield indice, resto
+        return
+    try:
+        itens = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="JSON inválido")
+    if not isinstance(itens, list):
+        raise HTTPException(status_code=400, detail="Envie uma lista de registros")
+    for indice, item in enumerate(itens):
+        yield indice, item
+
+async def em_lotes(itens, tamanho: int):
+    lote = []
+    async for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def validar_item(modelo: Type[BaseModel], item, com_id: bool = False) -> Tuple[Optional[ObjectId], BaseModel]:
+    if isinstance(item, bytes):
+        item = json.loads(item)
+    if not isinstance(item, dict):
+        raise ValueError("Registro deve ser um objeto")
+    _id = None
+    if com_id:
+        item = dict(item)
+        id_txt = item.pop("id", None)
+        if not isinstance(id_txt, str):
+            # ObjectId(12) ou ObjectId(["a"]) levantaria TypeError e derrubaria o lote inteiro
+            raise InvalidId("id deve ser texto")
+        _id = ObjectId(id_txt)
+    return _id, modelo(**item)
+
+def descrever_erro(erro: Exception) -> str:
+    if isinstance(erro, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in erro.errors())
+    if isinstance(erro, InvalidId):
+        return "id inválido"
+    return str(erro)
+
+def erros_escrita(erro: BulkWriteError) -> Dict[int, str]:
+    return {e["index"]: e.get("errmsg", "Erro de escrita") for e in erro.details.get("writeErrors", [])}
+
+def resumir_lote(resultados: List[ResultadoItem]) -> ResultadoLote:
+    resultados.sort(key=lambda r: r.indice)
+    falhas = sum(1 for r in resultados if r.erro)
+    return ResultadoLote(sucesso=len(resultados) - falhas, falhas=falhas, resultados=resultados)
+
+def registrar_rotas_bulk(colecao: str, modelo: Type[BaseModel]):
+    async def criar_em_lote(
+        request: Request,
+        user_id: str = Depends(get_current_user),
+        tamanho_lote: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000),
+    ):
+        resultados = []
+        async for lote in em_lotes(ler_itens(request), tamanho_lote):
+            docs = []
+            for indice, item in lote:
+                try:
+                    _, registro = validar_item(modelo, item)
+                except ValueError as e:
+                    resultados.append(ResultadoItem(indice=indice, erro=descrever_erro(e)))
+                    continue
+                doc = registro.dict()
+                doc.update(campos_iniciais(colecao))
+                doc.update(campos_derivados(colecao, doc))
+                doc["user_id"] = user_id
+                doc["criado_em"] = datetime.utcnow()
+                docs.append((indice, doc))
+            if not docs:
+                continue
+            erros = {}
+            async with carimbo(user_id, len(docs)) as marca:
+                for n, (_, doc) in enumerate(docs):
+                    doc["versao"] = marca["versao"] - len(docs) + 1 + n
+                    doc["atualizado_em"] = marca["atualizado_em"]
+                try:
+                    await db[colecao].insert_many([doc for _, doc in docs], ordered=False)
+                except BulkWriteError as e:
+                    erros = erros_escrita(e)
+            for n, (indice, doc) in enumerate(docs):
+                if n in erros:
+                    resultados.append(ResultadoItem(indice=indice, erro=erros[n]))
+                else:
+                    resultados.append(ResultadoItem(indice=indice, id=str(doc["_id"])))
+        resumo = resumir_lote(resultados)
+        await notificar_alteracao(user_id, colecao, "criado", total=resumo.sucesso)
+        return resumo
+
+    async def atualizar_em_lote(
+        request: Request,
+        user_id: str = Depends(get_current_user),
+        tamanho_lote: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000),
+    ):
+        resultados = []
+        async for lote in em_lotes(ler_itens(request), tamanho_lote):
+            validos = []
+            for indice, item in lote:
+                try:
+                    _id, registro = validar_item(modelo, item, com_id=True)
+                except (ValueError, InvalidId) as e:
+                    resultados.append(ResultadoItem(indice=indice, erro=descrever_erro(e)))
+                    continue
+                dados = registro.dict()
+                dados.update(campos_derivados(colecao, dados))
+                validos.append((indice, _id, dados))
+            if not validos:
+                continue
+            existentes = {
+                d["_id"] for d in await db[colecao].find(
+                    {"_id": {"$in": [_id for _, _id, _ in validos]}, "user_id": user_id}, {"_id": 1}
+                ).to_list(None)
+            }
+            operacoes = []
+            for indice, _id, dados in validos:
+                if _id in existentes:
+                    operacoes.append((indice, _id, dados))
+                else:
+                    resultados.append(ResultadoItem(indice=indice, erro="Registro não encontrado"))
+            if not operacoes:
+                continue
+            erros = {}
+            async with carimbo(user_id, len(operacoes)) as marca:
+                operacoes = [
+                    (indice, _id, UpdateOne(
+                        {"_id": _id, "user_id": user_id},
+                        {"$set": {**dados, "versao": marca["versao"] - len(operacoes) + 1 + n, "atualizado_em": marca["atualizado_em"]}}
+                    ))
+                    for n, (indice, _id, dados) in enumerate(operacoes)
+                ]
+                try:
+                    await db[colecao].bulk_write([op for _, _, op in operacoes], ordered=False)
+                except BulkWriteError as e:
+                    erros = erros_escrita(e)
+            for n, (indice, _id, _) in enumerate(operacoes):
+                if n in erros:
+                    resultados.append(ResultadoItem(indice=indice, erro=erros[n]))
+                else:
+                    resultados.append(ResultadoItem(indice=indice, id=str(_id)))
+            if colecao == "prazos":
+                await apagar_notificacoes([str(_id) for n, (_, _id, _) in enumerate(operacoes) if n not in erros])
+        resumo = resumir_lote(resultados)
+        await notificar_alteracao(user_id, colecao, "atualizado", total=resumo.sucesso)
+        return resumo
+
+    async def deletar_em_lote(
+        lote: IdsLote,
+        user_id: str = Depends(get_current_user),
+        tamanho_lote: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000),
+    ):
+        resultados = []
+        for inicio in range(0, len(lote.ids), tamanho_lote):
+            validos = []
+            for indice, id_txt in enumerate(lote.ids[inicio:inicio + tamanho_lote], start=inicio):
+                try:
+                    validos.append((indice, ObjectId(id_txt)))
+                except InvalidId as e:
+                    resultados.append(ResultadoItem(indice=indice, erro=descrever_erro(e)))
+            if not validos:
+                continue
+            filtro = {"_id": {"$in": [_id for _, _id in validos]}, "user_id": user_id}
+            existentes = {d["_id"] for d in await db[colecao].find(filtro, {"_id": 1}).to_list(None)}
+            await db[colecao].delete_many({"_id": {"$in": list(existentes)}, "user_id": user_id})
+            await apagar_historicos(colecao, user_id, [str(_id) for _id in existentes])
+            await registrar_exclusoes(user_id, colecao, [str(_id) for _id in existentes])
+            if colecao == "prazos":
+                await apagar_notificacoes([str(_id) for _id in existentes])
+            for indice, _id in validos:
+                if _id in existentes:
+                    resultados.append(ResultadoItem(indice=indice, id=str(_id)))
+                else:
+                    resultados.append(ResultadoItem(indice=indice, erro="Registro não encontrado"))
+        resumo = resumir_lote(resultados)
+        await notificar_alteracao(user_id, colecao, "excluido", total=resumo.sucesso)
+        return resumo
+
+    caminho = f"/{colecao}/bulk"
+    api_router.add_api_route(caminho, criar_em_lote, methods=["POST"], response_model=ResultadoLote, name=f"criar_{colecao}_em_lote")
+    api_router.add_api_route(caminho, atualizar_em_lote, methods=["PUT"], response_model=ResultadoLote, name=f"atualizar_{colecao}_em_lote")
+    api_router.add_api_route(caminho, deletar_em_lote, methods=["DELETE"], response_model=ResultadoLote, name=f"deletar_{colecao}_em_lote")
+
+registrar_rotas_bulk("clientes", ClienteCreate)
+registrar_rotas_bulk("casos", CasoCreate)
+registrar_rotas_bulk("prazos", PrazoCreate)
+registrar_rotas_bulk("tarefas", TarefaCreate)
+registrar_rotas_bulk("financeiro", FinanceiroCreate)
+
+# ==================== EXPORT ROUTES ====================
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+def valor_csv(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, (list, tuple)):
+        return "|".join(map(str, valor))
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
+
+def filtro_periodo(campo: str, de: Optional[date], ate: Optional[date]) -> dict:
+    # Período em dias locais, ate inclusivo; criado_em e as datas de calendário são datetime
+    limites = {}
+    if de:
+        limites["$gte"] = inicio_dia_utc(de)
+    if ate:
+        limites["$lt"] = inicio_dia_utc(ate + timedelta(days=1))
+    return {campo: limites} if limites else {}
+
+def datas_exportacao(doc: dict) -> dict:
+    for campo in CAMPOS_DATA_ISO:
+        if isinstance(doc.get(campo), datetime):
+            doc[campo] = data_iso(doc[campo])
+    return doc
+
+async def gerar_csv(cursor, colunas: List[str], separador: str):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=separador)
+    buffer.write("\ufeff")  # BOM para o Excel reconhecer UTF-8
+    writer.writerow(colunas)
+    linhas = 0
+    async for doc in cursor:
+        doc["id"] = str(doc.pop("_id"))
+        datas_exportacao(doc)
+        writer.writerow([valor_csv(doc.get(coluna)) for coluna in colunas])
+        linhas += 1
+        if linhas % 500 == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+async def gerar_ndjson(cursor):
+    linhas = []
+    async for doc in cursor:
+        doc["id"] = str(doc.pop("_id"))
+        datas_exportacao(doc)
+        linhas.append(json.dumps(doc, default=valor_csv, ensure_ascii=False))
+        if len(linhas) == 500:
+            yield ("\n".join(linhas) + "\n").encode('utf-8')
+            linhas = []
+    if linhas:
+        yield ("\n".join(linhas) + "\n").encode('utf-8')
+
+def registrar_rota_exportacao(colecao: str, modelo: Type[BaseModel], campos_data: List[str]):
+    colunas = ["id", *modelo.model_fields, "criado_em"]
+    # Só os campos do cadastro: embutidos e campos internos (versão, lembretes, termos de busca) ficam no banco
+    projecao = {**projecao_saida(modelo), "criado_em": 1}
+
+    async def exportar(
+        user_id: str = Depends(usuario_limitado),
+        formato: Literal["csv", "ndjson"] = "csv",
+        campo_data: str = campos_data[0],
+        de: Optional[date] = None,
+        ate: Optional[date] = None,
+        separador: Literal[",", ";"] = ",",
+    ):
+        if campo_data not in campos_data:
+            raise HTTPException(status_code=400, detail=f"campo_data deve ser um de: {', '.join(campos_data)}")
+        query = {"user_id": user_id, **filtro_periodo(campo_data, de, ate)}
+        cursor = db_leitura[colecao].find(query, projecao).sort([(campo_data, 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+        if formato == "csv":
+            corpo, media_type = gerar_csv(cursor, colunas, separador), "text/csv; charset=utf-8"
+        else:
+            corpo, media_type = gerar_ndjson(cursor), "application/x-ndjson"
+        return StreamingResponse(
+            corpo,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{colecao}.{formato}"'}
+        )
+
+    api_router.add_api_route(f"/{colecao}/exportar", exportar, methods=["GET"], name=f"exportar_{colecao}")
+
+registrar_rota_exportacao("clientes", ClienteCreate, ["criado_em"])
+registrar_rota_exportacao("casos", CasoCreate, ["criado_em"])
+registrar_rota_exportacao("prazos", PrazoCreate, ["data", "criado_em"])
+registrar_rota_exportacao("tarefas", TarefaCreate, ["criado_em"])
+registrar_rota_exportacao("financeiro", FinanceiroCreate, ["data_vencimento", "criado_em"])
+
+# ==================== RELATÓRIOS FINANCEIROS ====================
+# O razão do usuário é carregado uma vez em colunas (pandas) e guardado em relatorios_cache até a
+# próxima escrita em financeiro; cada relatório é só uma agregação vetorizada sobre esse frame.
+
+CAMPOS_RELATORIO = ["tipo", "valor", "categoria", "status", "data_vencimento", "data_pagamento", "caso_id", "cliente_id"]
+FAIXAS_AGING = ["0-30", "31-60", "61-90", "90+"]
+MES = r"^\d{4}-\d{2}$"  # "AAAA-MM"
+
+def serie_data_local(serie: pd.Series) -> pd.Series:
+    # datetime do banco (UTC) vira o dia local; strings ainda não migradas já são o dia local
+    texto = None if pd.api.types.is_datetime64_any_dtype(serie) else serie.map(type).eq(str)
+    instantes = pd.to_datetime(serie if texto is None else serie.where(~texto), errors="coerce", utc=True)
+    dias = instantes.dt.tz_convert(FUSO_HORARIO).dt.tz_localize(None).dt.normalize()
+    if texto is not None and texto.any():
+        dias = dias.where(~texto, pd.to_datetime(serie.where(texto), errors="coerce", format="ISO8601"))
+    return dias
+
+def montar_lancamentos(registros: List[dict]) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(registros, columns=CAMPOS_RELATORIO)
+    frame["valor"] = pd.to_numeric(frame["valor"], errors="coerce").fillna(0.0)
+    frame["vencimento"] = serie_data_local(frame["data_vencimento"])
+    frame["pagamento"] = serie_data_local(frame["data_pagamento"])
+    frame["aberto"] = frame["status"] != "pago"
+    for coluna in ("tipo", "categoria", "status"):
+        frame[coluna] = frame[coluna].fillna("").astype("category")
+    return frame.drop(columns=["data_vencimento", "data_pagamento"])
+
+def montar_e_medir(registros: List[dict]) -> Tuple[pd.DataFrame, int]:
+    frame = montar_lancamentos(registros)
+    return frame, int(frame.memory_usage(deep=True).sum())
+
+async def carregar_lancamentos(user_id: str) -> pd.DataFrame:
+    chave = f"financeiro:{user_id}"
+    frame = await relatorios_cache.get(chave)
+    if frame is None:
+        # Os quatro relatórios abertos juntos num miss montam o frame uma vez só
+        frame = await em_voo.executar(user_id, chave, "relatorios", lambda: montar_frame_usuario(user_id))
+    return frame
+
+async def montar_frame_usuario(user_id: str) -> pd.DataFrame:
+    chave = f"financeiro:{user_id}"
+    geracao = relatorios_cache.geracao(chave)
+    projecao = {campo: 1 for campo in CAMPOS_RELATORIO}
+    projecao["_id"] = 0
+    registros = await db.financeiro.find({"user_id": user_id}, projecao).to_list(None)
+    # Montar e medir o frame de 100k linhas leva dezenas de ms; fica fora do event loop
+    frame, tamanho = await asyncio.get_running_loop().run_in_executor(None, montar_e_medir, registros)
+    # Se um lançamento mudou durante a montagem, o frame responde esta requisição mas não fica no cache
+    await relatorios_cache.set(chave, frame, geracao=geracao, tamanho=tamanho)
+    return frame
+
+def somar_por_tipo(frame: pd.DataFrame, chave) -> pd.DataFrame:
+    tabela = frame.groupby([chave, "tipo"], observed=True)["valor"].sum().unstack("tipo", fill_value=0.0)
+    return tabela.reindex(columns=["receber", "pagar"], fill_value=0.0).round(2)
+
+def fluxo_caixa(frame: pd.DataFrame, de: Optional[str], ate: Optional[str]) -> List[FluxoCaixaMes]:
+    # Pagos entram no mês do pagamento; em aberto, no mês do vencimento
+    data = frame["pagamento"].where(~frame["aberto"] & frame["pagamento"].notna(), frame["vencimento"])
+    # Mês como inteiro AAAAMM: agrupar e filtrar números é bem mais rápido que formatar strings
+    mes = (data.dt.year * 100 + data.dt.month).rename("mes")
+    validos = mes.notna()
+    if de:
+        validos &= mes >= int(de.replace("-", ""))
+    if ate:
+        validos &= mes <= int(ate.replace("-", ""))
+    tabela = somar_por_tipo(frame[validos], mes[validos].astype(int))
+    tabela["saldo"] = (tabela["receber"] - tabela["pagar"]).round(2)
+    return [
+        FluxoCaixaMes(mes=f"{m // 100:04d}-{m % 100:02d}", **linha)
+        for m, linha in zip(tabela.index, tabela.to_dict("records"))
+    ]
+
+def aging_recebiveis(frame: pd.DataFrame, hoje: pd.Timestamp) -> List[FaixaAging]:
+    vencidos = frame[(frame["tipo"] == "receber") & frame["aberto"] & (frame["vencimento"] < hoje)]
+    dias = (hoje - vencidos["vencimento"]).dt.days
+    faixa = pd.cut(dias, [0, 30, 60, 90, np.inf], labels=FAIXAS_AGING).rename("faixa")
+    tabela = vencidos.groupby(faixa, observed=False)["valor"].agg(["count", "sum"])
+    return [
+        FaixaAging(faixa=f, quantidade=int(tabela.at[f, "count"]), valor=round(float(tabela.at[f, "sum"]), 2))
+        for f in FAIXAS_AGING
+    ]
+
+def totais_categoria(frame: pd.DataFrame) -> List[TotalCategoria]:
+    tabela = somar_por_tipo(frame, "categoria")
+    return [TotalCategoria(categoria=c, **linha) for c, linha in zip(tabela.index, tabela.to_dict("records"))]
+
+def recebiveis_por(frame: pd.DataFrame, campo: str, hoje: pd.Timestamp, limit: int) -> List[RecebivelAgrupado]:
+    abertos = frame[(frame["tipo"] == "receber") & frame["aberto"] & frame[campo].notna() & (frame[campo] != "")]
+    abertos = abertos.assign(vencido=abertos["valor"].where(abertos["vencimento"] < hoje, 0.0))
+    tabela = abertos.groupby(campo).agg(
+        quantidade=("valor", "size"), total=("valor", "sum"), vencido=("vencido", "sum")
+    ).round(2).nlargest(limit, "total")
+    return [RecebivelAgrupado(id=str(i), **linha) for i, linha in zip(tabela.index, tabela.to_dict("records"))]
+
+def resumo_financeiro(frame: pd.DataFrame) -> ResumoFinanceiro:
+    pendentes = frame[frame["status"] == "pendente"].groupby("tipo", observed=True)["valor"].sum()
+    return ResumoFinanceiro(
+        receber=round(float(pendentes.get("receber", 0.0)), 2),
+        pagar=round(float(pendentes.get("pagar", 0.0)), 2),
+        atrasado=round(float(frame.loc[frame["status"] == "atrasado", "valor"].sum()), 2),
+    )
+
+def hoje_relatorio() -> pd.Timestamp:
+    return pd.Timestamp(hoje_local())
+
+@api_router.get("/financeiro/relatorios/fluxo-caixa", response_model=List[FluxoCaixaMes])
+async def relatorio_fluxo_caixa(
+    de: Optional[str] = Query(None, pattern=MES),
+    ate: Optional[str] = Query(None, pattern=MES),
+    user_id: str = Depends(usuario_limitado),
+):
+    return fluxo_caixa(await carregar_lancamentos(user_id), de, ate)
+
+@api_router.get("/financeiro/relatorios/resumo", response_model=ResumoFinanceiro)
+async def relatorio_resumo(user_id: str = Depends(usuario_limitado)):
+    return resumo_financeiro(await carregar_lancamentos(user_id))
+
+@api_router.get("/financeiro/relatorios/aging", response_model=List[FaixaAging])
+async def relatorio_aging(user_id: str = Depends(usuario_limitado)):
+    return aging_recebiveis(await carregar_lancamentos(user_id), hoje_relatorio())
+
+@api_router.get("/financeiro/relatorios/categorias", response_model=List[TotalCategoria])
+async def relatorio_categorias(user_id: str = Depends(usuario_limitado)):
+    return totais_categoria(await carregar_lancamentos(user_id))
+
+@api_router.get("/financeiro/relatorios/recebiveis", response_model=List[RecebivelAgrupado])
+async def relatorio_recebiveis(
+    agrupar_por: Literal["cliente_id", "caso_id"] = "cliente_id",
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    user_id: str = Depends(usuario_limitado),
+):
+    return recebiveis_por(await carregar_lancamentos(user_id), agrupar_por, hoje_relatorio(), limit)
+
+# ==================== HISTÓRICOS ====================
+# Atendimentos e movimentações ficam em coleções próprias, indexadas por cliente/caso e data.
+# O documento pai guarda só o total e as últimas HISTORICO_EMBUTIDO entradas.
+
+HISTORICO_EMBUTIDO = int(os.environ.get('HISTORICO_EMBUTIDO', '5'))
+# coleção pai -> (coleção do histórico, campo de referência, array embutido, contador)
+HISTORICOS = {
+    "clientes": ("atendimentos", "cliente_id", "historico_atendimentos", "total_atendimentos"),
+    "casos": ("movimentacoes", "caso_id", "timeline", "total_movimentacoes"),
+}
+
+async def registrar_historico(colecao: str, pai_id: str, user_id: str, descricao: str) -> bool:
+    destino, campo_ref, campo_array, campo_total = HISTORICOS[colecao]
+    entrada = {"descricao": descricao, "data": datetime.utcnow().isoformat()}
+    async with carimbo(user_id) as marca:
+        # A entrada vai antes do pai: quando a versão é confirmada a sub-coleção já tem o que o total conta
+        inserida = await db[destino].insert_one({**entrada, "user_id": user_id, campo_ref: pai_id})
+        result = await db[colecao].update_one(
+            {"_id": ObjectId(pai_id), "user_id": user_id},
+            {
+                "$push": {campo_array: {"$each": [entrada], "$slice": -HISTORICO_EMBUTIDO}},
+                "$inc": {campo_total: 1},
+                "$set": marca,
+            }
+        )
+        if result.matched_count == 0:
+            await db[destino].delete_one({"_id": inserida.inserted_id})
+            return False
+    return True
+
+async def apagar_historicos(colecao: str, user_id: str, pai_ids: List[str]):
+    if colecao in HISTORICOS and pai_ids:
+        destino, campo_ref, _, _ = HISTORICOS[colecao]
+        await db[destino].delete_many({"user_id": user_id, campo_ref: {"$in": pai_ids}})
+
+async def migrar_historicos() -> int:
+    # Move arrays embutidos antigos para as coleções de histórico; documentos já migrados têm o contador
+    migrados = 0
+    for colecao, (destino, campo_ref, campo_array, campo_total) in HISTORICOS.items():
+        async for pai in db[colecao].find({campo_total: {"$exists": False}}, {"user_id": 1, campo_array: 1}):
+            entradas = pai.get(campo_array) or []
+            if entradas:
+                await db[destino].insert_many([
+                    {"descricao": e.get("descricao", ""), "data": e.get("data", ""), "user_id": pai["user_id"], campo_ref: str(pai["_id"])}
+                    for e in entradas
+                ])
+            await db[colecao].update_one(
+                {"_id": pai["_id"]},
+                {"$set": {campo_array: entradas[-HISTORICO_EMBUTIDO:], campo_total: len(entradas)}}
+            )
+            migrados += 1
+    return migrados
+
 # ==================== CLIENTE ROUTES ====================
 
-@api_router.post(\"/clientes\", response_model=Cliente)
+@api_router.post("/clientes", response_model=Cliente)
 async def criar_cliente(cliente: ClienteCreate, user_id: str = Depends(get_current_user)):
     cliente_dict = cliente.dict()
-    cliente_dict[\"user_id\"] = user_id
-    cliente_dict[\"historico_atendimentos\"] = []
-    cliente_dict[\"criado_em\"] = datetime.utcnow()
-    
-    result = await db.clientes.insert_one(cliente_dict)
-    cliente_dict[\"id\"] = str(result.inserted_id)
+    cliente_dict["user_id"] = user_id
+    cliente_dict.update(campos_iniciais("clientes"))
+    cliente_dict.update(campos_derivados("clientes", cliente_dict))
+    cliente_dict["criado_em"] = datetime.utcnow()
+    async with carimbo(user_id) as marca:
+        cliente_dict.update(marca)
+        result = await db.clientes.insert_one(cliente_dict)
+    cliente_dict["id"] = str(result.inserted_id)
     
     return Cliente(**cliente_dict)
 
-@api_router.get(\"/clientes\", response_model=List[Cliente])
-async def listar_clientes(user_id: str = Depends(get_current_user)):
-    clientes = await db.clientes.find({\"user_id\": user_id}).to_list(1000)
-    return [Cliente(id=str(c[\"_id\"]), **{k: v for k, v in c.items() if k != \"_id\"}) for c in clientes]
-
-@api_router.get(\"/clientes/{cliente_id}\", response_model=Cliente)
+@api_router.get("/clientes", response_model=Pagina[Cliente])
+async def listar_clientes(
+    user_id: str = Depends(usuario_condicional),
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    ordenar_por: Literal["_id", "criado_em", "nome"] = "_id",
+    ordem: Ordem = "asc",
+    response: Response = None,
+):
+    clientes, next_cursor = await paginar(db.clientes, {"user_id": user_id}, ordenar_por, ordem, cursor, limit, projection=projecao_saida(Cliente))
+    return pagina_saida(clientes, next_cursor, Cliente, response)
+
+@api_router.get("/clientes/{cliente_id}", response_model=Cliente)
 async def obter_cliente(cliente_id: str, user_id: str = Depends(get_current_user)):
-    cliente = await db.clientes.find_one({\"_id\": ObjectId(cliente_id), \"user_id\": user_id})
+    cliente = await db.clientes.find_one({"_id": ObjectId(cliente_id), "user_id": user_id})
     if not cliente:
-        raise HTTPException(status_code=404, detail=\"Cliente não encontrado\")
-    return Cliente(id=str(cliente[\"_id\"]), **{k: v for k, v in cliente.items() if k != \"_id\"})
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    return Cliente(id=str(cliente["_id"]), **{k: v for k, v in cliente.items() if k != "_id"})
 
-@api_router.put(\"/clientes/{cliente_id}\", response_model=Cliente)
+@api_router.put("/clientes/{cliente_id}", response_model=Cliente)
 async def atualizar_cliente(cliente_id: str, cliente: ClienteCreate, user_id: str = Depends(get_current_user)):
-    result = await db.clientes.update_one(
-        {\"_id\": ObjectId(cliente_id), \"user_id\": user_id},
-        {\"$set\": cliente.dict()}
-    )
+    async with carimbo(user_id) as marca:
+        result = await db.clientes.update_one(
+            {"_id": ObjectId(cliente_id), "user_id": user_id},
+            {"$set": {**cliente.dict(), **campos_derivados("clientes", cliente.dict()), **marca}}
+        )
     if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail=\"Cliente não encontrado\")
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
     return await obter_cliente(cliente_id, user_id)
 
-@api_router.delete(\"/clientes/{cliente_id}\")
+@api_router.delete("/clientes/{cliente_id}")
 async def deletar_cliente(cliente_id: str, user_id: str = Depends(get_current_user)):
-    result = await db.clientes.delete_one({\"_id\": ObjectId(cliente_id), \"user_id\": user_id})
+    result = await db.clientes.delete_one({"_id": ObjectId(cliente_id), "user_id": user_id})
     if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail=\"Cliente não encontrado\")
-    return {\"message\": \"Cliente deletado com sucesso\"}
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    await registrar_exclusoes(user_id, "clientes", [cliente_id])
+    await apagar_historicos("clientes", user_id, [cliente_id])
+    return {"message": "Cliente deletado com sucesso"}
 
-@api_router.post(\"/clientes/{cliente_id}/atendimentos\")
+@api_router.post("/clientes/{cliente_id}/atendimentos")
 async def adicionar_atendimento(cliente_id: str, atendimento: AtendimentoCreate, user_id: str = Depends(get_current_user)):
-    atendimento_dict = {
-        \"descricao\": atendimento.descricao,
-        \"data\": datetime.utcnow().isoformat()
-    }
-    result = await db.clientes.update_one(
-        {\"_id\": ObjectId(cliente_id), \"user_id\": user_id},
-        {\"$push\": {\"historico_atendimentos\": atendimento_dict}}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail=\"Cliente não encontrado\")
-    return {\"message\": \"Atendimento adicionado com sucesso\"}
+    if not await registrar_historico("clientes", cliente_id, user_id, atendimento.descricao):
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    return {"message": "Atendimento adicionado com sucesso"}
+
+@api_router.get("/clientes/{cliente_id}/atendimentos", response_model=Pagina[Atendimento])
+async def listar_atendimentos(
+    cliente_id: str,
+    user_id: str = Depends(usuario_condicional),
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    ordenar_por: Literal["_id", "data"] = "data",
+    ordem: Ordem = "desc",
+    response: Response = None,
+):
+    atendimentos, next_cursor = await paginar(db.atendimentos, {"user_id": user_id, "cliente_id": cliente_id}, ordenar_por, ordem, cursor, limit, projection=projecao_saida(Atendimento))
+    return pagina_saida(atendimentos, next_cursor, Atendimento, response)
 
 # ==================== CASO ROUTES ====================
 
-@api_router.post(\"/casos\", response_model=Caso)
+@api_router.post("/casos", response_model=Caso)
 async def criar_caso(caso: CasoCreate, user_id: str = Depends(get_current_user)):
     caso_dict = caso.dict()
-    caso_dict[\"user_id\"] = user_id
-    caso_dict[\"timeline\"] = []
-    caso_dict[\"anexos\"] = []
-    caso_dict[\"criado_em\"] = datetime.utcnow()
-    
-    result = await db.casos.insert_one(caso_dict)
-    caso_dict[\"id\"] = str(result.inserted_id)
+    caso_dict["user_id"] = user_id
+    caso_dict.update(campos_iniciais("casos"))
+    caso_dict.update(campos_derivados("casos", caso_dict))
+    caso_dict["criado_em"] = datetime.utcnow()
+    async with carimbo(user_id) as marca:
+        caso_dict.update(marca)
+        result = await db.casos.insert_one(caso_dict)
+    caso_dict["id"] = str(result.inserted_id)
+    await notificar_alteracao(user_id, "casos", "criado", caso_dict["id"])
     
     return Caso(**caso_dict)
 
-@api_router.get(\"/casos\", response_model=List[Caso])
-async def listar_casos(user_id: str = Depends(get_current_user)):
-    casos = await db.casos.find({\"user_id\": user_id}).to_list(1000)
-    return [Caso(id=str(c[\"_id\"]), **{k: v for k, v in c.items() if k != \"_id\"}) for c in casos]
-
-@api_router.get(\"/casos/{caso_id}\", response_model=Caso)
+@api_router.get("/casos", response_model=Pagina[Caso])
+async def listar_casos(
+    user_id: str = Depends(usuario_condicional),
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    ordenar_por: Literal["_id", "criado_em"] = "_id",
+    ordem: Ordem = "asc",
+    response: Response = None,
+):
+    casos, next_cursor = await paginar(db.casos, {"user_id": user_id}, ordenar_por, ordem, cursor, limit, projection=projecao_saida(Caso))
+    return pagina_saida(casos, next_cursor, Caso, response)
+
+@api_router.get("/casos/{caso_id}", response_model=Caso)
 async def obter_caso(caso_id: str, user_id: str = Depends(get_current_user)):
-    caso = await db.casos.find_one({\"_id\": ObjectId(caso_id), \"user_id\": user_id})
+    caso = await db.casos.find_one({"_id": ObjectId(caso_id), "user_id": user_id})
     if not caso:
-        raise HTTPException(status_code=404, detail=\"Caso não encontrado\")
-    return Caso(id=str(caso[\"_id\"]), **{k: v for k, v in caso.items() if k != \"_id\"})
+        raise HTTPException(status_code=404, detail="Caso não encontrado")
+    return Caso(id=str(caso["_id"]), **{k: v for k, v in caso.items() if k != "_id"})
 
-@api_router.put(\"/casos/{caso_id}\", response_model=Caso)
+@api_router.put("/casos/{caso_id}", response_model=Caso)
 async def atualizar_caso(caso_id: str, caso: CasoCreate, user_id: str = Depends(get_current_user)):
-    result = await db.casos.update_one(
-        {\"_id\": ObjectId(caso_id), \"user_id\": user_id},
-        {\"$set\": caso.dict()}
-    )
+    async with carimbo(user_id) as marca:
+        result = await db.casos.update_one(
+            {"_id": ObjectId(caso_id), "user_id": user_id},
+            {"$set": {**caso.dict(), **campos_derivados("casos", caso.dict()), **marca}}
+        )
     if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail=\"Caso não encontrado\")
+        raise HTTPException(status_code=404, detail="Caso não encontrado")
+    await notificar_alteracao(user_id, "casos", "atualizado", caso_id)
     return await obter_caso(caso_id, user_id)
 
-@api_router.delete(\"/casos/{caso_id}\")
+@api_router.delete("/casos/{caso_id}")
 async def deletar_caso(caso_id: str, user_id: str = Depends(get_current_user)):
-    result = await db.casos.delete_one({\"_id\": ObjectId(caso_id), \"user_id\": user_id})
+    result = await db.casos.delete_one({"_id": ObjectId(caso_id), "user_id": user_id})
     if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail=\"Caso não encontrado\")
-    return {\"message\": \"Caso deletado com sucesso\"}
+        raise HTTPException(status_code=404, detail="Caso não encontrado")
+    await registrar_exclusoes(user_id, "casos", [caso_id])
+    await apagar_historicos("casos", user_id, [caso_id])
+    await notificar_alteracao(user_id, "casos", "excluido", caso_id)
+    return {"message": "Caso deletado com sucesso"}
 
-@api_router.post(\"/casos/{caso_id}/movimentacoes\")
+@api_router.post("/casos/{caso_id}/movimentacoes")
 async def adicionar_movimentacao(caso_id: str, movimentacao: MovimentacaoCreate, user_id: str = Depends(get_current_user)):
-    movimentacao_dict = {
-        \"descricao\": movimentacao.descricao,
-        \"data\": datetime.utcnow().isoformat()
-    }
-    result = await db.casos.update_one(
-        {\"_id\": ObjectId(caso_id), \"user_id\": user_id},
-        {\"$push\": {\"timeline\": movimentacao_dict}}
+    if not await registrar_historico("casos", caso_id, user_id, movimentacao.descricao):
+        raise HTTPException(status_code=404, detail="Caso não encontrado")
+    return {"message": "Movimentação adicionada com sucesso"}
+
+@api_router.get("/casos/{caso_id}/movimentacoes", response_model=Pagina[Movimentacao])
+async def listar_movimentacoes(
+    caso_id: str,
+    user_id: str = Depends(usuario_condicional),
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    ordenar_por: Literal["_id", "data"] = "data",
+    ordem: Ordem = "desc",
+    response: Response = None,
+):
+    movimentacoes, next_cursor = await paginar(db.movimentacoes, {"user_id": user_id, "caso_id": caso_id}, ordenar_por, ordem, cursor, limit, projection=projecao_saida(Movimentacao))
+    return pagina_saida(movimentacoes, next_cursor, Movimentacao, response)
+
+COMPLETO_LIMITE = int(os.environ.get('COMPLETO_LIMITE', '100'))
+# Coleção relacionada -> (modelo, ordenação) no payload de /casos/{id}/completo
+RELACIONADOS_CASO = {
+    "prazos": (Prazo, [("data", 1), ("_id", 1)]),
+    "tarefas": (Tarefa, [("criado_em", -1), ("_id", -1)]),
+    "documentos": (Documento, [("criado_em", -1), ("_id", -1)]),
+    "financeiro": (Financeiro, [("data_vencimento", 1), ("_id", 1)]),
+}
+
+@api_router.get("/casos/{caso_id}/completo", response_model=CasoCompleto)
+async def obter_caso_completo(caso_id: str, user_id: str = Depends(usuario_condicional), response: Response = None):
+    async def caso_e_cliente():
+        # O cliente depende do caso; as listas relacionadas correm em paralelo com os dois
+        caso = await db.casos.find_one({"_id": ObjectId(caso_id), "user_id": user_id}, projecao_saida(Caso))
+        if not caso:
+            raise HTTPException(status_code=404, detail="Caso não encontrado")
+        cliente = None
+        if ObjectId.is_valid(caso.get("cliente_id") or ""):
+            cliente = await db.clientes.find_one({"_id": ObjectId(caso["cliente_id"]), "user_id": user_id}, projecao_saida(Cliente))
+        return caso, cliente
+    
+    async def relacionados(colecao: str, modelo: Type[BaseModel], ordenacao: list) -> List[dict]:
+        cursor = db[colecao].find({"user_id": user_id, "caso_id": caso_id}, projecao_saida(modelo)).sort(ordenacao)
+        return await cursor.limit(COMPLETO_LIMITE + 1).to_list(COMPLETO_LIMITE + 1)
+    
+    (caso, cliente), *listas = await asyncio.gather(
+        caso_e_cliente(),
+        *(relacionados(colecao, modelo, ordenacao) for colecao, (modelo, ordenacao) in RELACIONADOS_CASO.items()),
     )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail=\"Caso não encontrado\")
-    return {\"message\": \"Movimentação adicionada com sucesso\"}
+    conteudo = {
+        "caso": documento_saida(caso, padroes_saida(Caso)),
+        "cliente": documento_saida(cliente, padroes_saida(Cliente)) if cliente else None,
+        "truncado": [],
+    }
+    for (colecao, (modelo, _)), docs in zip(RELACIONADOS_CASO.items(), listas):
+        if len(docs) > COMPLETO_LIMITE:
+            conteudo["truncado"].append(colecao)
+        padroes = padroes_saida(modelo)
+        conteudo[colecao] = [documento_saida(d, padroes) for d in docs[:COMPLETO_LIMITE]]
+    return resposta_saida(conteudo, response)
 
 # ==================== PRAZO ROUTES ====================
 
-@api_router.post(\"/prazos\", response_model=Prazo)
+@api_router.post("/prazos", response_model=Prazo)
 async def criar_prazo(prazo: PrazoCreate, user_id: str = Depends(get_current_user)):
     prazo_dict = prazo.dict()
-    prazo_dict[\"user_id\"] = user_id
-    prazo_dict[\"criado_em\"] = datetime.utcnow()
-    
-    result = await db.prazos.insert_one(prazo_dict)
-    prazo_dict[\"id\"] = str(result.inserted_id)
+    prazo_dict["user_id"] = user_id
+    prazo_dict["criado_em"] = datetime.utcnow()
+    prazo_dict.update(campos_derivados("prazos", prazo_dict))
+    async with carimbo(user_id) as marca:
+        prazo_dict.update(marca)
+        result = await db.prazos.insert_one(prazo_dict)
+    prazo_dict["id"] = str(result.inserted_id)
+    await notificar_alteracao(user_id, "prazos", "criado", prazo_dict["id"])
     
     return Prazo(**prazo_dict)
 
-@api_router.get(\"/prazos\", response_model=List[Prazo])
-async def listar_prazos(user_id: str = Depends(get_current_user)):
-    prazos = await db.prazos.find({\"user_id\": user_id}).to_list(1000)
-    return [Prazo(id=str(p[\"_id\"]), **{k: v for k, v in p.items() if k != \"_id\"}) for p in prazos]
-
-@api_router.get(\"/prazos/{prazo_id}\", response_model=Prazo)
+@api_router.get("/prazos", response_model=Pagina[Prazo])
+async def listar_prazos(
+    user_id: str = Depends(usuario_condicional),
+    caso_id: Optional[str] = None,
+    cliente_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    ordenar_por: Optional[Literal["_id", "criado_em", "data"]] = None,
+    ordem: Ordem = "asc",
+    de: Optional[date] = None,
+    ate: Optional[date] = None,
+    response: Response = None,
+):
+    # Com período, o padrão é ordenar pela data: o índice (user_id, data, _id) atende filtro e ordenação
+    ordenar_por = ordenar_por or ("data" if de or ate else "_id")
+    query = {"user_id": user_id, **filtro_periodo("data", de, ate)}
+    if caso_id:
+        query["caso_id"] = caso_id
+    if cliente_id:
+        query["cliente_id"] = cliente_id
+    
+    prazos, next_cursor = await paginar(db.prazos, query, ordenar_por, ordem, cursor, limit, projection=projecao_saida(Prazo))
+    return pagina_saida(prazos, next_cursor, Prazo, response)
+
+@api_router.get("/prazos/por-dia", response_model=List[ContagemDia])
+async def contar_prazos_por_dia(
+    mes: Optional[str] = Query(None, pattern=MES),
+    de: Optional[date] = None,
+    ate: Optional[date] = None,
+    user_id: str = Depends(usuario_condicional),
+):
+    # Contagem por dia local para os pontos do calendário; mes (AAAA-MM) ou de/ate
+    if mes:
+        de = date.fromisoformat(f"{mes}-01")
+        ate = (de + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if not de or not ate:
+        raise HTTPException(status_code=400, detail="Informe mes ou de e ate")
+    if (ate - de).days > 366:
+        raise HTTPException(status_code=400, detail="Período máximo de um ano")
+    pipeline = [
+        {"$match": {"user_id": user_id, **filtro_periodo("data", de, ate)}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$data", "timezone": FUSO_HORARIO.key}},
+            "total": {"$sum": 1},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    return [ContagemDia(data=d["_id"], total=d["total"]) async for d in db.prazos.aggregate(pipeline)]
+
+@api_router.get("/prazos/{prazo_id}", response_model=Prazo)
 async def obter_prazo(prazo_id: str, user_id: str = Depends(get_current_user)):
-    prazo = await db.prazos.find_one({\"_id\": ObjectId(prazo_id), \"user_id\": user_id})
+    prazo = await db.prazos.find_one({"_id": ObjectId(prazo_id), "user_id": user_id})
     if not prazo:
-        raise HTTPException(status_code=404, detail=\"Prazo não encontrado\")
-    return Prazo(id=str(prazo[\"_id\"]), **{k: v for k, v in prazo.items() if k != \"_id\"})
+        raise HTTPException(status_code=404, detail="Prazo não encontrado")
+    return Prazo(id=str(prazo["_id"]), **{k: v for k, v in prazo.items() if k != "_id"})
 
-@api_router.put(\"/prazos/{prazo_id}\", response_model=Prazo)
+@api_router.put("/prazos/{prazo_id}", response_model=Prazo)
 async def atualizar_prazo(prazo_id: str, prazo: PrazoCreate, user_id: str = Depends(get_current_user)):
-    result = await db.prazos.update_one(
-        {\"_id\": ObjectId(prazo_id), \"user_id\": user_id},
-        {\"$set\": prazo.dict()}
-    )
+    async with carimbo(user_id) as marca:
+        result = await db.prazos.update_one(
+            {"_id": ObjectId(prazo_id), "user_id": user_id},
+            {"$set": {**prazo.dict(), **campos_derivados("prazos", prazo.dict()), **marca}}
+        )
     if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail=\"Prazo não encontrado\")
+        raise HTTPException(status_code=404, detail="Prazo não encontrado")
+    await apagar_notificacoes([prazo_id])
+    await notificar_alteracao(user_id, "prazos", "atualizado", prazo_id)
     return await obter_prazo(prazo_id, user_id)
 
-@api_router.delete(\"/prazos/{prazo_id}\")
+@api_router.delete("/prazos/{prazo_id}")
 async def deletar_prazo(prazo_id: str, user_id: str = Depends(get_current_user)):
-    result = await db.prazos.delete_one({\"_id\": ObjectId(prazo_id), \"user_id\": user_id})
+    result = await db.prazos.delete_one({"_id": ObjectId(prazo_id), "user_id": user_id})
     if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail=\"Prazo não encontrado\")
-    return {\"message\": \"Prazo deletado com sucesso\"}
+        raise HTTPException(status_code=404, detail="Prazo não encontrado")
+    await registrar_exclusoes(user_id, "prazos", [prazo_id])
+    await apagar_notificacoes([prazo_id])
+    await notificar_alteracao(user_id, "prazos", "excluido", prazo_id)
+    return {"message": "Prazo deletado com sucesso"}
 
 # ==================== TAREFA ROUTES ====================
 
-@api_router.post(\"/tarefas\", response_model=Tarefa)
+@api_router.post("/tarefas", response_model=Tarefa)
 async def criar_tarefa(tarefa: TarefaCreate, user_id: str = Depends(get_current_user)):
     tarefa_dict = tarefa.dict()
-    tarefa_dict[\"user_id\"] = user_id
-    tarefa_dict[\"criado_em\"] = datetime.utcnow()
-    
-    result = await db.tarefas.insert_one(tarefa_dict)
-    tarefa_dict[\"id\"] = str(result.inserted_id)
+    tarefa_dict["user_id"] = user_id
+    tarefa_dict.update(campos_derivados("tarefas", tarefa_dict))
+    tarefa_dict["criado_em"] = datetime.utcnow()
+    async with carimbo(user_id) as marca:
+        tarefa_dict.update(marca)
+        result = await db.tarefas.insert_one(tarefa_dict)
+    tarefa_dict["id"] = str(result.inserted_id)
+    await notificar_alteracao(user_id, "tarefas", "criado", tarefa_dict["id"])
     
     return Tarefa(**tarefa_dict)
 
-@api_router.get(\"/tarefas\", response_model=List[Tarefa])
-async def listar_tarefas(user_id: str = Depends(get_current_user)):
-    tarefas = await db.tarefas.find({\"user_id\": user_id}).to_list(1000)
-    return [Tarefa(id=str(t[\"_id\"]), **{k: v for k, v in t.items() if k != \"_id\"}) for t in tarefas]
+@api_router.get("/tarefas", response_model=Pagina[Tarefa])
+async def listar_tarefas(
+    user_id: str = Depends(usuario_condicional),
+    caso_id: Optional[str] = None,
+    cliente_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    ordenar_por: Literal["_id", "criado_em"] = "_id",
+    ordem: Ordem = "asc",
+    response: Response = None,
+):
+    query = {"user_id": user_id}
+    if caso_id:
+        query["caso_id"] = caso_id
+    if cliente_id:
+        query["cliente_id"] = cliente_id
+    
+    tarefas, next_cursor = await paginar(db.tarefas, query, ordenar_por, ordem, cursor, limit, projection=projecao_saida(Tarefa))
+    return pagina_saida(tarefas, next_cursor, Tarefa, response)
 
-@api_router.get(\"/tarefas/{tarefa_id}\", response_model=Tarefa)
+@api_router.get("/tarefas/{tarefa_id}", response_model=Tarefa)
 async def obter_tarefa(tarefa_id: str, user_id: str = Depends(get_current_user)):
-    tarefa = await db.tarefas.find_one({\"_id\": ObjectId(tarefa_id), \"user_id\": user_id})
+    tarefa = await db.tarefas.find_one({"_id": ObjectId(tarefa_id), "user_id": user_id})
     if not tarefa:
-        raise HTTPException(status_code=404, detail=\"Tarefa não encontrada\")
-    return Tarefa(id=str(tarefa[\"_id\"]), **{k: v for k, v in tarefa.items() if k != \"_id\"})
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return Tarefa(id=str(tarefa["_id"]), **{k: v for k, v in tarefa.items() if k != "_id"})
 
-@api_router.put(\"/tarefas/{tarefa_id}\", response_model=Tarefa)
+@api_router.put("/tarefas/{tarefa_id}", response_model=Tarefa)
 async def atualizar_tarefa(tarefa_id: str, tarefa: TarefaCreate, user_id: str = Depends(get_current_user)):
-    result = await db.tarefas.update_one(
-        {\"_id\": ObjectId(tarefa_id), \"user_id\": user_id},
-        {\"$set\": tarefa.dict()}
-    )
+    async with carimbo(user_id) as marca:
+        result = await db.tarefas.update_one(
+            {"_id": ObjectId(tarefa_id), "user_id": user_id},
+            {"$set": {**tarefa.dict(), **campos_derivados("tarefas", tarefa.dict()), **marca}}
+        )
     if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail=\"Tarefa não encontrada\")
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    await notificar_alteracao(user_id, "tarefas", "atualizado", tarefa_id)
     return await obter_tarefa(tarefa_id, user_id)
 
-@api_router.delete(\"/tarefas/{tarefa_id}\")
+@api_router.delete("/tarefas/{tarefa_id}")
 async def deletar_tarefa(tarefa_id: str, user_id: str = Depends(get_current_user)):
-    result = await db.tarefas.delete_one({\"_id\": ObjectId(tarefa_id), \"user_id\": user_id})
+    result = await db.tarefas.delete_one({"_id": ObjectId(tarefa_id), "user_id": user_id})
     if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail=\"Tarefa não encontrada\")
-    return {\"message\": \"Tarefa deletada com sucesso\"}
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    await registrar_exclusoes(user_id, "tarefas", [tarefa_id])
+    await notificar_alteracao(user_id, "tarefas", "excluido", tarefa_id)
+    return {"message": "Tarefa deletada com sucesso"}
 
 # ==================== DOCUMENTO ROUTES ====================
 
-@api_router.post(\"/documentos\", response_model=Documento)
-async def criar_documento(documento: DocumentoCreate, user_id: str = Depends(get_current_user)):
-    documento_dict = documento.dict()
-    documento_dict[\"user_id\"] = user_id
-    documento_dict[\"criado_em\"] = datetime.utcnow()
+# Conteúdo dos documentos fica no GridFS (bucket "arquivos"); db.documentos guarda só metadados.
+# Cada conteúdo é identificado pelo SHA-256 em db.blobs (por usuário) com contagem de referências,
+# então anexar o mesmo arquivo a vários casos/clientes guarda os bytes uma única vez.
+CHUNK_ARQUIVO = 1024 * 1024
+
+def bucket_arquivos() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db, bucket_name="arquivos")
+
+async def ler_upload(arquivo: UploadFile):
+    while True:
+        chunk = await arquivo.read(CHUNK_ARQUIVO)
+        if not chunk:
+            break
+        yield chunk
+
+async def ler_base64(conteudo: str):
+    # Aceita data URI ("data:...;base64,") e decodifica em blocos alinhados a 4 caracteres
+    if conteudo.startswith("data:"):
+        conteudo = conteudo.split(",", 1)[-1]
+    conteudo = "".join(conteudo.split())
+    passo = CHUNK_ARQUIVO // 3 * 4
+    for inicio in range(0, len(conteudo), passo):
+        try:
+            yield base64.b64decode(conteudo[inicio:inicio + passo], validate=True)
+        except ValueError as e:
+            # Texto com caracteres fora do ASCII chega como ValueError; quem chama trata binascii.Error
+            raise binascii.Error(str(e)) from e
+
+async def referenciar_blob(user_id: str, sha256: str, arquivo_id: ObjectId, tamanho: int, content_type: str) -> dict:
+    # Cria o blob ou só incrementa refs se o conteúdo já existe; o arquivo_id devolvido é o que vale
+    for tentativa in range(2):
+        try:
+            return await db.blobs.find_one_and_update(
+                {"user_id": user_id, "sha256": sha256},
+                {
+                    "$setOnInsert": {"arquivo_id": arquivo_id, "tamanho": tamanho, "content_type": content_type, "criado_em": datetime.utcnow()},
+                    "$inc": {"refs": 1},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Upload concorrente do mesmo conteúdo criou o blob primeiro; a nova tentativa só incrementa
+            if tentativa:
+                raise
+
+async def liberar_blob(user_id: str, sha256: str):
+    blob = await db.blobs.find_one_and_update(
+        {"user_id": user_id, "sha256": sha256},
+        {"$inc": {"refs": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not blob or blob["refs"] > 0:
+        return
+    # Só apaga se ninguém voltou a referenciar o blob entre o decremento e aqui
+    result = await db.blobs.delete_one({"_id": blob["_id"], "refs": {"$lte": 0}})
+    if result.deleted_count:
+        try:
+            await bucket_arquivos().delete(blob["arquivo_id"])
+        except NoFile:
+            pass
+
+async def salvar_arquivo(user_id: str, nome: str, chunks, content_type: str) -> dict:
+    bucket = bucket_arquivos()
+    grid_in = bucket.open_upload_stream(nome)
+    sha256 = hashlib.sha256()
+    tamanho = 0
+    try:
+        async for chunk in chunks:
+            sha256.update(chunk)
+            await grid_in.write(chunk)
+            tamanho += len(chunk)
+    except BaseException:
+        await grid_in.abort()
+        raise
+    await grid_in.close()
     
-    result = await db.documentos.insert_one(documento_dict)
-    documento_dict[\"id\"] = str(result.inserted_id)
+    blob = await referenciar_blob(user_id, sha256.hexdigest(), grid_in._id, tamanho, content_type)
+    if blob["arquivo_id"] != grid_in._id:
+        # Conteúdo repetido: fica só o arquivo que já existia
+        await bucket.delete(grid_in._id)
+    return {"arquivo_id": blob["arquivo_id"], "sha256": blob["sha256"], "tamanho": blob["tamanho"]}
+
+async def registrar_documento(user_id: str, documento: DocumentoBase, arquivo: dict, content_type: str) -> Documento:
+    documento_dict = documento.dict(exclude={"conteudo_base64", "sha256"})
+    documento_dict.update(arquivo)
+    documento_dict["user_id"] = user_id
+    documento_dict["content_type"] = content_type
+    documento_dict["criado_em"] = datetime.utcnow()
+    async with carimbo(user_id) as marca:
+        documento_dict.update(marca)
+        result = await db.documentos.insert_one(documento_dict)
+    documento_dict["id"] = str(result.inserted_id)
     
     return Documento(**documento_dict)
 
-@api_router.get(\"/documentos\", response_model=List[Documento])
-async def listar_documentos(user_id: str = Depends(get_current_user), caso_id: Optional[str] = None, cliente_id: Optional[str] = None):
-    query = {\"user_id\": user_id}
+async def migrar_documento(documento: dict) -> dict:
+    # Move um documento antigo com conteudo_base64 embutido para o GridFS
+    arquivo = await salvar_arquivo(documento["user_id"], documento["nome"], ler_base64(documento["conteudo_base64"]), "application/octet-stream")
+    async with carimbo(documento["user_id"]) as marca:
+        await db.documentos.update_one(
+            {"_id": documento["_id"]},
+            {"$set": {**arquivo, **marca}, "$unset": {"conteudo_base64": ""}}
+        )
+    documento.pop("conteudo_base64")
+    documento.update(arquivo)
+    return documento
+
+async def migrar_documentos() -> int:
+    migrados = 0
+    async for documento in db.documentos.find({"conteudo_base64": {"$exists": True}, "arquivo_id": {"$exists": False}}):
+        try:
+            await migrar_documento(documento)
+            migrados += 1
+        except binascii.Error:
+            logger.warning("Documento %s com base64 inválido não foi migrado", documento["_id"])
+    return migrados
+
+def intervalo_range(header: str, tamanho: int) -> Optional[Tuple[int, int]]:
+    # Um único intervalo "bytes=a-b", "bytes=a-" ou "bytes=-n"; outros formatos devolvem o arquivo inteiro
+    unidade, _, intervalo = header.partition("=")
+    if unidade.strip().lower() != "bytes" or "," in intervalo:
+        return None
+    inicio_txt, traco, fim_txt = intervalo.strip().partition("-")
+    if not traco:
+        return None
+    try:
+        if inicio_txt == "":
+            inicio, fim = max(tamanho - int(fim_txt), 0), tamanho - 1
+        else:
+            inicio = int(inicio_txt)
+            fim = min(int(fim_txt), tamanho - 1) if fim_txt else tamanho - 1
+    except ValueError:
+        return None
+    if inicio >= tamanho or fim < inicio:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Intervalo inválido",
+            headers={"Content-Range": f"bytes */{tamanho}"}
+        )
+    return inicio, fim
+
+async def stream_arquivo(grid_out, inicio: int, restante: int):
+    grid_out.seek(inicio)
+    while restante > 0:
+        chunk = await grid_out.read(min(CHUNK_ARQUIVO, restante))
+        if not chunk:
+            break
+        restante -= len(chunk)
+        yield chunk
+
+@api_router.post("/documentos", response_model=Documento)
+async def criar_documento(documento: DocumentoCreate, user_id: str = Depends(get_current_user)):
+    try:
+        arquivo = await salvar_arquivo(user_id, documento.nome, ler_base64(documento.conteudo_base64), "application/octet-stream")
+    except binascii.Error:
+        raise HTTPException(status_code=400, detail="Conteúdo base64 inválido")
+    return await registrar_documento(user_id, documento, arquivo, "application/octet-stream")
+
+@api_router.post("/documentos/upload", response_model=Documento)
+async def enviar_documento(
+    arquivo: UploadFile = File(...),
+    tipo: str = Form(...),
+    nome: Optional[str] = Form(None),
+    caso_id: Optional[str] = Form(None),
+    cliente_id: Optional[str] = Form(None),
+    user_id: str = Depends(get_current_user),
+):
+    documento = DocumentoBase(nome=nome or arquivo.filename or "arquivo", tipo=tipo, caso_id=caso_id, cliente_id=cliente_id)
+    content_type = arquivo.content_type or "application/octet-stream"
+    return await registrar_documento(user_id, documento, await salvar_arquivo(user_id, documento.nome, ler_upload(arquivo), content_type), content_type)
+
+@api_router.post("/documentos/vincular", response_model=Documento)
+async def vincular_documento(documento: DocumentoVinculo, user_id: str = Depends(get_current_user)):
+    # Anexa um conteúdo já enviado pelo mesmo usuário sem reenviar os bytes
+    blob = await db.blobs.find_one_and_update(
+        {"user_id": user_id, "sha256": documento.sha256.lower(), "refs": {"$gt": 0}},
+        {"$inc": {"refs": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not blob:
+        raise HTTPException(status_code=404, detail="Conteúdo não encontrado, envie o arquivo")
+    arquivo = {"arquivo_id": blob["arquivo_id"], "sha256": blob["sha256"], "tamanho": blob["tamanho"]}
+    return await registrar_documento(user_id, documento, arquivo, blob.get("content_type", "application/octet-stream"))
+
+@api_router.get("/documentos/deduplicacao")
+async def relatorio_deduplicacao(user_id: str = Depends(usuario_limitado)):
+    documentos = await db.documentos.aggregate([
+        {"$match": {"user_id": user_id, "sha256": {"$exists": True}}},
+        {"$group": {"_id": None, "documentos": {"$sum": 1}, "bytes": {"$sum": "$tamanho"}}},
+    ]).to_list(1)
+    blobs = await db.blobs.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "blobs": {"$sum": 1}, "bytes": {"$sum": "$tamanho"}}},
+    ]).to_list(1)
+    documentos = documentos[0] if documentos else {"documentos": 0, "bytes": 0}
+    blobs = blobs[0] if blobs else {"blobs": 0, "bytes": 0}
+    return {
+        "documentos": documentos["documentos"],
+        "blobs": blobs["blobs"],
+        "bytes_logicos": documentos["bytes"],
+        "bytes_armazenados": blobs["bytes"],
+        "razao_deduplicacao": documentos["bytes"] / blobs["bytes"] if blobs["bytes"] else 1.0,
+    }
+
+@api_router.get("/documentos", response_model=Pagina[Documento])
+async def listar_documentos(
+    user_id: str = Depends(usuario_condicional),
+    caso_id: Optional[str] = None,
+    cliente_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    ordenar_por: Literal["_id", "criado_em"] = "_id",
+    ordem: Ordem = "asc",
+    response: Response = None,
+):
+    query = {"user_id": user_id}
     if caso_id:
-        query[\"caso_id\"] = caso_id
+        query["caso_id"] = caso_id
     if cliente_id:
-        query[\"cliente_id\"] = cliente_id
+        query["cliente_id"] = cliente_id
+    
+    documentos, next_cursor = await paginar(db.documentos, query, ordenar_por, ordem, cursor, limit, projection=projecao_saida(Documento))
+    return pagina_saida(documentos, next_cursor, Documento, response)
+
+@api_router.get("/documentos/{documento_id}/download")
+async def baixar_documento(documento_id: str, range_header: Optional[str] = Header(None, alias="Range"), user_id: str = Depends(get_current_user)):
+    documento = await db.documentos.find_one({"_id": ObjectId(documento_id), "user_id": user_id})
+    if not documento:
+        raise HTTPException(status_code=404, detail="Documento não encontrado")
+    if "arquivo_id" not in documento:
+        try:
+            documento = await migrar_documento(documento)
+        except binascii.Error:
+            raise HTTPException(status_code=422, detail="Conteúdo do documento corrompido")
+    
+    try:
+        grid_out = await bucket_arquivos().open_download_stream(documento["arquivo_id"])
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
     
-    documentos = await db.documentos.find(query).to_list(1000)
-    return [Documento(id=str(d[\"_id\"]), **{k: v for k, v in d.items() if k != \"_id\"}) for d in documentos]
+    tamanho = grid_out.length
+    inicio, fim = 0, tamanho - 1
+    status_code = status.HTTP_200_OK
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(documento['nome'])}",
+    }
+    intervalo = intervalo_range(range_header, tamanho) if range_header else None
+    if intervalo:
+        inicio, fim = intervalo
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+    headers["Content-Length"] = str(fim - inicio + 1)
+    
+    return StreamingResponse(
+        stream_arquivo(grid_out, inicio, fim - inicio + 1),
+        status_code=status_code,
+        media_type=documento.get("content_type", "application/octet-stream"),
+        headers=headers
+    )
 
-@api_router.delete(\"/documentos/{documento_id}\")
+@api_router.delete("/documentos/{documento_id}")
 async def deletar_documento(documento_id: str, user_id: str = Depends(get_current_user)):
-    result = await db.documentos.delete_one({\"_id\": ObjectId(documento_id), \"user_id\": user_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail=\"Documento não encontrado\")
-    return {\"message\": \"Documento deletado com sucesso\"}
+    documento = await db.documentos.find_one_and_delete({"_id": ObjectId(documento_id), "user_id": user_id}, {"arquivo_id": 1, "sha256": 1})
+    if not documento:
+        raise HTTPException(status_code=404, detail="Documento não encontrado")
+    await registrar_exclusoes(user_id, "documentos", [documento_id])
+    if "sha256" in documento:
+        await liberar_blob(user_id, documento["sha256"])
+    elif "arquivo_id" in documento:
+        try:
+            await bucket_arquivos().delete(documento["arquivo_id"])
+        except NoFile:
+            pass
+    return {"message": "Documento deletado com sucesso"}
 
 # ==================== FINANCEIRO ROUTES ====================
 
-@api_router.post(\"/financeiro\", response_model=Financeiro)
+@api_router.post("/financeiro", response_model=Financeiro)
 async def criar_financeiro(financeiro: FinanceiroCreate, user_id: str = Depends(get_current_user)):
     financeiro_dict = financeiro.dict()
-    financeiro_dict[\"user_id\"] = user_id
-    financeiro_dict[\"criado_em\"] = datetime.utcnow()
-    
-    result = await db.financeiro.insert_one(financeiro_dict)
-    financeiro_dict[\"id\"] = str(result.inserted_id)
+    financeiro_dict["user_id"] = user_id
+    financeiro_dict.update(campos_derivados("financeiro", financeiro_dict))
+    financeiro_dict["criado_em"] = datetime.utcnow()
+    async with carimbo(user_id) as marca:
+        financeiro_dict.update(marca)
+        result = await db.financeiro.insert_one(financeiro_dict)
+    financeiro_dict["id"] = str(result.inserted_id)
+    await notificar_alteracao(user_id, "financeiro", "criado", financeiro_dict["id"])
     
     return Financeiro(**financeiro_dict)
 
-@api_router.get(\"/financeiro\", response_model=List[Financeiro])
-async def listar_financeiro(user_id: str = Depends(get_current_user)):
-    financeiro = await db.financeiro.find({\"user_id\": user_id}).to_list(1000)
-    return [Financeiro(id=str(f[\"_id\"]), **{k: v for k, v in f.items() if k != \"_id\"}) for f in financeiro]
+@api_router.get("/financeiro", response_model=Pagina[Financeiro])
+async def listar_financeiro(
+    user_id: str = Depends(usuario_condicional),
+    caso_id: Optional[str] = None,
+    cliente_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    ordenar_por: Optional[Literal["_id", "criado_em", "data_vencimento"]] = None,
+    ordem: Ordem = "asc",
+    vencimento_de: Optional[date] = None,
+    vencimento_ate: Optional[date] = None,
+    tipo: Optional[Literal["receber", "pagar"]] = None,
+    response: Response = None,
+):
+    ordenar_por = ordenar_por or ("data_vencimento" if vencimento_de or vencimento_ate else "_id")
+    query = {"user_id": user_id, **filtro_periodo("data_vencimento", vencimento_de, vencimento_ate)}
+    if tipo:
+        query["tipo"] = tipo
+    if caso_id:
+        query["caso_id"] = caso_id
+    if cliente_id:
+        query["cliente_id"] = cliente_id
+    
+    financeiro, next_cursor = await paginar(db.financeiro, query, ordenar_por, ordem, cursor, limit, projection=projecao_saida(Financeiro))
+    return pagina_saida(financeiro, next_cursor, Financeiro, response)
 
-@api_router.get(\"/financeiro/{financeiro_id}\", response_model=Financeiro)
+@api_router.get("/financeiro/{financeiro_id}", response_model=Financeiro)
 async def obter_financeiro(financeiro_id: str, user_id: str = Depends(get_current_user)):
-    financeiro = await db.financeiro.find_one({\"_id\": ObjectId(financeiro_id), \"user_id\": user_id})
+    financeiro = await db.financeiro.find_one({"_id": ObjectId(financeiro_id), "user_id": user_id})
     if not financeiro:
-        raise HTTPException(status_code=404, detail=\"Registro não encontrado\")
-    return Financeiro(id=str(financeiro[\"_id\"]), **{k: v for k, v in financeiro.items() if k != \"_id\"})
+        raise HTTPException(status_code=404, detail="Registro não encontrado")
+    return Financeiro(id=str(financeiro["_id"]), **{k: v for k, v in financeiro.items() if k != "_id"})
 
-@api_router.put(\"/financeiro/{financeiro_id}\", response_model=Financeiro)
+@api_router.put("/financeiro/{financeiro_id}", response_model=Financeiro)
 async def atualizar_financeiro(financeiro_id: str, financeiro: FinanceiroCreate, user_id: str = Depends(get_current_user)):
-    result = await db.financeiro.update_one(
-        {\"_id\": ObjectId(financeiro_id), \"user_id\": user_id},
-        {\"$set\": financeiro.dict()}
-    )
+    async with carimbo(user_id) as marca:
+        result = await db.financeiro.update_one(
+            {"_id": ObjectId(financeiro_id), "user_id": user_id},
+            {"$set": {**financeiro.dict(), **campos_derivados("financeiro", financeiro.dict()), **marca}}
+        )
     if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail=\"Registro não encontrado\")
+        raise HTTPException(status_code=404, detail="Registro não encontrado")
+    await notificar_alteracao(user_id, "financeiro", "atualizado", financeiro_id)
     return await obter_financeiro(financeiro_id, user_id)
 
-@api_router.delete(\"/financeiro/{financeiro_id}\")
+@api_router.delete("/financeiro/{financeiro_id}")
 async def deletar_financeiro(financeiro_id: str, user_id: str = Depends(get_current_user)):
-    result = await db.financeiro.delete_one({\"_id\": ObjectId(financeiro_id), \"user_id\": user_id})
+    result = await db.financeiro.delete_one({"_id": ObjectId(financeiro_id), "user_id": user_id})
     if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail=\"Registro não encontrado\")
-    return {\"message\": \"Registro deletado com sucesso\"}
+        raise HTTPException(status_code=404, detail="Registro não encontrado")
+    await registrar_exclusoes(user_id, "financeiro", [financeiro_id])
+    await notificar_alteracao(user_id, "financeiro", "excluido", financeiro_id)
+    return {"message": "Registro deletado com sucesso"}
 
 # ==================== DASHBOARD ROUTES ====================
 
-@api_router.get(\"/dashboard\", response_model=DashboardStats)
-async def obter_dashboard(user_id: str = Depends(get_current_user)):
-    hoje = datetime.utcnow().date()
-    fim_semana = hoje + timedelta(days=7)
-    
-    # Prazos
-    prazos = await db.prazos.find({\"user_id\": user_id}).to_list(1000)
-    prazos_hoje = sum(1 for p in prazos if p.get(\"data\", \"\").startswith(str(hoje)))
-    prazos_semana = sum(1 for p in prazos if hoje <= datetime.fromisoformat(p.get(\"data\", \"\")).date() <= fim_semana)
-    
-    # Tarefas
-    tarefas_pendentes = await db.tarefas.count_documents({\"user_id\": user_id, \"status\": {\"$ne\": \"concluido\"}})
-    
-    # Processos
-    processos_ativos = await db.casos.count_documents({\"user_id\": user_id, \"status\": {\"$in\": [\"novo\", \"em andamento\"]}})
+def pipeline_dashboard(user_id: str, hoje) -> List[dict]:
+    # Uma única agregação: cada coleção entra já filtrada pelo índice e reduzida, e o $facet final
+    # devolve só as contagens de prazos, as somas e até 10 alertas (lidos de db.notificacoes).
+    # Casos ativos e tarefas pendentes vêm de db.contadores (ver obter_contadores).
+    amanha = inicio_dia_utc(hoje + timedelta(days=1))
+    fim_semana = inicio_dia_utc(hoje + timedelta(days=8))  # exclusivo: hoje + 7 dias inteiros
+    inicio_mes = hoje.replace(day=1)
+    proximo_mes = inicio_dia_utc((inicio_mes + timedelta(days=32)).replace(day=1))
+    inicio_mes = inicio_dia_utc(inicio_mes)
+    hoje = inicio_dia_utc(hoje)
+    return [
+        {"$match": {"user_id": user_id, "data": {"$gte": hoje, "$lt": fim_semana}}},
+        {"$project": {"_id": 0, "origem": "prazos", "titulo": 1, "data": 1}},
+        {"$unionWith": {"coll": "notificacoes", "pipeline": [
+            # Alertas já disparados pelo agendador de lembretes, um por prazo
+            {"$match": {"user_id": user_id, "data": {"$gte": hoje, "$lt": fim_semana}}},
+            {"$sort": {"data": 1, "dias": 1}},
+            {"$group": {"_id": "$prazo_id", "titulo": {"$first": "$titulo"}, "data": {"$first": "$data"}}},
+            {"$sort": {"data": 1}},
+            {"$limit": 10},
+            {"$project": {"_id": 0, "origem": "alertas", "titulo": 1, "data": 1}},
+        ]}},
+        {"$unionWith": {"coll": "financeiro", "pipeline": [
+            {"$match": {"user_id": user_id, "tipo": "receber", "status": {"$in": ["pendente", "atrasado"]}, "data_vencimento": {"$lt": proximo_mes}}},
+            {"$group": {
+                "_id": None,
+                "receber_mes": {"$sum": {"$cond": [{"$gte": ["$data_vencimento", inicio_mes]}, "$valor", 0]}},
+                "atrasadas": {"$sum": {"$cond": [{"$lt": ["$data_vencimento", hoje]}, "$valor", 0]}},
+            }},
+            {"$project": {"_id": 0, "origem": "financeiro", "receber_mes": 1, "atrasadas": 1}},
+        ]}},
+        {"$facet": {
+            "prazos": [
+                {"$match": {"origem": "prazos"}},
+                {"$group": {
+                    "_id": None,
+                    "hoje": {"$sum": {"$cond": [{"$lt": ["$data", amanha]}, 1, 0]}},
+                    "semana": {"$sum": 1},
+                }},
+            ],
+            "alertas": [
+                {"$match": {"origem": "alertas"}},
+                {"$sort": {"data": 1}},
+            ],
+            "totais": [
+                {"$match": {"origem": "financeiro"}},
+            ],
+        }},
+    ]
+
+def montar_alerta(prazo: dict, hoje) -> Optional[dict]:
+    data = data_local(prazo.get("data"))
+    if data is None:
+        return None
+    dias_restantes = (data - hoje).days
+    titulo = prazo.get("titulo", "")
+    if dias_restantes == 0:
+        return {"tipo": "prazo", "mensagem": f"HOJE: {titulo}", "urgencia": "alta"}
+    if dias_restantes == 1:
+        return {"tipo": "prazo", "mensagem": f"Amanhã: {titulo}", "urgencia": "alta"}
+    if dias_restantes <= 3:
+        return {"tipo": "prazo", "mensagem": f"Em {dias_restantes} dias: {titulo}", "urgencia": "media"}
+    return {"tipo": "prazo", "mensagem": f"Em {dias_restantes} dias: {titulo}", "urgencia": "baixa"}
+
+async def calcular_dashboard(user_id: str, hoje) -> DashboardStats:
+    resultado, contadores = await asyncio.gather(
+        db.prazos.aggregate(pipeline_dashboard(user_id, hoje)).to_list(1),
+        obter_contadores(user_id),
+    )
+    facetas = resultado[0] if resultado else {"prazos": [], "alertas": [], "totais": []}
     
-    # Financeiro
-    mes_atual = hoje.replace(day=1).isoformat()
-    financeiro = await db.financeiro.find({\"user_id\": user_id, \"tipo\": \"receber\"}).to_list(1000)
-    contas_receber_mes = sum(f[\"valor\"] for f in financeiro if f.get(\"data_vencimento\", \"\").startswith(mes_atual[:7]) and f[\"status\"] == \"pendente\")
-    contas_atrasadas = sum(f[\"valor\"] for f in financeiro if f.get(\"data_vencimento\", \"\") < str(hoje) and f[\"status\"] == \"pendente\")
-    
-    # Alertas
-    alertas = []
-    for prazo in prazos:
-        try:
-            data_prazo = datetime.fromisoformat(prazo.get(\"data\", \"\")).date()
-            dias_restantes = (data_prazo - hoje).days
-            if dias_restantes == 0:
-                alertas.append({\"tipo\": \"prazo\", \"mensagem\": f\"HOJE: {prazo.get('titulo', '')}\", \"urgencia\": \"alta\"})
-            elif dias_restantes == 1:
-                alertas.append({\"tipo\": \"prazo\", \"mensagem\": f\"Amanhã: {prazo.get('titulo', '')}\", \"urgencia\": \"alta\"})
-            elif dias_restantes <= 3:
-                alertas.append({\"tipo\": \"prazo\", \"mensagem\": f\"Em {dias_restantes} dias: {prazo.get('titulo', '')}\", \"urgencia\": \"media\"})
-            elif dias_restantes <= 7:
-                alertas.append({\"tipo\": \"prazo\", \"mensagem\": f\"Em {dias_restantes} dias: {prazo.get('titulo', '')}\", \"urgencia\": \"baixa\"})
-        except:
-            pass
+    prazos = facetas["prazos"][0] if facetas["prazos"] else {"hoje": 0, "semana": 0}
+    financeiro = facetas["totais"][0] if facetas["totais"] else {}
+    alertas = [a for a in (montar_alerta(p, hoje) for p in facetas["alertas"]) if a]
     
     return DashboardStats(
-        prazos_hoje=prazos_hoje,
-        prazos_semana=prazos_semana,
-        tarefas_pendentes=tarefas_pendentes,
-        processos_ativos=processos_ativos,
-        contas_receber_mes=contas_receber_mes,
-        contas_atrasadas=contas_atrasadas,
-        alertas=alertas[:10]  # Limitar a 10 alertas
+        prazos_hoje=prazos["hoje"],
+        prazos_semana=prazos["semana"],
+        tarefas_pendentes=contadores.get("tarefas_pendentes", 0),
+        processos_ativos=contadores.get("processos_ativos", 0),
+        contas_receber_mes=financeiro.get("receber_mes", 0),
+        contas_atrasadas=financeiro.get("atrasadas", 0),
+        alertas=alertas
     )
 
+@api_router.get("/dashboard", response_model=DashboardStats)
+async def obter_dashboard(user_id: str = Depends(usuario_condicional)):
+    hoje = hoje_local()
+    stats = await dashboard_cache.obter(user_id, hoje)
+    if stats is None:
+        chave = ("dashboard", str(hoje), versao_lida.get())
+        stats = await em_voo.executar(user_id, chave, "dashboard", lambda: calcular_e_guardar_dashboard(user_id, hoje))
+    return stats
+
+async def calcular_e_guardar_dashboard(user_id: str, hoje) -> DashboardStats:
+    geracao = dashboard_cache.geracao(user_id)
+    stats = await calcular_dashboard(user_id, hoje)
+    await dashboard_cache.guardar(user_id, hoje, stats, geracao)
+    return stats
+
+@api_router.get("/dashboard/cache")
+async def obter_dashboard_cache(user_id: str = Depends(get_current_user)):
+    return dashboard_cache.estatisticas()
+
+# ==================== SAÚDE ====================
+# /health só diz que o processo responde (liveness); /ready diz se este worker pode receber
+# tráfego: pool aquecido e MongoDB respondendo. Ficam fora do /api para as sondas do balanceador.
+
+PRONTIDAO_TIMEOUT = float(os.environ.get('PRONTIDAO_TIMEOUT', '2'))
+estado_servico = {"pronto": False}
+
+async def aquecer_pool():
+    # Abre até minPoolSize conexões em paralelo antes do primeiro request, no primário e,
+    # se as listagens vão para secundários, também neles
+    pings = [db.command("ping") for _ in range(max(1, MONGO_POOL_MIN))]
+    if MONGO_LEITURA != "primary":
+        pings += [db_leitura.command("ping", read_preference=db_leitura.read_preference) for _ in range(max(1, MONGO_POOL_MIN))]
+    inicio = time.perf_counter()
+    try:
+        await asyncio.gather(*pings)
+    except PyMongoError:
+        # Sobe mesmo assim; /ready fica 503 até o MongoDB responder
+        logger.exception("Falha ao aquecer o pool do MongoDB")
+        return
+    logger.info("Pool do MongoDB aquecido (%d pings) em %.0f ms", len(pings), (time.perf_counter() - inicio) * 1000)
+
+@app.get("/health", include_in_schema=False)
+async def saude():
+    return {"status": "ok"}
+
+@app.get("/ready", include_in_schema=False)
+async def prontidao():
+    if not estado_servico["pronto"]:
+        raise HTTPException(status_code=503, detail="Serviço iniciando ou encerrando")
+    try:
+        await asyncio.wait_for(db.command("ping"), PRONTIDAO_TIMEOUT)
+    except (PyMongoError, asyncio.TimeoutError):
+        raise HTTPException(status_code=503, detail="MongoDB indisponível")
+    return {"status": "pronto"}
+
+# ==================== MÉTRICAS ROUTES ====================
+
+@app.get("/metrics", include_in_schema=False)
+async def exportar_metricas():
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/consultas-lentas", include_in_schema=False)
+async def listar_consultas_lentas():
+    # Amostras dos comandos acima de MONGO_LENTO_MS, mais recentes primeiro
+    with metricas.lock:
+        return list(reversed(metricas.consultas_lentas))
+
 # Include router
 app.include_router(api_router)
+app.add_middleware(MetricasMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=[\"*\"],
-    allow_methods=[\"*\"],
-    allow_headers=[\"*\"],
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
 )
 
 logging.basicConfig(
@@ -579,7 +3139,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event(\"shutdown\")
 async def shutdown_db_client():
     client.close()
-"
\ No newline at end of file
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manutenção do banco MongoDB")
+    parser.add_argument("comando", choices=["criar-indices", "verificar-indices", "migrar-documentos", "migrar-historicos", "migrar-versoes", "migrar-lembretes", "migrar-busca", "migrar-datas", "manutencao", "agendador"])
+    args = parser.parse_args()
+
+    async def main():
+        if args.comando == "criar-indices":
+            await criar_indices()
+            return 0
+        if args.comando == "migrar-documentos":
+            print(f"{await migrar_documentos()} documentos migrados para o GridFS")
+            return 0
+        if args.comando == "migrar-historicos":
+            print(f"{await migrar_historicos()} clientes/casos com histórico migrado")
+            return 0
+        if args.comando == "agendador":
+            # Jobs de fundo num processo à parte, para os workers HTTP rodarem com eles desligados
+            await asyncio.gather(agendador_lembretes(), agendador_manutencao())
+            return 0
+        if args.comando == "manutencao":
+            resultado = await rodar_manutencao()
+            print(f"{resultado['atrasados'] or 0} lançamentos marcados como atrasados, contadores de {resultado['contadores'] or 0} usuários atualizados")
+            return 0 if None not in resultado.values() else 1
+        if args.comando == "migrar-datas":
+            print(f"{await migrar_datas()} registros com datas convertidas")
+            return 0
+        if args.comando == "migrar-busca":
+            print(f"{await migrar_busca()} registros indexados para busca")
+            return 0
+        if args.comando == "migrar-lembretes":
+            print(f"{await migrar_lembretes()} prazos com lembretes agendados")
+            return 0
+        if args.comando == "migrar-versoes":
+            print(f"{await migrar_versoes()} registros receberam versão de sincronização")
+            return 0
+        relatorio = await verificar_indices()
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str))
+        return 1 if any(item["collscan"] or item["sort_em_memoria"] for item in relatorio) else 0
+
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,110 @@
+"""Fixtures comuns: o server roda contra um MongoDB em memória (mongomock-motor), novo a cada teste.
+
+    cd app/backend && python -m pytest -q
+"""
+import io
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "advcontrol_testes")
+os.environ.setdefault("LIMITE_TAXA", "0")
+os.environ.setdefault("LEMBRETES_ATIVO", "0")
+os.environ.setdefault("MANUTENCAO_ATIVO", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from gridfs.errors import NoFile  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def banco(monkeypatch):
+    cliente = AsyncMongoMockClient()
+    banco = cliente[os.environ["DB_NAME"]]
+    monkeypatch.setattr(server, "client", cliente)
+    monkeypatch.setattr(server, "db", banco)
+    monkeypatch.setattr(server, "db_leitura", banco)
+    return banco
+
+
+@pytest.fixture
+def api():
+    # Sem o bloco with o lifespan não roda: nada de aquecer pool nem agendadores
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def usuario(api):
+    return api.post("/api/auth/register", json={"email": "teste@example.com", "password": "segredo", "nome": "Teste"}).json()
+
+
+@pytest.fixture
+def cabecalhos(usuario):
+    return {"Authorization": f"Bearer {usuario['token']}"}
+
+
+class ArquivoGravando:
+    def __init__(self, arquivos: dict):
+        self._id = ObjectId()
+        self._arquivos = arquivos
+        self._buffer = io.BytesIO()
+
+    async def write(self, dados: bytes):
+        self._buffer.write(dados)
+
+    async def close(self):
+        self._arquivos[self._id] = self._buffer.getvalue()
+
+    async def abort(self):
+        pass
+
+
+class ArquivoLendo:
+    def __init__(self, dados: bytes):
+        self._dados = dados
+        self._posicao = 0
+        self.length = len(dados)
+
+    def seek(self, posicao: int):
+        self._posicao = posicao
+
+    async def read(self, tamanho: int) -> bytes:
+        trecho = self._dados[self._posicao:self._posicao + tamanho]
+        self._posicao += len(trecho)
+        return trecho
+
+
+class BucketMemoria:
+    # O mongomock não tem GridFS: só a parte do AsyncIOMotorGridFSBucket que o server usa
+    def __init__(self):
+        self.arquivos = {}
+
+    def open_upload_stream(self, nome: str) -> ArquivoGravando:
+        return ArquivoGravando(self.arquivos)
+
+    async def open_download_stream(self, arquivo_id) -> ArquivoLendo:
+        if arquivo_id not in self.arquivos:
+            raise NoFile(arquivo_id)
+        return ArquivoLendo(self.arquivos[arquivo_id])
+
+    async def delete(self, arquivo_id):
+        if self.arquivos.pop(arquivo_id, None) is None:
+            raise NoFile(arquivo_id)
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    bucket = BucketMemoria()
+    monkeypatch.setattr(server, "bucket_arquivos", lambda: bucket)
+    return bucket
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+
+def cliente(nome, documento):
+    return {"tipo": "PF", "nome": nome, "cpf_cnpj": documento}
+
+
+def test_criacao_em_lote_reporta_cada_item(api, cabecalhos, banco):
+    resposta = api.post("/api/clientes/bulk?tamanho_lote=2", json=[
+        cliente("Ana", "1"), {"tipo": "PF"}, "nao-e-objeto", cliente("Bruno", "2"), cliente("Carla", "3"),
+    ], headers=cabecalhos)
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert (corpo["sucesso"], corpo["falhas"]) == (3, 2)
+    assert [r["indice"] for r in corpo["resultados"]] == [0, 1, 2, 3, 4]
+    assert "nome" in corpo["resultados"][1]["erro"]
+    assert corpo["resultados"][2]["erro"] == "Registro deve ser um objeto"
+
+    docs = asyncio.run(banco.clientes.find({}).sort("versao", 1).to_list(None))
+    assert [d["nome"] for d in docs] == ["Ana", "Bruno", "Carla"]
+    # Uma versão por registro, também entre lotes diferentes
+    assert len({d["versao"] for d in docs}) == 3
+    assert all(d["historico_atendimentos"] == [] and d["total_atendimentos"] == 0 for d in docs)
+
+
+def test_criacao_em_lote_aceita_ndjson(api, cabecalhos, banco):
+    linhas = [json.dumps(cliente("Ana", "1")), "", "{quebrado", json.dumps(cliente("Bruno", "2"))]
+    resposta = api.post(
+        "/api/clientes/bulk", content="\n".join(linhas).encode(),
+        headers={**cabecalhos, "Content-Type": "application/x-ndjson"},
+    )
+    assert resposta.status_code == 200
+    resultados = resposta.json()["resultados"]
+    # Linhas em branco não contam como registro
+    assert [r["indice"] for r in resultados] == [0, 1, 2]
+    assert resultados[0]["id"] and resultados[2]["id"] and resultados[1]["erro"]
+    assert asyncio.run(banco.clientes.count_documents({})) == 2
+
+
+def test_criacao_em_lote_rejeita_corpo_que_nao_e_lista(api, cabecalhos):
+    assert api.post("/api/clientes/bulk", json=cliente("Ana", "1"), headers=cabecalhos).status_code == 400
+    assert api.post("/api/clientes/bulk", content=b"{", headers={**cabecalhos, "Content-Type": "application/json"}).status_code == 400
+
+
+def test_atualizacao_em_lote_com_id_que_nao_e_texto(api, cabecalhos):
+    criado = api.post("/api/clientes", json=cliente("Ana", "1"), headers=cabecalhos).json()
+    resposta = api.put("/api/clientes/bulk", json=[
+        {"id": 12, **cliente("Bruno", "2")},
+        {"id": ["a"], **cliente("Carla", "3")},
+        {"id": "nao-e-objectid", **cliente("Davi", "4")},
+        {"id": criado["id"], **cliente("Ana Maria", "1")},
+    ], headers=cabecalhos)
+    assert resposta.status_code == 200
+    resultados = resposta.json()["resultados"]
+    assert [r.get("erro") for r in resultados[:3]] == ["id inválido"] * 3
+    assert resultados[3].get("erro") is None
+    assert api.get(f"/api/clientes/{criado['id']}", headers=cabecalhos).json()["nome"] == "Ana Maria"
+
+
+def test_exclusao_em_lote(api, cabecalhos, banco):
+    ids = [r["id"] for r in api.post("/api/clientes/bulk", json=[cliente("Ana", "1"), cliente("Bruno", "2")], headers=cabecalhos).json()["resultados"]]
+    outro = api.post("/api/auth/register", json={"email": "outro@example.com", "password": "segredo", "nome": "Outro"}).json()
+    alheio = api.post("/api/clientes", json=cliente("Carla", "3"), headers={"Authorization": f"Bearer {outro['token']}"}).json()
+
+    resposta = api.request("DELETE", "/api/clientes/bulk?tamanho_lote=1", json={"ids": [ids[0], "xyz", alheio["id"], ids[1]]}, headers=cabecalhos)
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert (corpo["sucesso"], corpo["falhas"]) == (2, 2)
+    assert [r.get("erro") for r in corpo["resultados"]] == [None, "id inválido", "Registro não encontrado", None]
+
+    # Só o registro do outro usuário sobra, e as exclusões ficam para o /sync
+    assert [d["nome"] for d in asyncio.run(banco.clientes.find({}).to_list(None))] == ["Carla"]
+    exclusoes = asyncio.run(banco.exclusoes.find({"colecao": "clientes"}).to_list(None))
+    assert sorted(e["registro_id"] for e in exclusoes) == sorted(ids)
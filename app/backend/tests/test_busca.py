@@ -0,0 +1,17 @@
+import server
+
+
+def test_tokenizar_normaliza_acentos_e_caixa():
+    assert server.tokenizar("João DA Silva-Araújo") == ["joao", "da", "silva", "araujo"]
+    assert server.termos_busca("clientes", {"nome": "Ana", "cpf_cnpj": "123.456.789-00"}) == ["00", "123", "12345678900", "456", "789", "ana"]
+
+
+def test_busca_traz_o_termo_exato_mesmo_com_muitos_prefixos(api, cabecalhos, monkeypatch):
+    monkeypatch.setattr(server, "BUSCA_CANDIDATOS", 5)
+    for i in range(8):
+        api.post("/api/clientes", json={"tipo": "PF", "nome": f"Ana Silveira {i}", "cpf_cnpj": "1"}, headers=cabecalhos)
+    api.post("/api/clientes", json={"tipo": "PF", "nome": "Ana Silva", "cpf_cnpj": "1"}, headers=cabecalhos)
+
+    resultados = api.get("/api/busca", params={"q": "silva"}, headers=cabecalhos).json()
+    assert resultados[0]["titulo"] == "Ana Silva"
+    assert len(api.get("/api/busca", params={"q": "silv"}, headers=cabecalhos).json()) == 5
@@ -0,0 +1,92 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+import server
+
+STATS = server.DashboardStats(
+    prazos_hoje=1, prazos_semana=2, tarefas_pendentes=3, processos_ativos=4,
+    contas_receber_mes=100.0, contas_atrasadas=0.0, alertas=[],
+)
+
+
+@pytest.mark.anyio
+async def test_memory_cache_descarta_valor_calculado_antes_do_delete():
+    cache = server.MemoryCache(maxsize=10, ttl=60)
+    geracao = cache.geracao("k")
+    await cache.delete("k")
+    await cache.set("k", "velho", geracao=geracao)
+    assert await cache.get("k") is None
+    await cache.set("k", "novo", geracao=cache.geracao("k"))
+    assert await cache.get("k") == "novo"
+
+
+@pytest.mark.anyio
+async def test_memory_cache_limitado_em_bytes():
+    cache = server.MemoryCache(maxsize=10, ttl=60, maxbytes=100)
+    await cache.set("a", 1, tamanho=60)
+    await cache.set("b", 2, tamanho=30)
+    await cache.get("a")  # a fica mais recente que b
+    await cache.set("c", 3, tamanho=30)
+    assert await cache.get("b") is None and await cache.get("a") == 1 and cache.bytes == 90
+    # Maior que o limite inteiro: não entra e não derruba ninguém
+    await cache.set("d", 4, tamanho=500)
+    assert await cache.get("d") is None and cache.bytes == 90
+    await cache.set("a", 5, tamanho=10)
+    assert cache.bytes == 40
+
+
+@pytest.mark.anyio
+async def test_dashboard_calculado_durante_uma_escrita_nao_fica_no_cache(monkeypatch):
+    hoje = server.hoje_local()
+
+    async def calcular(user_id, dia):
+        # A escrita termina (e invalida) enquanto o dashboard ainda está sendo calculado
+        await server.notificar_alteracao(user_id, "casos", "criado")
+        return STATS
+
+    monkeypatch.setattr(server, "calcular_dashboard", calcular)
+    assert await server.calcular_e_guardar_dashboard("u-dashboard", hoje) == STATS
+    assert await server.dashboard_cache.obter("u-dashboard", hoje) is None
+
+    async def calcular_sem_escrita(user_id, dia):
+        return STATS
+
+    monkeypatch.setattr(server, "calcular_dashboard", calcular_sem_escrita)
+    await server.calcular_e_guardar_dashboard("u-dashboard", hoje)
+    assert await server.dashboard_cache.obter("u-dashboard", hoje) == STATS
+
+
+@pytest.mark.anyio
+async def test_dashboard_da_virada_do_dia_e_um_miss():
+    hoje = server.hoje_local()
+    await server.dashboard_cache.guardar("u-virada", hoje, STATS, server.dashboard_cache.geracao("u-virada"))
+    assert await server.dashboard_cache.obter("u-virada", hoje) == STATS
+    assert await server.dashboard_cache.obter("u-virada", hoje + timedelta(days=1)) is None
+    await server.dashboard_cache.invalidar("u-virada")
+
+
+@pytest.mark.anyio
+async def test_frame_montado_durante_uma_escrita_nao_fica_no_cache(banco, monkeypatch):
+    await banco.financeiro.insert_one({
+        "user_id": "u-relatorios", "tipo": "receber", "valor": 10.0, "categoria": "honorarios",
+        "status": "pendente", "data_vencimento": server.data_bson("2030-01-10"),
+    })
+    loop = asyncio.get_running_loop()
+    original = server.montar_e_medir
+
+    def montar_com_escrita(registros):
+        # Roda no executor: a escrita é concluída no loop enquanto o frame é montado
+        asyncio.run_coroutine_threadsafe(server.notificar_alteracao("u-relatorios", "financeiro", "criado"), loop).result()
+        return original(registros)
+
+    monkeypatch.setattr(server, "montar_e_medir", montar_com_escrita)
+    frame = await server.carregar_lancamentos("u-relatorios")
+    assert len(frame) == 1
+    assert await server.relatorios_cache.get("financeiro:u-relatorios") is None
+
+    monkeypatch.setattr(server, "montar_e_medir", original)
+    await server.carregar_lancamentos("u-relatorios")
+    assert await server.relatorios_cache.get("financeiro:u-relatorios") is not None
+    await server.relatorios_cache.delete("financeiro:u-relatorios")
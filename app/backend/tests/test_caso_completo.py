@@ -0,0 +1,52 @@
+from bson import ObjectId
+
+import server
+
+
+def criar_caso(api, cabecalhos, cliente_id):
+    return api.post("/api/casos", json={"titulo": "Despejo", "area": "cível", "cliente_id": cliente_id}, headers=cabecalhos).json()["id"]
+
+
+def test_completo_junta_caso_cliente_e_relacionados(api, cabecalhos):
+    cliente_id = api.post("/api/clientes", json={"tipo": "PF", "nome": "Ana", "cpf_cnpj": "1"}, headers=cabecalhos).json()["id"]
+    caso_id = criar_caso(api, cabecalhos, cliente_id)
+    outro_caso = criar_caso(api, cabecalhos, cliente_id)
+    for dia in ("2030-05-20", "2030-05-10"):
+        api.post("/api/prazos", json={"tipo": "prazo", "titulo": dia, "data": dia, "hora": "10:00", "caso_id": caso_id}, headers=cabecalhos)
+    api.post("/api/prazos", json={"tipo": "prazo", "titulo": "outro", "data": "2030-05-01", "hora": "10:00", "caso_id": outro_caso}, headers=cabecalhos)
+    api.post("/api/tarefas", json={"titulo": "Petição", "caso_id": caso_id}, headers=cabecalhos)
+
+    resposta = api.get(f"/api/casos/{caso_id}/completo", headers=cabecalhos)
+    assert resposta.status_code == 200
+    completo = resposta.json()
+    assert completo["caso"]["id"] == caso_id and completo["cliente"]["nome"] == "Ana"
+    assert [p["data"] for p in completo["prazos"]] == ["2030-05-10", "2030-05-20"]
+    assert [t["titulo"] for t in completo["tarefas"]] == ["Petição"]
+    assert completo["documentos"] == [] and completo["financeiro"] == [] and completo["truncado"] == []
+    # Só os campos do modelo: nada de user_id, versão ou termos de busca
+    assert "user_id" not in completo["caso"] and "termos_busca" not in completo["prazos"][0]
+
+    etag = resposta.headers["ETag"]
+    assert api.get(f"/api/casos/{caso_id}/completo", headers={**cabecalhos, "If-None-Match": etag}).status_code == 304
+
+
+def test_completo_trunca_listas_longas(api, cabecalhos, monkeypatch):
+    monkeypatch.setattr(server, "COMPLETO_LIMITE", 2)
+    caso_id = criar_caso(api, cabecalhos, "sem-cliente")
+    for n in range(3):
+        api.post("/api/tarefas", json={"titulo": f"T{n}", "caso_id": caso_id}, headers=cabecalhos)
+    api.post("/api/prazos", json={"tipo": "prazo", "titulo": "P", "data": "2030-05-10", "hora": "10:00", "caso_id": caso_id}, headers=cabecalhos)
+
+    completo = api.get(f"/api/casos/{caso_id}/completo", headers=cabecalhos).json()
+    assert completo["cliente"] is None
+    assert completo["truncado"] == ["tarefas"]
+    # As mais recentes primeiro; o restante vem de /tarefas?caso_id=
+    assert [t["titulo"] for t in completo["tarefas"]] == ["T2", "T1"]
+    assert len(completo["prazos"]) == 1
+
+
+def test_completo_de_caso_inexistente_ou_alheio(api, cabecalhos):
+    caso_id = criar_caso(api, cabecalhos, "c1")
+    outro = api.post("/api/auth/register", json={"email": "outro@example.com", "password": "segredo", "nome": "Outro"}).json()
+    assert api.get(f"/api/casos/{caso_id}/completo", headers={"Authorization": f"Bearer {outro['token']}"}).status_code == 404
+    assert api.get(f"/api/casos/{ObjectId()}/completo", headers=cabecalhos).status_code == 404
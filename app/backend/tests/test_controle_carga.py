@@ -0,0 +1,207 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    instante = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: instante[0])
+    return instante
+
+
+def test_limitador_libera_a_rajada_e_depois_pede_espera(relogio):
+    limitador = server.LimitadorTaxa(taxa=2, rajada=3, por_rota={}, maxsize=100)
+    assert [limitador.consumir("u1", "/api/casos") for _ in range(3)] == [0, 0, 0]
+    assert limitador.consumir("u1", "/api/casos") == pytest.approx(0.5)
+    # Outro usuário e outra rota têm baldes próprios
+    assert limitador.consumir("u2", "/api/casos") == 0
+    assert limitador.consumir("u1", "/api/prazos") == 0
+
+
+def test_limitador_repoe_tokens_com_o_tempo(relogio):
+    limitador = server.LimitadorTaxa(taxa=2, rajada=3, por_rota={}, maxsize=100)
+    for _ in range(3):
+        limitador.consumir("u1", "/api/casos")
+    relogio[0] += 0.5
+    assert limitador.consumir("u1", "/api/casos") == 0
+    assert limitador.consumir("u1", "/api/casos") > 0
+    # Nunca acumula mais que a rajada
+    relogio[0] += 3600
+    assert [limitador.consumir("u1", "/api/casos") for _ in range(3)] == [0, 0, 0]
+    assert limitador.consumir("u1", "/api/casos") > 0
+
+
+def test_limitador_por_rota_e_taxa_zero(relogio):
+    limitador = server.LimitadorTaxa(taxa=0, rajada=0, por_rota={"/api/busca": (1, 1)}, maxsize=100)
+    assert all(limitador.consumir("u1", "/api/casos") == 0 for _ in range(50))
+    assert limitador.consumir("u1", "/api/busca") == 0
+    assert limitador.consumir("u1", "/api/busca") == pytest.approx(1.0)
+
+
+def test_limitador_descarta_os_baldes_mais_antigos(relogio):
+    limitador = server.LimitadorTaxa(taxa=1, rajada=1, por_rota={}, maxsize=2)
+    for user_id in ("u1", "u2", "u3"):
+        limitador.consumir(user_id, "/api/casos")
+    assert len(limitador._baldes) == 2
+    assert limitador.consumir("u1", "/api/casos") == 0
+
+
+def test_ler_limites_rotas():
+    assert server.ler_limites_rotas("/api/busca=2:5, /api/dashboard=1") == {"/api/busca": (2.0, 5.0), "/api/dashboard": (1.0, 1.0)}
+    assert server.ler_limites_rotas("") == {}
+
+
+def test_rota_limitada_responde_429(api, cabecalhos, monkeypatch):
+    monkeypatch.setattr(server, "limitador", server.LimitadorTaxa(taxa=1, rajada=1, por_rota={}, maxsize=100))
+    assert api.get("/api/casos", headers=cabecalhos).status_code == 200
+    resposta = api.get("/api/casos", headers=cabecalhos)
+    assert resposta.status_code == 429
+    assert resposta.headers["Retry-After"] == "1"
+
+
+@pytest.mark.anyio
+async def test_em_voo_junta_consultas_iguais():
+    em_voo = server.EmVoo()
+    chamadas = 0
+    liberar = asyncio.Event()
+
+    async def consulta():
+        nonlocal chamadas
+        chamadas += 1
+        await liberar.wait()
+        return ["resultado"]
+
+    tarefas = [asyncio.ensure_future(em_voo.executar("u1", "chave", "casos", consulta)) for _ in range(5)]
+    await asyncio.sleep(0)
+    liberar.set()
+    resultados = await asyncio.gather(*tarefas)
+    assert chamadas == 1
+    assert all(r is resultados[0] for r in resultados)
+    assert em_voo._voos == {}
+
+
+@pytest.mark.anyio
+async def test_em_voo_separa_usuarios_e_chaves():
+    em_voo = server.EmVoo()
+    chamadas = []
+
+    async def consulta(nome):
+        chamadas.append(nome)
+        await asyncio.sleep(0)
+        return nome
+
+    resultados = await asyncio.gather(
+        em_voo.executar("u1", "a", "casos", lambda: consulta("u1a")),
+        em_voo.executar("u1", "b", "casos", lambda: consulta("u1b")),
+        em_voo.executar("u2", "a", "casos", lambda: consulta("u2a")),
+    )
+    assert resultados == ["u1a", "u1b", "u2a"]
+    assert sorted(chamadas) == ["u1a", "u1b", "u2a"]
+
+
+@pytest.mark.anyio
+async def test_em_voo_erro_chega_a_todos_e_nao_fica_preso():
+    em_voo = server.EmVoo()
+
+    async def falha():
+        await asyncio.sleep(0)
+        raise RuntimeError("mongo fora")
+
+    resultados = await asyncio.gather(*(em_voo.executar("u1", "k", "casos", falha) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+    async def ok():
+        return 1
+
+    assert await em_voo.executar("u1", "k", "casos", ok) == 1
+
+
+@pytest.mark.anyio
+async def test_em_voo_cancelamento_de_um_cliente_nao_derruba_os_outros():
+    em_voo = server.EmVoo()
+    liberar = asyncio.Event()
+
+    async def consulta():
+        await liberar.wait()
+        return "ok"
+
+    primeiro = asyncio.ensure_future(em_voo.executar("u1", "k", "casos", consulta))
+    segundo = asyncio.ensure_future(em_voo.executar("u1", "k", "casos", consulta))
+    await asyncio.sleep(0)
+    primeiro.cancel()
+    liberar.set()
+    assert await segundo == "ok"
+
+
+@pytest.mark.anyio
+async def test_em_voo_invalidar_faz_a_proxima_consulta_comecar_de_novo():
+    em_voo = server.EmVoo()
+    liberar = asyncio.Event()
+    versoes = iter(["antes", "depois"])
+
+    async def consulta():
+        valor = next(versoes)
+        if valor == "antes":
+            await liberar.wait()
+        return valor
+
+    antiga = asyncio.ensure_future(em_voo.executar("u1", "k", "casos", consulta))
+    await asyncio.sleep(0)
+    em_voo.invalidar("u1")  # uma escrita terminou enquanto a consulta antiga rodava
+    assert await em_voo.executar("u1", "k", "casos", consulta) == "depois"
+    liberar.set()
+    assert await antiga == "antes"
+
+
+@pytest.mark.anyio
+async def test_leitura_depois_de_escrita_nao_pega_carona_em_consulta_anterior(cabecalhos, monkeypatch):
+    original = server.buscar_pagina
+    liberar = asyncio.Event()
+    consultas = 0
+
+    async def buscar_devagar(*args, **kwargs):
+        nonlocal consultas
+        consultas += 1
+        resultado = await original(*args, **kwargs)
+        if consultas == 1:
+            await liberar.wait()  # a primeira consulta já leu e ainda não respondeu
+        return resultado
+
+    monkeypatch.setattr(server, "buscar_pagina", buscar_devagar)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://testserver") as http:
+        antiga = asyncio.ensure_future(http.get("/api/clientes", headers=cabecalhos))
+        while consultas == 0:
+            await asyncio.sleep(0)
+        # criar_cliente não chama notificar_alteracao: só a versão separa as duas leituras
+        criado = (await http.post("/api/clientes", json={"tipo": "PF", "nome": "Ana", "cpf_cnpj": "1"}, headers=cabecalhos)).json()
+        nova = asyncio.ensure_future(http.get("/api/clientes", headers=cabecalhos))
+        # Se a nova leitura entrasse na consulta antiga, ficaria presa nela até liberar
+        await asyncio.wait([nova], timeout=1)
+        liberar.set()
+        antiga, nova = await antiga, await nova
+
+    assert consultas == 2
+    assert antiga.json()["items"] == []
+    assert [c["id"] for c in nova.json()["items"]] == [criado["id"]]
+    assert antiga.headers["ETag"] != nova.headers["ETag"]
+
+
+@pytest.mark.anyio
+async def test_leituras_na_mesma_versao_continuam_juntas(cabecalhos, monkeypatch):
+    original = server.buscar_pagina
+    consultas = 0
+
+    async def contar(*args, **kwargs):
+        nonlocal consultas
+        consultas += 1
+        await asyncio.sleep(0.01)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(server, "buscar_pagina", contar)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://testserver") as http:
+        respostas = await asyncio.gather(*(http.get("/api/casos", headers=cabecalhos) for _ in range(5)))
+    assert all(r.status_code == 200 for r in respostas) and consultas == 1
@@ -0,0 +1,88 @@
+import asyncio
+import base64
+import hashlib
+
+import pytest
+
+import server
+
+CONTEUDO = b"procuracao ad judicia" * 100
+SHA256 = hashlib.sha256(CONTEUDO).hexdigest()
+
+
+def enviar(api, cabecalhos, nome, conteudo=CONTEUDO):
+    resposta = api.post("/api/documentos", json={
+        "nome": nome, "tipo": "procuracao", "conteudo_base64": base64.b64encode(conteudo).decode(),
+    }, headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.json()
+
+
+def blob(banco):
+    return asyncio.run(banco.blobs.find_one({"sha256": SHA256}))
+
+
+def test_mesmo_conteudo_fica_guardado_uma_vez(api, cabecalhos, bucket, banco):
+    primeiro = enviar(api, cabecalhos, "caso-a.pdf")
+    segundo = enviar(api, cabecalhos, "caso-b.pdf")
+    assert primeiro["sha256"] == segundo["sha256"] == SHA256
+    assert len(bucket.arquivos) == 1
+    assert blob(banco)["refs"] == 2
+
+    relatorio = api.get("/api/documentos/deduplicacao", headers=cabecalhos).json()
+    assert relatorio["documentos"] == 2 and relatorio["blobs"] == 1
+    assert relatorio["bytes_logicos"] == 2 * len(CONTEUDO)
+    assert relatorio["bytes_armazenados"] == len(CONTEUDO)
+    assert relatorio["razao_deduplicacao"] == 2.0
+
+
+def test_arquivo_so_sai_com_a_ultima_referencia(api, cabecalhos, bucket, banco):
+    primeiro = enviar(api, cabecalhos, "caso-a.pdf")
+    segundo = enviar(api, cabecalhos, "caso-b.pdf")
+
+    assert api.delete(f"/api/documentos/{primeiro['id']}", headers=cabecalhos).status_code == 200
+    assert blob(banco)["refs"] == 1 and len(bucket.arquivos) == 1
+    assert api.get(f"/api/documentos/{segundo['id']}/download", headers=cabecalhos).content == CONTEUDO
+
+    assert api.delete(f"/api/documentos/{segundo['id']}", headers=cabecalhos).status_code == 200
+    assert blob(banco) is None and bucket.arquivos == {}
+
+
+def test_vincular_reaproveita_o_conteudo(api, cabecalhos, bucket, banco):
+    enviar(api, cabecalhos, "original.pdf")
+    resposta = api.post("/api/documentos/vincular", json={"nome": "copia.pdf", "tipo": "procuracao", "sha256": SHA256.upper()}, headers=cabecalhos)
+    assert resposta.status_code == 200 and resposta.json()["tamanho"] == len(CONTEUDO)
+    assert blob(banco)["refs"] == 2 and len(bucket.arquivos) == 1
+
+    desconhecido = api.post("/api/documentos/vincular", json={"nome": "x", "tipo": "outro", "sha256": "0" * 64}, headers=cabecalhos)
+    assert desconhecido.status_code == 404
+
+
+def test_conteudo_nao_e_compartilhado_entre_usuarios(api, cabecalhos, bucket, banco):
+    enviar(api, cabecalhos, "meu.pdf")
+    outro = api.post("/api/auth/register", json={"email": "outro@example.com", "password": "segredo", "nome": "Outro"}).json()
+    resposta = api.post("/api/documentos/vincular", json={"nome": "x", "tipo": "outro", "sha256": SHA256}, headers={"Authorization": f"Bearer {outro['token']}"})
+    assert resposta.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_liberar_blob_nao_apaga_se_alguem_voltou_a_referenciar(banco, bucket, monkeypatch):
+    arquivo_id = (await server.salvar_arquivo("u1", "a.pdf", server.ler_base64(base64.b64encode(CONTEUDO).decode()), "application/pdf"))["arquivo_id"]
+    colecao = type(banco.blobs)
+    original = colecao.delete_one
+
+    async def religado(self, filtro, *args, **kwargs):
+        if self.name == "blobs":
+            # Um vincular chega entre o decremento para zero e a remoção
+            await banco.blobs.update_one({"_id": filtro["_id"]}, {"$inc": {"refs": 1}})
+        return await original(self, filtro, *args, **kwargs)
+
+    monkeypatch.setattr(colecao, "delete_one", religado)
+    await server.liberar_blob("u1", SHA256)
+    restante = await banco.blobs.find_one({"sha256": SHA256})
+    assert restante["refs"] == 1 and arquivo_id in bucket.arquivos
+
+
+@pytest.mark.anyio
+async def test_liberar_blob_inexistente_nao_falha(banco, bucket):
+    await server.liberar_blob("u1", "f" * 64)
@@ -0,0 +1,102 @@
+import asyncio
+import base64
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.mark.parametrize("header, esperado", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("BYTES = 10-19", (10, 19)),
+])
+def test_intervalo_range(header, esperado):
+    assert server.intervalo_range(header, 1000) == esperado
+
+
+@pytest.mark.parametrize("header", ["items=0-10", "bytes=0-10,20-30", "bytes=a-b", "bytes=10"])
+def test_intervalo_range_formato_nao_suportado_devolve_o_arquivo_inteiro(header):
+    assert server.intervalo_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=50-10", "bytes=-0"])
+def test_intervalo_range_fora_do_arquivo(header):
+    with pytest.raises(HTTPException) as erro:
+        server.intervalo_range(header, 1000)
+    assert erro.value.status_code == 416
+    assert erro.value.headers["Content-Range"] == "bytes */1000"
+
+
+CONTEUDO = bytes(range(256)) * 40
+
+
+def enviar(api, cabecalhos, conteudo=CONTEUDO, nome="peticao.pdf"):
+    resposta = api.post("/api/documentos", json={
+        "nome": nome, "tipo": "peticao", "conteudo_base64": base64.b64encode(conteudo).decode(),
+    }, headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.json()
+
+
+def test_upload_vai_para_o_gridfs_e_o_download_devolve_os_bytes(api, cabecalhos, bucket, banco):
+    documento = enviar(api, cabecalhos)
+    assert documento["tamanho"] == len(CONTEUDO)
+    assert list(bucket.arquivos.values()) == [CONTEUDO]
+    salvo = asyncio.run(banco.documentos.find_one({}))
+    assert "conteudo_base64" not in salvo
+
+    resposta = api.get(f"/api/documentos/{documento['id']}/download", headers=cabecalhos)
+    assert resposta.status_code == 200
+    assert resposta.content == CONTEUDO
+    assert resposta.headers["Accept-Ranges"] == "bytes"
+
+
+def test_upload_multipart(api, cabecalhos, bucket):
+    resposta = api.post(
+        "/api/documentos/upload",
+        files={"arquivo": ("contrato.txt", b"clausula primeira", "text/plain")},
+        data={"tipo": "contrato"},
+        headers=cabecalhos,
+    )
+    assert resposta.status_code == 200 and resposta.json()["nome"] == "contrato.txt"
+    download = api.get(f"/api/documentos/{resposta.json()['id']}/download", headers=cabecalhos)
+    assert download.content == b"clausula primeira"
+    assert download.headers["content-type"].startswith("text/plain")
+
+
+def test_download_parcial(api, cabecalhos, bucket):
+    documento = enviar(api, cabecalhos)
+    url = f"/api/documentos/{documento['id']}/download"
+    resposta = api.get(url, headers={**cabecalhos, "Range": "bytes=100-199"})
+    assert resposta.status_code == 206
+    assert resposta.content == CONTEUDO[100:200]
+    assert resposta.headers["Content-Range"] == f"bytes 100-199/{len(CONTEUDO)}"
+
+    resposta = api.get(url, headers={**cabecalhos, "Range": "bytes=-10"})
+    assert resposta.status_code == 206 and resposta.content == CONTEUDO[-10:]
+
+    resposta = api.get(url, headers={**cabecalhos, "Range": f"bytes={len(CONTEUDO)}-"})
+    assert resposta.status_code == 416
+
+
+def test_base64_invalido(api, cabecalhos, bucket):
+    resposta = api.post("/api/documentos", json={"nome": "x", "tipo": "outro", "conteudo_base64": "não é base64"}, headers=cabecalhos)
+    assert resposta.status_code == 400
+
+
+def test_documento_antigo_migra_no_primeiro_download(api, cabecalhos, usuario, bucket, banco):
+    antigo = {
+        "user_id": usuario["id"], "nome": "antigo.pdf", "tipo": "outro", "criado_em": datetime.utcnow(),
+        "conteudo_base64": base64.b64encode(b"conteudo legado").decode(),
+    }
+    asyncio.run(banco.documentos.insert_one(antigo))
+    resposta = api.get(f"/api/documentos/{antigo['_id']}/download", headers=cabecalhos)
+    assert resposta.status_code == 200 and resposta.content == b"conteudo legado"
+    migrado = asyncio.run(banco.documentos.find_one({"_id": antigo["_id"]}))
+    assert "conteudo_base64" not in migrado and migrado["arquivo_id"] in bucket.arquivos
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.fixture
+def barramento(monkeypatch):
+    barramento = server.MemoryEventBus(tamanho_fila=3, max_conexoes=2)
+    monkeypatch.setattr(server, "event_bus", barramento)
+    return barramento
+
+
+def pendentes(fila):
+    eventos = []
+    while not fila.empty():
+        eventos.append(fila.get_nowait())
+    return eventos
+
+
+@pytest.mark.anyio
+async def test_entrega_so_para_as_conexoes_do_usuario(barramento):
+    aba1, aba2, alheia = barramento.assinar("u1"), barramento.assinar("u1"), barramento.assinar("u2")
+    await barramento.publicar("u1", {"colecao": "clientes", "acao": "criado"})
+    assert pendentes(aba1) == pendentes(aba2) == [{"colecao": "clientes", "acao": "criado"}]
+    assert alheia.empty()
+
+
+@pytest.mark.anyio
+async def test_fila_cheia_vira_resync(barramento):
+    lenta, rapida = barramento.assinar("u1"), barramento.assinar("u1")
+    for n in range(3):
+        await barramento.publicar("u1", {"colecao": "clientes", "acao": "criado", "id": str(n)})
+    pendentes(rapida)
+    await barramento.publicar("u1", {"colecao": "clientes", "acao": "criado", "id": "3"})
+    # A conexão que não consumiu perde o atrasado e recebe um único pedido de resync
+    assert pendentes(lenta) == [{"acao": "resync"}]
+    assert pendentes(rapida) == [{"colecao": "clientes", "acao": "criado", "id": "3"}]
+
+
+def test_limite_de_conexoes_por_usuario(barramento):
+    primeira = barramento.assinar("u1")
+    barramento.assinar("u1")
+    with pytest.raises(HTTPException) as erro:
+        barramento.assinar("u1")
+    assert erro.value.status_code == 429
+    # Outro usuário tem o próprio limite; fechar uma conexão libera a vaga
+    barramento.assinar("u2")
+    barramento.cancelar("u1", primeira)
+    barramento.assinar("u1")
+
+
+def test_cancelar_a_ultima_conexao_esquece_o_usuario(barramento):
+    fila = barramento.assinar("u1")
+    barramento.cancelar("u1", fila)
+    barramento.cancelar("u1", fila)
+    assert "u1" not in barramento._assinantes
+
+
+def test_rota_recusa_acima_do_limite(api, cabecalhos, barramento, monkeypatch):
+    monkeypatch.setattr(barramento, "max_conexoes", 0)
+    assert api.get("/api/events", headers=cabecalhos).status_code == 429
+
+
+@pytest.mark.anyio
+async def test_stream_formata_eventos_e_manda_heartbeat(barramento, monkeypatch):
+    monkeypatch.setattr(server, "EVENTS_HEARTBEAT", 0.01)
+    resposta = await server.eventos("u1")
+    stream = resposta.body_iterator
+    assert await stream.__anext__() == "retry: 5000\n\n"
+    assert await stream.__anext__() == ": heartbeat\n\n"
+
+    await server.notificar_alteracao("u1", "casos", "excluido", "abc", total=1)
+    bloco = await stream.__anext__()
+    cabecalho, dados = bloco.rstrip("\n").split("\n")
+    assert cabecalho == "event: casos"
+    assert json.loads(dados.removeprefix("data: ")) == {"colecao": "casos", "acao": "excluido", "id": "abc", "total": 1}
+
+    await stream.aclose()
+    assert "u1" not in barramento._assinantes
@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+
+
+def lancamento(descricao, vencimento, **campos):
+    return {"tipo": "receber", "descricao": descricao, "valor": 10.5, "categoria": "honorários", "data_vencimento": vencimento, **campos}
+
+
+def criar(api, cabecalhos, *lancamentos):
+    resposta = api.post("/api/financeiro/bulk", json=list(lancamentos), headers=cabecalhos)
+    assert resposta.json()["falhas"] == 0
+
+
+def test_csv_tem_bom_cabecalho_e_colunas_do_modelo(api, cabecalhos):
+    criar(api, cabecalhos, lancamento("Parcela; 1", "2024-03-05"), lancamento("Parcela 2", "2024-02-01"))
+    resposta = api.get("/api/financeiro/exportar", params={"campo_data": "data_vencimento", "separador": ";"}, headers=cabecalhos)
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/csv")
+    assert resposta.headers["content-disposition"] == 'attachment; filename="financeiro.csv"'
+    texto = resposta.content.decode("utf-8")
+    assert texto.startswith("\ufeff")
+
+    linhas = list(csv.reader(io.StringIO(texto[1:]), delimiter=";"))
+    assert linhas[0] == ["id", "tipo", "descricao", "valor", "categoria", "status", "data_vencimento", "data_pagamento", "caso_id", "cliente_id", "criado_em"]
+    # Ordenado pelo campo de data; o separador dentro do texto vem entre aspas
+    assert [(l[2], l[6]) for l in linhas[1:]] == [("Parcela 2", "2024-02-01"), ("Parcela; 1", "2024-03-05")]
+    assert all(l[7] == "" for l in linhas[1:])
+
+
+def test_ndjson_sem_campos_internos(api, cabecalhos):
+    criar(api, cabecalhos, lancamento("Parcela 1", "2024-03-05"))
+    resposta = api.get("/api/financeiro/exportar", params={"formato": "ndjson"}, headers=cabecalhos)
+    assert resposta.headers["content-type"].startswith("application/x-ndjson")
+    registros = [json.loads(l) for l in resposta.text.splitlines()]
+    assert len(registros) == 1
+    registro = registros[0]
+    assert registro["data_vencimento"] == "2024-03-05" and registro["valor"] == 10.5
+    assert not {"_id", "user_id", "versao", "atualizado_em", "termos_busca"} & registro.keys()
+
+
+def test_filtro_de_periodo_inclui_o_ultimo_dia(api, cabecalhos):
+    criar(api, cabecalhos, *(lancamento(f"P{dia}", f"2024-03-{dia:02d}") for dia in (1, 10, 20, 31)))
+    resposta = api.get("/api/financeiro/exportar", params={
+        "formato": "ndjson", "campo_data": "data_vencimento", "de": "2024-03-10", "ate": "2024-03-20",
+    }, headers=cabecalhos)
+    assert [json.loads(l)["descricao"] for l in resposta.text.splitlines()] == ["P10", "P20"]
+
+
+def test_exportacao_so_do_usuario_e_campo_data_validado(api, cabecalhos):
+    criar(api, cabecalhos, lancamento("Meu", "2024-03-05"))
+    outro = api.post("/api/auth/register", json={"email": "outro@example.com", "password": "segredo", "nome": "Outro"}).json()
+    alheio = {"Authorization": f"Bearer {outro['token']}"}
+    assert api.get("/api/financeiro/exportar", params={"formato": "ndjson"}, headers=alheio).text == ""
+    assert api.get("/api/financeiro/exportar", params={"campo_data": "valor"}, headers=cabecalhos).status_code == 400
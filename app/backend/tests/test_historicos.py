@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+import server
+
+
+@pytest.fixture
+def cliente_id(api, cabecalhos):
+    return api.post("/api/clientes", json={"tipo": "PF", "nome": "Ana", "cpf_cnpj": "1"}, headers=cabecalhos).json()["id"]
+
+
+def test_atendimentos_paginados_e_so_os_ultimos_embutidos(api, cabecalhos, cliente_id, banco, monkeypatch):
+    monkeypatch.setattr(server, "HISTORICO_EMBUTIDO", 3)
+    for n in range(7):
+        resposta = api.post(f"/api/clientes/{cliente_id}/atendimentos", json={"descricao": f"A{n}"}, headers=cabecalhos)
+        assert resposta.status_code == 200
+
+    cliente = api.get(f"/api/clientes/{cliente_id}", headers=cabecalhos).json()
+    assert cliente["total_atendimentos"] == 7
+    assert [e["descricao"] for e in cliente["historico_atendimentos"]] == ["A4", "A5", "A6"]
+
+    vistos, cursor = [], None
+    while True:
+        pagina = api.get(f"/api/clientes/{cliente_id}/atendimentos", params={"limit": 3, **({"cursor": cursor} if cursor else {})}, headers=cabecalhos).json()
+        assert all(a["cliente_id"] == cliente_id and set(a) == {"id", "descricao", "cliente_id", "data"} for a in pagina["items"])
+        vistos += [a["descricao"] for a in pagina["items"]]
+        cursor = pagina["next_cursor"]
+        if not cursor:
+            break
+    assert vistos == [f"A{n}" for n in reversed(range(7))]
+
+
+def test_historico_de_pai_inexistente_ou_alheio(api, cabecalhos, cliente_id, banco):
+    assert api.post(f"/api/casos/{ObjectId()}/movimentacoes", json={"descricao": "x"}, headers=cabecalhos).status_code == 404
+    outro = api.post("/api/auth/register", json={"email": "outro@example.com", "password": "segredo", "nome": "Outro"}).json()
+    alheio = {"Authorization": f"Bearer {outro['token']}"}
+    assert api.post(f"/api/clientes/{cliente_id}/atendimentos", json={"descricao": "x"}, headers=alheio).status_code == 404
+    assert asyncio.run(banco.atendimentos.count_documents({})) == 0
+
+
+def test_movimentacoes_saem_com_o_caso(api, cabecalhos, cliente_id, banco):
+    caso_id = api.post("/api/casos", json={"titulo": "Ação", "area": "cível", "cliente_id": cliente_id}, headers=cabecalhos).json()["id"]
+    for n in range(2):
+        api.post(f"/api/casos/{caso_id}/movimentacoes", json={"descricao": f"M{n}"}, headers=cabecalhos)
+    pagina = api.get(f"/api/casos/{caso_id}/movimentacoes", params={"ordem": "asc"}, headers=cabecalhos).json()
+    assert [m["descricao"] for m in pagina["items"]] == ["M0", "M1"] and pagina["next_cursor"] is None
+
+    assert api.delete(f"/api/casos/{caso_id}", headers=cabecalhos).status_code == 200
+    assert asyncio.run(banco.movimentacoes.count_documents({})) == 0
+
+
+@pytest.mark.anyio
+async def test_migrar_historicos_move_os_arrays_antigos(banco, monkeypatch):
+    monkeypatch.setattr(server, "HISTORICO_EMBUTIDO", 2)
+    entradas = [{"descricao": f"A{n}", "data": f"2024-01-0{n + 1}T10:00:00"} for n in range(4)]
+    antigo = (await banco.clientes.insert_one({"user_id": "u1", "nome": "Ana", "historico_atendimentos": entradas})).inserted_id
+    vazio = (await banco.casos.insert_one({"user_id": "u1", "titulo": "Ação"})).inserted_id
+    await banco.clientes.insert_one({"user_id": "u1", "nome": "Bia", "historico_atendimentos": [], "total_atendimentos": 0})
+
+    assert await server.migrar_historicos() == 2
+    cliente = await banco.clientes.find_one({"_id": antigo})
+    assert cliente["total_atendimentos"] == 4
+    assert [e["descricao"] for e in cliente["historico_atendimentos"]] == ["A2", "A3"]
+    migrados = await banco.atendimentos.find({"cliente_id": str(antigo)}).sort("data", 1).to_list(None)
+    assert [(a["descricao"], a["user_id"]) for a in migrados] == [(f"A{n}", "u1") for n in range(4)]
+    caso = await banco.casos.find_one({"_id": vazio})
+    assert caso["total_movimentacoes"] == 0 and caso["timeline"] == []
+
+    # Rodar de novo não duplica nada
+    assert await server.migrar_historicos() == 0
+    assert await banco.atendimentos.count_documents({}) == 4
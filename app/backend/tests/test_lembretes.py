@@ -0,0 +1,76 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+import server
+
+PRAZO = date(2030, 5, 10)
+
+
+def instante(dia: date):
+    return server.inicio_dia_utc(dia)
+
+
+def prazo(**campos):
+    return {"user_id": "u1", "titulo": "Contestação", "data": instante(PRAZO), "lembretes": [3, 1], **campos}
+
+
+def test_proximo_lembrete_futuro_e_o_primeiro():
+    agora = instante(PRAZO - timedelta(days=10))
+    assert server.proximo_lembrete(prazo(), agora) == (instante(PRAZO - timedelta(days=3)), 3)
+
+
+def test_proximo_lembrete_vencido_vale_o_mais_recente():
+    agora = instante(PRAZO - timedelta(days=1)) + timedelta(hours=5)
+    assert server.proximo_lembrete(prazo(), agora) == (instante(PRAZO - timedelta(days=1)), 1)
+
+
+def test_proximo_lembrete_depois_de_pula_os_ja_disparados():
+    agora = instante(PRAZO - timedelta(days=3))
+    disparado = instante(PRAZO - timedelta(days=3))
+    assert server.proximo_lembrete(prazo(), agora, disparado) == (instante(PRAZO - timedelta(days=1)), 1)
+
+
+def test_proximo_lembrete_dia_do_prazo_sempre_conta():
+    agora = instante(PRAZO) + timedelta(hours=1)
+    assert server.proximo_lembrete(prazo(lembretes=[]), agora) == (instante(PRAZO), 0)
+    assert server.proximo_lembrete(prazo(lembretes=[-2]), agora) == (instante(PRAZO), 0)
+
+
+def test_proximo_lembrete_prazo_passado():
+    agora = instante(PRAZO + timedelta(days=1))
+    assert server.proximo_lembrete(prazo(), agora) == (None, None)
+    assert server.proximo_lembrete(prazo(data=None), agora) == (None, None)
+
+
+@pytest.mark.anyio
+async def test_disparar_lembretes_grava_notificacao_e_agenda_o_seguinte(banco):
+    agora = instante(PRAZO - timedelta(days=3)) + timedelta(minutes=1)
+    registro = prazo()
+    registro.update(server.campos_lembrete(registro, agora))
+    await banco.prazos.insert_one(registro)
+
+    assert await server.disparar_lembretes(agora) == 1
+    notificacoes = await banco.notificacoes.find({}).to_list(None)
+    assert [(n["user_id"], n["dias"], n["lida"]) for n in notificacoes] == [("u1", 3, False)]
+    atualizado = await banco.prazos.find_one({"_id": registro["_id"]})
+    assert atualizado["ultimo_lembrete"] == instante(PRAZO - timedelta(days=3))
+    assert atualizado["proximo_lembrete"] == instante(PRAZO - timedelta(days=1))
+    assert atualizado["proximo_lembrete_dias"] == 1
+
+    # O seguinte ainda não venceu: nada a disparar de novo
+    assert await server.disparar_lembretes(agora) == 0
+    assert await banco.notificacoes.count_documents({}) == 1
+
+
+def test_disparar_lembretes_troca_o_etag(api, cabecalhos):
+    dia = server.hoje_local() + timedelta(days=1)
+    resposta = api.post("/api/prazos", json={"tipo": "prazo", "titulo": "Audiência", "data": dia.isoformat(), "hora": "10:00", "lembretes": [1]}, headers=cabecalhos)
+    assert resposta.status_code == 200
+    etag = api.get("/api/prazos", headers=cabecalhos).headers["ETag"]
+    assert api.get("/api/prazos", headers={**cabecalhos, "If-None-Match": etag}).status_code == 304
+
+    assert asyncio.run(server.disparar_lembretes(server.inicio_dia_utc(dia) + timedelta(hours=1))) == 1
+    # Os alertas do dashboard mudaram, então nenhuma rota com ETag pode seguir em 304
+    assert api.get("/api/prazos", headers={**cabecalhos, "If-None-Match": etag}).status_code == 200
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+import pytest
+
+import server
+
+HOJE = server.hoje_local()
+
+
+def lancamento(user_id, dias, status="pendente"):
+    return {"user_id": user_id, "tipo": "receber", "valor": 1.0, "status": status, "data_vencimento": server.inicio_dia_utc(HOJE + timedelta(days=dias))}
+
+
+@pytest.mark.anyio
+async def test_marcar_atrasados_em_lotes(banco, monkeypatch):
+    monkeypatch.setattr(server, "MANUTENCAO_LOTE", 3)
+    await banco.financeiro.insert_many([
+        *(lancamento("u1", -d) for d in range(1, 6)),
+        lancamento("u2", -1), lancamento("u2", -2, status="pago"),
+        lancamento("u2", 0), lancamento("u1", 3),
+    ])
+    assert await server.marcar_atrasados(HOJE) == 6
+    atrasados = await banco.financeiro.find({"status": "atrasado"}).to_list(None)
+    assert len(atrasados) == 6 and all(l["data_vencimento"] < server.inicio_dia_utc(HOJE) for l in atrasados)
+    # Uma versão por lançamento, para o /sync não pular nenhum
+    versoes = [l["versao"] for l in atrasados if l["user_id"] == "u1"]
+    assert len(set(versoes)) == 5
+    # Vencendo hoje ainda não está atrasado; pago fica como está
+    assert await banco.financeiro.count_documents({"status": "pendente"}) == 2
+    assert await server.marcar_atrasados(HOJE) == 0
+
+
+@pytest.mark.anyio
+async def test_atualizar_contadores_reconta_e_zera_quem_sumiu(banco):
+    await banco.casos.insert_many([{"user_id": "u1", "status": status} for status in ("novo", "em andamento", "concluído")])
+    await banco.tarefas.insert_many([{"user_id": "u2", "status": status} for status in ("a_fazer", "concluido")])
+    await banco.contadores.insert_one({"_id": "u3", "processos_ativos": 5, "tarefas_pendentes": 2})
+
+    assert await server.atualizar_contadores() == 2
+    contadores = {c["_id"]: c for c in await banco.contadores.find({}).to_list(None)}
+    assert (contadores["u1"]["processos_ativos"], contadores["u1"]["tarefas_pendentes"]) == (2, 0)
+    assert (contadores["u2"]["processos_ativos"], contadores["u2"]["tarefas_pendentes"]) == (0, 1)
+    assert (contadores["u3"]["processos_ativos"], contadores["u3"]["tarefas_pendentes"]) == (0, 0)
+    assert all(server.contagem_valida(c) for c in contadores.values())
+
+
+@pytest.mark.anyio
+async def test_escrita_invalida_e_leitura_reconta(banco):
+    await banco.casos.insert_one({"user_id": "u1", "status": "novo"})
+    assert (await server.obter_contadores("u1"))["processos_ativos"] == 1
+
+    await banco.casos.insert_one({"user_id": "u1", "status": "novo"})
+    await server.notificar_alteracao("u1", "casos", "criado")
+    assert not server.contagem_valida(await banco.contadores.find_one({"_id": "u1"}))
+    assert (await server.obter_contadores("u1"))["processos_ativos"] == 2
+    assert server.contagem_valida(await banco.contadores.find_one({"_id": "u1"}))
+
+
+@pytest.mark.anyio
+async def test_contagem_anterior_a_escrita_nao_e_gravada(banco, monkeypatch):
+    await banco.casos.insert_one({"user_id": "u1", "status": "novo"})
+    colecao = type(banco.casos)
+    original = colecao.count_documents
+
+    async def contar_e_escrever(self, *args, **kwargs):
+        total = await original(self, *args, **kwargs)
+        if self.name == "casos":
+            # A escrita termina (e incrementa a geração) depois da contagem e antes do upsert
+            await banco.casos.insert_one({"user_id": "u1", "status": "novo"})
+            await server.notificar_alteracao("u1", "casos", "criado")
+        return total
+
+    monkeypatch.setattr(colecao, "count_documents", contar_e_escrever)
+    assert (await server.obter_contadores("u1"))["processos_ativos"] == 1
+    monkeypatch.setattr(colecao, "count_documents", original)
+
+    assert not server.contagem_valida(await banco.contadores.find_one({"_id": "u1"}))
+    assert (await server.obter_contadores("u1"))["processos_ativos"] == 2
+
+
+@pytest.mark.anyio
+async def test_rodada_periodica_nao_sobrescreve_escrita_concorrente(banco, monkeypatch):
+    await banco.tarefas.insert_one({"user_id": "u1", "status": "a_fazer"})
+    await server.obter_contadores("u1")
+    colecao = type(banco.tarefas)
+    original = colecao.aggregate
+
+    def agregar_e_escrever(self, *args, **kwargs):
+        cursor = original(self, *args, **kwargs)
+
+        async def grupos():
+            if self.name == "tarefas":
+                # Chega entre a leitura das gerações e a gravação da rodada
+                await server.notificar_alteracao("u1", "tarefas", "criado")
+            async for grupo in cursor:
+                yield grupo
+
+        return grupos()
+
+    monkeypatch.setattr(colecao, "aggregate", agregar_e_escrever)
+    await server.atualizar_contadores()
+    monkeypatch.setattr(colecao, "aggregate", original)
+    assert not server.contagem_valida(await banco.contadores.find_one({"_id": "u1"}))
@@ -0,0 +1,104 @@
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+
+
+def test_cursor_ida_e_volta():
+    doc = {"_id": ObjectId(), "criado_em": datetime(2024, 3, 1, 12, 30)}
+    cursor = server.encode_cursor("criado_em", "desc", doc)
+    assert "=" not in cursor
+    assert server.decode_cursor(cursor, "criado_em", "desc") == (doc["criado_em"], doc["_id"])
+
+
+def test_cursor_por_id():
+    doc = {"_id": ObjectId()}
+    assert server.decode_cursor(server.encode_cursor("_id", "asc", doc), "_id", "asc") == (doc["_id"], doc["_id"])
+
+
+@pytest.mark.parametrize("sort_key, ordem", [("nome", "desc"), ("criado_em", "asc")])
+def test_cursor_de_outra_ordenacao(sort_key, ordem):
+    cursor = server.encode_cursor("criado_em", "desc", {"_id": ObjectId(), "criado_em": datetime(2024, 1, 1)})
+    with pytest.raises(HTTPException) as erro:
+        server.decode_cursor(cursor, sort_key, ordem)
+    assert erro.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    "lixo",
+    base64.urlsafe_b64encode(b'{"s": "_id", "o": "asc", "v": 1}').decode(),
+    base64.urlsafe_b64encode(b'{"s": "_id", "o": "asc", "v": 1, "id": "abc"}').decode(),
+])
+def test_cursor_invalido(cursor):
+    with pytest.raises(HTTPException) as erro:
+        server.decode_cursor(cursor, "_id", "asc")
+    assert erro.value.status_code == 400
+
+
+def criar_lancamento(api, cabecalhos, **campos):
+    dados = {
+        "tipo": "receber", "descricao": "Honorários", "valor": 100, "categoria": "honorarios",
+        "status": "pendente", "data_vencimento": "2030-03-10", **campos,
+    }
+    resposta = api.post("/api/financeiro", json=dados, headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.json()["id"]
+
+
+def test_listagem_segue_next_cursor_sem_repetir(api, cabecalhos):
+    ids = [criar_lancamento(api, cabecalhos) for _ in range(5)]
+    vistos, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        pagina = api.get("/api/financeiro", params=params, headers=cabecalhos).json()
+        vistos += [item["id"] for item in pagina["items"]]
+        cursor = pagina["next_cursor"]
+        if not cursor:
+            break
+    assert vistos == ids
+
+
+def test_listagem_financeiro_filtra_por_tipo(api, cabecalhos):
+    receber = criar_lancamento(api, cabecalhos)
+    criar_lancamento(api, cabecalhos, tipo="pagar")
+    pagina = api.get("/api/financeiro", params={"tipo": "receber"}, headers=cabecalhos).json()
+    assert [item["id"] for item in pagina["items"]] == [receber]
+
+
+def test_resumo_financeiro_soma_todos_os_lancamentos(api, cabecalhos):
+    for _ in range(3):
+        criar_lancamento(api, cabecalhos, valor=100.10)
+    criar_lancamento(api, cabecalhos, tipo="pagar", valor=40)
+    criar_lancamento(api, cabecalhos, tipo="pagar", valor=999, status="pago")
+    criar_lancamento(api, cabecalhos, valor=25, status="atrasado")
+    resumo = api.get("/api/financeiro/relatorios/resumo", headers=cabecalhos).json()
+    assert resumo == {"receber": 300.3, "pagar": 40.0, "atrasado": 25.0}
+
+
+def test_periodo_pagina_na_ordem_do_vencimento(api, cabecalhos):
+    for vencimento in ["2030-03-20", "2030-03-05", "2030-03-31", "2030-03-12", "2030-04-01", "2030-02-28"]:
+        criar_lancamento(api, cabecalhos, data_vencimento=vencimento)
+    vistos, cursor = [], None
+    while True:
+        params = {"vencimento_de": "2030-03-01", "vencimento_ate": "2030-03-31", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        pagina = api.get("/api/financeiro", params=params, headers=cabecalhos).json()
+        vistos += [item["data_vencimento"] for item in pagina["items"]]
+        cursor = pagina["next_cursor"]
+        if not cursor:
+            break
+    # Com período e sem ordenar_por, a ordem é a do vencimento e o último dia entra
+    assert vistos == ["2030-03-05", "2030-03-12", "2030-03-20", "2030-03-31"]
+
+
+def test_prazos_do_periodo_por_data(api, cabecalhos):
+    for dia in ["2030-05-09", "2030-05-03", "2030-06-01"]:
+        api.post("/api/prazos", json={"tipo": "prazo", "titulo": dia, "data": dia, "hora": "10:00"}, headers=cabecalhos)
+    pagina = api.get("/api/prazos", params={"de": "2030-05-01", "ate": "2030-05-31"}, headers=cabecalhos).json()
+    assert [p["data"] for p in pagina["items"]] == ["2030-05-03", "2030-05-09"]
+    # Sem período segue a ordem de criação
+    pagina = api.get("/api/prazos", headers=cabecalhos).json()
+    assert [p["data"] for p in pagina["items"]] == ["2030-05-09", "2030-05-03", "2030-06-01"]
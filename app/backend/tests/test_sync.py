@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from bson import ObjectId
+
+import server
+
+
+def criar_cliente(api, cabecalhos, nome):
+    resposta = api.post("/api/clientes", json={"tipo": "PF", "nome": nome, "cpf_cnpj": "123.456.789-00"}, headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.json()["id"]
+
+
+def criar_caso(api, cabecalhos, titulo):
+    resposta = api.post("/api/casos", json={"titulo": titulo, "area": "Cível", "cliente_id": "c1"}, headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.json()["id"]
+
+
+def sincronizar(api, cabecalhos, **params):
+    resposta = api.get("/api/sync", params=params, headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.json()
+
+
+def test_sync_junta_as_colecoes_em_ordem_de_versao(api, cabecalhos):
+    ana = criar_cliente(api, cabecalhos, "Ana")
+    caso = criar_caso(api, cabecalhos, "Despejo")
+    bruno = criar_cliente(api, cabecalhos, "Bruno")
+
+    pagina = sincronizar(api, cabecalhos, limit=2)
+    assert [c["id"] for c in pagina["clientes"]] == [ana]
+    assert [c["id"] for c in pagina["casos"]] == [caso]
+    assert pagina["mais"] is True
+
+    pagina = sincronizar(api, cabecalhos, since=pagina["token"], limit=2)
+    assert [c["id"] for c in pagina["clientes"]] == [bruno]
+    assert pagina["casos"] == [] and pagina["mais"] is False
+
+    # Nada novo: o mesmo token volta vazio
+    vazia = sincronizar(api, cabecalhos, since=pagina["token"])
+    assert vazia["clientes"] == [] and vazia["mais"] is False
+
+    api.delete(f"/api/clientes/{ana}", headers=cabecalhos)
+    api.put(f"/api/casos/{caso}", json={"titulo": "Despejo (recurso)", "area": "Cível", "status": "em andamento", "cliente_id": "c1"}, headers=cabecalhos)
+    pagina = sincronizar(api, cabecalhos, since=pagina["token"])
+    assert [(e["colecao"], e["id"]) for e in pagina["exclusoes"]] == [("clientes", ana)]
+    assert [c["titulo"] for c in pagina["casos"]] == ["Despejo (recurso)"]
+
+
+def test_sync_sem_token_ignora_tombstones(api, cabecalhos):
+    ana = criar_cliente(api, cabecalhos, "Ana")
+    criar_cliente(api, cabecalhos, "Bruno")
+    api.delete(f"/api/clientes/{ana}", headers=cabecalhos)
+    pagina = sincronizar(api, cabecalhos)
+    assert [c["nome"] for c in pagina["clientes"]] == ["Bruno"]
+    assert pagina["exclusoes"] == []
+
+
+def test_sync_token_invalido(api, cabecalhos):
+    assert api.get("/api/sync", params={"since": "lixo"}, headers=cabecalhos).status_code == 400
+
+
+@pytest.fixture
+async def api_async():
+    # Mesmo event loop do teste: uma reserva aberta com carimbo continua aberta durante as requisições
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://testserver") as cliente:
+        yield cliente
+
+
+@pytest.mark.anyio
+async def test_sync_nao_entrega_nem_pula_versao_ainda_sendo_gravada(api_async, cabecalhos, usuario):
+    novo = {"tipo": "PF", "nome": "Ana", "cpf_cnpj": "123.456.789-00"}
+    await api_async.post("/api/clientes", json=novo, headers=cabecalhos)
+    token = (await api_async.get("/api/sync", headers=cabecalhos)).json()["token"]
+
+    # Uma escrita reserva a versão seguinte e ainda não gravou; outra, depois dela, termina antes
+    async with server.carimbo(usuario["id"]):
+        bruno = (await api_async.post("/api/clientes", json={**novo, "nome": "Bruno"}, headers=cabecalhos)).json()["id"]
+        pagina = (await api_async.get("/api/sync", params={"since": token}, headers=cabecalhos)).json()
+        assert pagina["clientes"] == []
+        assert server.decode_token_sync(pagina["token"]) == server.decode_token_sync(token)
+
+    pagina = (await api_async.get("/api/sync", params={"since": pagina["token"]}, headers=cabecalhos)).json()
+    assert [c["id"] for c in pagina["clientes"]] == [bruno]
+
+
+@pytest.mark.anyio
+async def test_etag_so_muda_quando_a_escrita_termina(api_async, cabecalhos, usuario):
+    etag = (await api_async.get("/api/clientes", headers=cabecalhos)).headers["ETag"]
+    async with server.carimbo(usuario["id"], 3):
+        # Reservada mas não gravada: os dados não mudaram, o ETag também não
+        resposta = await api_async.get("/api/clientes", headers={**cabecalhos, "If-None-Match": etag})
+        assert resposta.status_code == 304
+    resposta = await api_async.get("/api/clientes", headers={**cabecalhos, "If-None-Match": etag})
+    assert resposta.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_carimbo_confirma_mesmo_com_erro(banco):
+    with pytest.raises(RuntimeError):
+        async with server.carimbo("u1"):
+            raise RuntimeError("falhou no meio")
+    contador = await banco.versoes.find_one({"_id": "u1"})
+    assert contador["pendentes"] == [] and server.versao_estavel(contador) == 1
+
+
+@pytest.mark.anyio
+async def test_reserva_esquecida_expira(banco, monkeypatch):
+    monkeypatch.setattr(server, "VERSAO_PENDENTE_TTL", 60)
+    # Reserva de um processo que caiu antes de confirmar
+    await banco.versoes.insert_one({"_id": "u1", "versao": 1, "pendentes": [{"id": ObjectId(), "em": datetime.utcnow() - timedelta(minutes=5)}]})
+    async with server.carimbo("u1") as marca:
+        assert marca["versao"] == 2
+    assert server.versao_estavel(await banco.versoes.find_one({"_id": "u1"})) == 2
+
+
+def test_versao_estavel_de_contador_antigo():
+    assert server.versao_estavel(None) == 0
+    assert server.versao_estavel({"versao": 7}) == 7
+    assert server.versao_estavel({"versao": 7, "pendentes": [{"id": ObjectId()}]}) == 0
+    assert server.versao_estavel({"versao": 7, "estavel": 5, "pendentes": [{"id": ObjectId()}]}) == 5
+
+
+@pytest.mark.anyio
+async def test_historico_gravado_antes_de_confirmar_a_versao(banco, monkeypatch):
+    pai = (await banco.clientes.insert_one({"user_id": "u1", "nome": "Ana", "historico_atendimentos": [], "total_atendimentos": 0})).inserted_id
+    colecao = type(banco.clientes)
+    original = colecao.update_one
+    vistos = []
+
+    async def observando(self, filtro, *args, **kwargs):
+        if self.name == "clientes":
+            vistos.append(await banco.atendimentos.count_documents({"cliente_id": str(pai)}))
+        return await original(self, filtro, *args, **kwargs)
+
+    monkeypatch.setattr(colecao, "update_one", observando)
+    assert await server.registrar_historico("clientes", str(pai), "u1", "Ligação") is True
+    # O total do pai só cresce quando a entrada já está na sub-coleção
+    assert vistos == [1]
+
+    # Pai de outro usuário: a entrada inserida é desfeita
+    assert await server.registrar_historico("clientes", str(pai), "u2", "Ligação") is False
+    assert await banco.atendimentos.count_documents({}) == 1
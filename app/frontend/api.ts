@@ -24,4 +24,62 @@ api.interceptors.request.use(
   }
 );
 
+// 429 do limitador: espera o Retry-After e tenta de novo algumas vezes antes de desistir
+const MAX_TENTATIVAS_429 = 3;
+
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const config = error.config;
+    if (error.response?.status !== 429 || !config || (config.tentativas429 ?? 0) >= MAX_TENTATIVAS_429) {
+      return Promise.reject(error);
+    }
+    config.tentativas429 = (config.tentativas429 ?? 0) + 1;
+    const segundos = Number(error.response.headers['retry-after']) || 1;
+    await new Promise((resolve) => setTimeout(resolve, segundos * 1000));
+    return api(config);
+  }
+);
+
+export interface Pagina<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
+// Listagens são paginadas por cursor: as telas pedem a próxima página quando a rolagem chega ao fim
+export async function listarPagina<T>(
+  url: string,
+  params: Record<string, unknown> = {},
+  cursor: string | null = null
+): Promise<Pagina<T>> {
+  const response = await api.get<Pagina<T>>(url, {
+    params: { ...params, ...(cursor ? { cursor } : {}) },
+  });
+  return response.data;
+}
+
+// Só para conjuntos pequenos e limitados pelo filtro (ex.: os prazos de um dia)
+export async function listarTodos<T>(url: string, params: Record<string, unknown> = {}): Promise<T[]> {
+  const itens: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const pagina: Pagina<T> = await listarPagina<T>(url, { limit: 200, ...params }, cursor);
+    itens.push(...pagina.items);
+    cursor = pagina.next_cursor;
+  } while (cursor);
+  return itens;
+}
+
+// Rolagem perto do fim da lista (para carregar a próxima página)
+export function chegouAoFim(
+  { layoutMeasurement, contentOffset, contentSize }: {
+    layoutMeasurement: { height: number };
+    contentOffset: { y: number };
+    contentSize: { height: number };
+  },
+  margem = 200
+): boolean {
+  return layoutMeasurement.height + contentOffset.y >= contentSize.height - margem;
+}
+
 export default api;
\ No newline at end of file
@@ -13,7 +13,7 @@ import { Ionicons } from '@expo/vector-icons';
 import { Calendar, LocaleConfig } from 'react-native-calendars';
 import { format, parseISO } from 'date-fns';
 import { ptBR } from 'date-fns/locale';
-import api from '../../services/api';
+import api, { listarTodos } from '../../services/api';
 
 // Configurar locale do calendário
 LocaleConfig.locales['pt-br'] = {
@@ -45,22 +45,25 @@ interface Prazo {
 export default function Agenda() {
   const [prazos, setPrazos] = useState<Prazo[]>([]);
   const [selectedDate, setSelectedDate] = useState(format(new Date(), 'yyyy-MM-dd'));
+  const [mes, setMes] = useState(format(new Date(), 'yyyy-MM'));
+  const [diasComPrazo, setDiasComPrazo] = useState<string[]>([]);
   const [markedDates, setMarkedDates] = useState<any>({});
   const [loading, setLoading] = useState(false);
   const router = useRouter();
 
+  useEffect(() => {
+    loadDias();
+  }, [mes]);
+
   useEffect(() => {
     loadPrazos();
-  }, []);
+  }, [selectedDate]);
 
   useEffect(() => {
     // Marcar datas com eventos
     const marked: any = {};
-    prazos.forEach((prazo) => {
-      const date = prazo.data.split('T')[0];
-      if (!marked[date]) {
-        marked[date] = { marked: true, dotColor: '#1e40af' };
-      }
+    diasComPrazo.forEach((date) => {
+      marked[date] = { marked: true, dotColor: '#1e40af' };
     });
     
     // Destacar data selecionada
@@ -71,13 +74,22 @@ export default function Agenda() {
     };
     
     setMarkedDates(marked);
-  }, [prazos, selectedDate]);
+  }, [diasComPrazo, selectedDate]);
+
+  async function loadDias() {
+    // Só a contagem por dia do mês visível, para os pontos do calendário
+    try {
+      const response = await api.get('/prazos/por-dia', { params: { mes } });
+      setDiasComPrazo(response.data.map((dia: { data: string }) => dia.data));
+    } catch (error) {
+      console.error('Erro ao carregar dias com prazos:', error);
+    }
+  }
 
   async function loadPrazos() {
     setLoading(true);
     try {
-      const response = await api.get('/prazos');
-      setPrazos(response.data);
+      setPrazos(await listarTodos<Prazo>('/prazos', { de: selectedDate, ate: selectedDate, ordenar_por: 'data' }));
     } catch (error) {
       console.error('Erro ao carregar prazos:', error);
       Alert.alert('Erro', 'Não foi possível carregar os prazos');
@@ -86,7 +98,12 @@ export default function Agenda() {
     }
   }
 
-  const prazosDoDia = prazos.filter((p) => p.data.startsWith(selectedDate));
+  function refresh() {
+    loadDias();
+    loadPrazos();
+  }
+
+  const prazosDoDia = prazos;
 
   const getTipoIcon = (tipo: string) => {
     switch (tipo) {
@@ -108,12 +125,13 @@ export default function Agenda() {
     <View style={styles.container}>
       <ScrollView
         refreshControl={
-          <RefreshControl refreshing={loading} onRefresh={loadPrazos} />
+          <RefreshControl refreshing={loading} onRefresh={refresh} />
         }
       >
         <Calendar
           current={selectedDate}
           onDayPress={(day) => setSelectedDate(day.dateString)}
+          onMonthChange={(month) => setMes(month.dateString.slice(0, 7))}
           markedDates={markedDates}
           theme={{
             backgroundColor: '#fff',
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   View,
   Text,
@@ -10,7 +10,7 @@ import {
 } from 'react-native';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import { chegouAoFim, listarPagina } from '../../services/api';
 
 interface Caso {
   id: string;
@@ -37,23 +37,43 @@ const prioridadeColors: any = {
 
 export default function Casos() {
   const [casos, setCasos] = useState<Caso[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
+  // Número do último pedido: a resposta de um pedido superado (refresh, troca de filtro) é ignorada
+  const pedido = useRef(0);
+  const carregando = useRef(false);
   const router = useRouter();
 
   useEffect(() => {
     loadCasos();
   }, []);
 
-  async function loadCasos() {
-    setLoading(true);
+  async function carregarPagina(proximo: string | null) {
+    if (proximo && carregando.current) return;
+    const atual = ++pedido.current;
+    carregando.current = true;
     try {
-      const response = await api.get('/casos');
-      setCasos(response.data);
+      const pagina = await listarPagina<Caso>('/casos', {}, proximo);
+      if (atual !== pedido.current) return;
+      setCasos((atuais) => (proximo ? [...atuais, ...pagina.items] : pagina.items));
+      setCursor(pagina.next_cursor);
     } catch (error) {
       console.error('Erro ao carregar casos:', error);
       Alert.alert('Erro', 'Não foi possível carregar os casos');
     } finally {
-      setLoading(false);
+      if (atual === pedido.current) carregando.current = false;
+    }
+  }
+
+  async function loadCasos() {
+    setLoading(true);
+    await carregarPagina(null);
+    setLoading(false);
+  }
+
+  function loadMais(event: any) {
+    if (cursor && chegouAoFim(event.nativeEvent)) {
+      carregarPagina(cursor);
     }
   }
 
@@ -71,6 +91,8 @@ export default function Casos() {
     <View style={styles.container}>
       <ScrollView
         style={styles.list}
+        onScroll={loadMais}
+        scrollEventThrottle={400}
         refreshControl={
           <RefreshControl refreshing={loading} onRefresh={loadCasos} />
         }
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   View,
   Text,
@@ -12,7 +12,7 @@ import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { format, parseISO } from 'date-fns';
 import { ptBR } from 'date-fns/locale';
-import api from '../../services/api';
+import api, { chegouAoFim, listarPagina } from '../../services/api';
 
 interface Financeiro {
   id: string;
@@ -25,45 +25,63 @@ interface Financeiro {
   data_pagamento?: string;
 }
 
+interface Resumo {
+  receber: number;
+  pagar: number;
+  atrasado: number;
+}
+
 export default function Financeiro() {
   const [financeiro, setFinanceiro] = useState<Financeiro[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [totais, setTotais] = useState<Resumo>({ receber: 0, pagar: 0, atrasado: 0 });
   const [filtro, setFiltro] = useState<'todos' | 'receber' | 'pagar'>('todos');
   const [loading, setLoading] = useState(false);
+  // Número do último pedido: a resposta de um pedido superado (refresh, troca de filtro) é ignorada
+  const pedido = useRef(0);
+  const carregando = useRef(false);
   const router = useRouter();
 
   useEffect(() => {
     loadFinanceiro();
-  }, []);
+  }, [filtro]);
 
-  async function loadFinanceiro() {
-    setLoading(true);
+  async function carregarPagina(proximo: string | null) {
+    if (proximo && carregando.current) return;
+    const atual = ++pedido.current;
+    carregando.current = true;
     try {
-      const response = await api.get('/financeiro');
-      setFinanceiro(response.data);
+      // O filtro vai para o servidor: a lista só tem as páginas já roladas
+      const params = filtro === 'todos' ? {} : { tipo: filtro };
+      const pagina = await listarPagina<Financeiro>('/financeiro', params, proximo);
+      if (atual !== pedido.current) return;
+      setFinanceiro((atuais) => (proximo ? [...atuais, ...pagina.items] : pagina.items));
+      setCursor(pagina.next_cursor);
     } catch (error) {
       console.error('Erro ao carregar financeiro:', error);
       Alert.alert('Erro', 'Não foi possível carregar os dados financeiros');
     } finally {
-      setLoading(false);
+      if (atual === pedido.current) carregando.current = false;
     }
   }
 
-  const registrosFiltrados = financeiro.filter((f) => {
-    if (filtro === 'todos') return true;
-    return f.tipo === filtro;
-  });
+  async function loadFinanceiro() {
+    setLoading(true);
+    await Promise.all([
+      carregarPagina(null),
+      // Totais calculados no servidor sobre todos os lançamentos, não só os carregados
+      api.get<Resumo>('/financeiro/relatorios/resumo')
+        .then((response) => setTotais(response.data))
+        .catch((error) => console.error('Erro ao carregar resumo financeiro:', error)),
+    ]);
+    setLoading(false);
+  }
 
-  const totais = {
-    receber: financeiro
-      .filter((f) => f.tipo === 'receber' && f.status === 'pendente')
-      .reduce((sum, f) => sum + f.valor, 0),
-    pagar: financeiro
-      .filter((f) => f.tipo === 'pagar' && f.status === 'pendente')
-      .reduce((sum, f) => sum + f.valor, 0),
-    atrasadas: financeiro
-      .filter((f) => f.status === 'atrasado')
-      .reduce((sum, f) => sum + f.valor, 0),
-  };
+  function loadMais(event: any) {
+    if (cursor && chegouAoFim(event.nativeEvent)) {
+      carregarPagina(cursor);
+    }
+  }
 
   const getStatusColor = (status: string) => {
     switch (status) {
@@ -101,7 +119,7 @@ export default function Financeiro() {
         <View style={styles.resumoCard}>
           <Text style={styles.resumoLabel}>Atrasadas</Text>
           <Text style={[styles.resumoValor, { color: '#f59e0b' }]}>
-            R$ {totais.atrasadas.toFixed(2)}
+            R$ {totais.atrasado.toFixed(2)}
           </Text>
         </View>
       </View>
@@ -160,11 +178,13 @@ export default function Financeiro() {
 
       <ScrollView
         style={styles.list}
+        onScroll={loadMais}
+        scrollEventThrottle={400}
         refreshControl={
           <RefreshControl refreshing={loading} onRefresh={loadFinanceiro} />
         }
       >
-        {registrosFiltrados.map((registro) => (
+        {financeiro.map((registro) => (
           <TouchableOpacity
             key={registro.id}
             style={styles.card}
@@ -210,7 +230,7 @@ export default function Financeiro() {
           </TouchableOpacity>
         ))}
 
-        {registrosFiltrados.length === 0 && !loading && (
+        {financeiro.length === 0 && !loading && (
           <View style={styles.emptyState}>
             <Ionicons name="cash-outline" size={64} color="#cbd5e1" />
             <Text style={styles.emptyText}>Nenhum registro encontrado</Text>